@@ -1,175 +1,352 @@
-"""
-STEP 2: Language Detection
-
-Rileva la lingua di ogni chunk. Modalità disponibili:
-- "auto": Tutto italiano (default, nessuna interazione)
-- "manual": Chiede per ogni chunk con preview audio
-- "fixed": Usa FIXED_LANGUAGE per tutti i chunk
-"""
-
-from pathlib import Path
-import subprocess
-import json
-import sys
-from config import *
-from utils import *
-
-
-# Mappatura tasti -> lingue per modalità manual
-LANG_OPTIONS = {
-    'i': 'it',  # Italiano
-    'e': 'es',  # Español
-    'g': 'en',  # enGlish
-    'f': 'fr',  # Français
-}
-
-
-def manual_classify_language(video_path: Path, index: int, total: int) -> str:
-    """
-    Classificazione manuale con preview audio primi 10s
-    
-    Args:
-        video_path: Percorso chunk video
-        index: Numero chunk corrente
-        total: Totale chunk
-        
-    Returns:
-        Codice lingua ('it', 'es', 'en', 'fr')
-    """
-    print(f"\n[{index}/{total}] {video_path.name}")
-    print("   Lingua (invio=IT, e=ES, g=EN, f=FR, p=play 10s): ", end="")
-
-    while True:
-        choice = input().lower().strip()
-
-        # Default italiano (invio)
-        if choice in ("", "i"):
-            return "it"
-
-        # Altre lingue
-        if choice in LANG_OPTIONS:
-            return LANG_OPTIONS[choice]
-
-        # Preview audio
-        if choice == "p":
-            print("   ▶️  Riproducing primi 10 secondi...")
-            try:
-                subprocess.run(
-                    ["ffplay", "-autoexit", "-t", "10", "-nodisp", str(video_path)],
-                    stdout=subprocess.DEVNULL,
-                    stderr=subprocess.DEVNULL,
-                    check=True,
-                )
-            except FileNotFoundError:
-                print("   ❌ ffplay non trovato!")
-            except subprocess.CalledProcessError:
-                print("   ❌ Errore riproduzione")
-            
-            # Riproponi scelta
-            print("   Lingua (invio=IT, e=ES, g=EN, f=FR, p=play): ", end="")
-            continue
-
-        # Input non valido
-        print("   ❌ Scelta non valida. ", end="")
-        print("Lingua (invio=IT, e=ES, g=EN, f=FR, p=play): ", end="")
-
-
-def detect_languages() -> dict:
-    """
-    Rileva lingua per tutti i chunk secondo LANGUAGE_DETECTION_MODE
-    
-    Returns:
-        Dict {percorso_chunk: codice_lingua}
-    """
-    print_header("RILEVAMENTO LINGUE")
-
-    chunks = sorted(CHUNKS_DIR.glob("chunk_*.mp4"))
-
-    if not chunks:
-        print("❌ Nessun chunk trovato! Esegui prima: python 1_chunking.py")
-        sys.exit(1)
-
-    print(f"📦 Trovati {len(chunks)} chunk")
-    print(f"🔧 Modalità: {LANGUAGE_DETECTION_MODE}\n")
-
-    language_map = {}
-
-    # === MODALITÀ MANUAL ===
-    if LANGUAGE_DETECTION_MODE == "manual":
-        print("👤 Classificazione manuale")
-        print("   • Invio = italiano (default)")
-        print("   • 'e'   = spagnolo")
-        print("   • 'g'   = inglese")
-        print("   • 'f'   = francese")
-        print("   • 'p'   = play primi 10 secondi\n")
-
-        for i, chunk in enumerate(chunks, 1):
-            lang = manual_classify_language(chunk, i, len(chunks))
-            language_map[str(chunk)] = lang
-            
-            # Emoji per feedback visivo
-            emoji = {
-                'it': '🇮🇹',
-                'es': '🇪🇸',
-                'en': '🇬🇧',
-                'fr': '🇫🇷',
-            }.get(lang, '🌍')
-            
-            print(f"   → {emoji} {lang.upper()}")
-
-    # === MODALITÀ FIXED ===
-    elif LANGUAGE_DETECTION_MODE == "fixed":
-        print(f"📌 Lingua fissa: {FIXED_LANGUAGE.upper()}\n")
-        for chunk in chunks:
-            language_map[str(chunk)] = FIXED_LANGUAGE
-            
-            emoji = {
-                'it': '🇮🇹',
-                'es': '🇪🇸',
-                'en': '🇬🇧',
-                'fr': '🇫🇷',
-            }.get(FIXED_LANGUAGE, '🌍')
-            
-            print(f"   {emoji} {chunk.name}")
-
-    # === MODALITÀ AUTO (default: tutto italiano) ===
-    else:
-        print("📌 Lingua predefinita: ITALIANO\n")
-        for chunk in chunks:
-            language_map[str(chunk)] = "it"
-            print(f"   🇮🇹 {chunk.name}")
-
-    # Statistiche finali
-    print_section("RIEPILOGO")
-
-    stats = {}
-    for lang in language_map.values():
-        stats[lang] = stats.get(lang, 0) + 1
-
-    emoji_map = {'it': '🇮🇹', 'es': '🇪🇸', 'en': '🇬🇧', 'fr': '🇫🇷'}
-    for lang, count in sorted(stats.items()):
-        emoji = emoji_map.get(lang, '🌍')
-        lang_name = {'it': 'Italiano', 'es': 'Spagnolo', 'en': 'Inglese', 'fr': 'Francese'}.get(lang, lang.upper())
-        print(f"{emoji} {lang_name}: {count} chunk")
-    print()
-
-    # Salva mappa
-    map_file = CHUNKS_DIR / "language_map.json"
-    map_file.write_text(json.dumps(language_map, indent=2), encoding="utf-8")
-    print(f"💾 Mappa salvata: {map_file}\n")
-
-    return language_map
-
-
-def main():
-    """Esegue detection e salva mappa"""
-    
-    language_map = detect_languages()
-
-    if language_map:
-        print("✅ Rilevamento completato!")
-        print("➡️  Prossimo step: python 3_transcription.py")
-
-
-if __name__ == "__main__":
-    main()
\ No newline at end of file
+"""
+STEP 2: Language Detection
+
+Rileva la lingua di ogni chunk. Modalità disponibili:
+- "auto": Tutto italiano (default, nessuna interazione)
+- "manual": Chiede per ogni chunk con preview audio (clip brevi preparate in background)
+- "fixed": Usa FIXED_LANGUAGE per tutti i chunk
+- "switch": Rileva la lingua su finestre scorrevoli e i cambi lingua dentro i chunk
+"""
+
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+import importlib
+import os
+import subprocess
+import json
+import sys
+from config import *
+from storage import stage_io
+from utils import get_device, get_video_duration, print_header, print_section, seconds_to_timestamp
+
+
+# Mappatura tasti -> lingue per modalità manual
+LANG_OPTIONS = {
+    'i': 'it',  # Italiano
+    'e': 'es',  # Español
+    'g': 'en',  # enGlish
+    'f': 'fr',  # Français
+}
+
+
+def cut_previews(video_path: Path) -> list[tuple[float, Path]]:
+    """
+    Taglia le clip di preview di un chunk (cache in PREVIEW_DIR)
+    
+    PREVIEW_POINTS clip da PREVIEW_SECONDS, distribuite uniformemente nel chunk
+    (la prima all'inizio). Solo audio mono a basso bitrate: la riproduzione
+    parte subito, senza decodifica video né seek nel chunk MP4.
+    
+    Args:
+        video_path: Percorso chunk video
+        
+    Returns:
+        Lista di (inizio in secondi, percorso clip) in ordine di tempo
+        
+    Raises:
+        RuntimeError: Se ffmpeg fallisce
+    """
+    PREVIEW_DIR.mkdir(parents=True, exist_ok=True)
+    duration = get_video_duration(video_path)
+
+    previews = []
+    for point in range(PREVIEW_POINTS):
+        start = duration * point / PREVIEW_POINTS
+        preview = PREVIEW_DIR / f"{video_path.stem}_{point}.m4a"
+
+        if not preview.exists():
+            # -ss prima di -i: seek veloce sul keyframe; scrittura atomica via .tmp
+            tmp_path = preview.with_suffix(".tmp.m4a")
+            cmd = [
+                "ffmpeg", "-y", "-ss", seconds_to_timestamp(start), "-i", str(video_path),
+                "-t", str(PREVIEW_SECONDS),
+                "-vn", "-ac", "1", "-ar", "16000", "-c:a", "aac", "-b:a", "32k",
+                str(tmp_path),
+            ]
+            try:
+                subprocess.run(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, check=True)
+            except subprocess.CalledProcessError as e:
+                raise RuntimeError(f"Errore preview {video_path.name}: {e}")
+            os.replace(tmp_path, preview)
+
+        previews.append((start, preview))
+
+    return previews
+
+
+class PreviewPlayer:
+    """
+    Preview in background per la classificazione manuale
+    
+    Tutte le clip vengono tagliate da un pool di thread (PREVIEW_WORKERS) appena
+    parte la modalità manual, nell'ordine dei chunk: mentre l'operatore ascolta
+    e risponde, le preview dei chunk successivi sono già pronte.
+    La riproduzione (ffplay) non blocca il prompt e le risposte sono salvate
+    su file da un thread dedicato.
+    """
+
+    def __init__(self, chunks: list[Path], partial_file: Path):
+        self.pool = ThreadPoolExecutor(max_workers=PREVIEW_WORKERS)
+        self.writer = ThreadPoolExecutor(max_workers=1)
+        self.previews = {chunk: self.pool.submit(cut_previews, chunk) for chunk in chunks}
+        self.partial_file = partial_file
+        self.player = None
+
+    def play(self, video_path: Path, point: int) -> None:
+        """
+        Riproduce la clip `point` del chunk (in background)
+        
+        Se la clip non è ancora pronta la attende: succede solo se l'operatore
+        è più veloce del pool, e solo per questo chunk.
+        """
+        self.stop()
+        previews = self.previews[video_path].result()
+        start, preview = previews[point % len(previews)]
+        print(f"   ▶️  Preview {point % len(previews) + 1}/{len(previews)} da {seconds_to_timestamp(start)[:8]}")
+        self.player = subprocess.Popen(
+            ["ffplay", "-autoexit", "-nodisp", "-loglevel", "quiet", str(preview)],
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+        )
+
+    def stop(self) -> None:
+        """Interrompe la preview in corso"""
+        if self.player is not None and self.player.poll() is None:
+            self.player.terminate()
+        self.player = None
+
+    def record(self, language_map: dict) -> None:
+        """Salva le risposte date finora senza bloccare il prompt"""
+        snapshot = dict(language_map)
+
+        def write():
+            tmp_path = self.partial_file.with_suffix(".tmp")
+            tmp_path.write_text(json.dumps(snapshot, indent=2), encoding="utf-8")
+            os.replace(tmp_path, self.partial_file)
+
+        self.writer.submit(write)
+
+    def close(self) -> None:
+        """Ferma la riproduzione e attende le scritture pendenti"""
+        self.stop()
+        self.pool.shutdown(wait=False, cancel_futures=True)
+        self.writer.shutdown(wait=True)
+
+
+def manual_classify_language(video_path: Path, index: int, total: int, player: PreviewPlayer) -> str:
+    """
+    Classificazione manuale con preview audio da PREVIEW_SECONDS
+    
+    Args:
+        video_path: Percorso chunk video
+        index: Numero chunk corrente
+        total: Totale chunk
+        player: Preview preparate in background
+        
+    Returns:
+        Codice lingua ('it', 'es', 'en', 'fr')
+    """
+    print(f"\n[{index}/{total}] {video_path.name}")
+    print("   Lingua (invio=IT, e=ES, g=EN, f=FR, p=play): ", end="")
+
+    point = 0
+    while True:
+        choice = input().lower().strip()
+
+        # Default italiano (invio)
+        if choice in ("", "i"):
+            player.stop()
+            return "it"
+
+        # Altre lingue
+        if choice in LANG_OPTIONS:
+            player.stop()
+            return LANG_OPTIONS[choice]
+
+        # Preview audio: ogni 'p' passa al punto successivo del chunk
+        if choice == "p":
+            try:
+                player.play(video_path, point)
+                point += 1
+            except FileNotFoundError:
+                print("   ❌ ffplay non trovato!")
+            except RuntimeError as e:
+                print(f"   ❌ {e}")
+            
+            # Riproponi scelta (la preview continua in sottofondo)
+            print("   Lingua (invio=IT, e=ES, g=EN, f=FR, p=play): ", end="")
+            continue
+
+        # Input non valido
+        print("   ❌ Scelta non valida. ", end="")
+        print("Lingua (invio=IT, e=ES, g=EN, f=FR, p=play): ", end="")
+
+
+def switch_detect_languages(chunks: list[Path]) -> tuple[dict, dict]:
+    """
+    Rilevamento automatico con cambi lingua interni ai chunk (language_switch.py)
+    
+    Args:
+        chunks: Chunk video ordinati
+        
+    Returns:
+        Tupla (mappa {chunk: lingua prevalente}, {chunk: intervalli} solo per i chunk con cambi)
+    """
+    from language_switch import detect_switches, dominant_language
+    from models import load_whisper_model
+
+    extract_audio = importlib.import_module("3_transcription").extract_audio
+
+    device = get_device(WHISPER_DEVICE)
+    print(f"▶️  Caricamento modello {LANGUAGE_SWITCH_MODEL}...")
+    model = load_whisper_model(LANGUAGE_SWITCH_MODEL, device)
+    print("✅ Modello caricato\n")
+
+    language_map = {}
+    language_segments = {}
+    for i, chunk in enumerate(chunks, 1):
+        segments = detect_switches(model, extract_audio(chunk))
+        language_map[str(chunk)] = dominant_language(segments)
+
+        if len(segments) > 1:
+            language_segments[str(chunk)] = segments
+            switches = " → ".join(
+                f"{s['language'].upper()} {s['start']:.0f}-{s['end']:.0f}s" for s in segments
+            )
+            print(f"   [{i}/{len(chunks)}] 🔀 {chunk.name}: {switches}")
+        else:
+            print(f"   [{i}/{len(chunks)}] {chunk.name}: {language_map[str(chunk)].upper()}")
+
+    del model
+    return language_map, language_segments
+
+
+def detect_languages() -> dict:
+    """
+    Rileva lingua per tutti i chunk secondo LANGUAGE_DETECTION_MODE
+    
+    Returns:
+        Dict {percorso_chunk: codice_lingua}
+    """
+    print_header("RILEVAMENTO LINGUE")
+
+    chunks = sorted(CHUNKS_DIR.glob("chunk_*.mp4"))
+
+    if not chunks:
+        print("❌ Nessun chunk trovato! Esegui prima: python 1_chunking.py")
+        sys.exit(1)
+
+    print(f"📦 Trovati {len(chunks)} chunk")
+    print(f"🔧 Modalità: {LANGUAGE_DETECTION_MODE}\n")
+
+    language_map = {}
+    language_segments = {}
+
+    # === MODALITÀ MANUAL ===
+    if LANGUAGE_DETECTION_MODE == "manual":
+        print("👤 Classificazione manuale")
+        print("   • Invio = italiano (default)")
+        print("   • 'e'   = spagnolo")
+        print("   • 'g'   = inglese")
+        print("   • 'f'   = francese")
+        print(f"   • 'p'   = play {PREVIEW_SECONDS}s (di nuovo: punto successivo, {PREVIEW_POINTS} per chunk)\n")
+
+        # Risposte di una sessione interrotta: si riprende da dove si era rimasti
+        partial_file = CHUNKS_DIR / "language_map.partial.json"
+        if partial_file.exists():
+            language_map = json.loads(partial_file.read_text(encoding="utf-8"))
+            print(f"♻️  Riprendo: {len(language_map)} chunk già classificati")
+
+        player = PreviewPlayer([c for c in chunks if str(c) not in language_map], partial_file)
+        try:
+            for i, chunk in enumerate(chunks, 1):
+                if str(chunk) in language_map:
+                    continue
+                lang = manual_classify_language(chunk, i, len(chunks), player)
+                language_map[str(chunk)] = lang
+                player.record(language_map)
+
+                # Emoji per feedback visivo
+                emoji = {
+                    'it': '🇮🇹',
+                    'es': '🇪🇸',
+                    'en': '🇬🇧',
+                    'fr': '🇫🇷',
+                }.get(lang, '🌍')
+
+                print(f"   → {emoji} {lang.upper()}")
+        finally:
+            player.close()
+
+    # === MODALITÀ FIXED ===
+    elif LANGUAGE_DETECTION_MODE == "fixed":
+        print(f"📌 Lingua fissa: {FIXED_LANGUAGE.upper()}\n")
+        for chunk in chunks:
+            language_map[str(chunk)] = FIXED_LANGUAGE
+            
+            emoji = {
+                'it': '🇮🇹',
+                'es': '🇪🇸',
+                'en': '🇬🇧',
+                'fr': '🇫🇷',
+            }.get(FIXED_LANGUAGE, '🌍')
+            
+            print(f"   {emoji} {chunk.name}")
+
+    # === MODALITÀ SWITCH ===
+    elif LANGUAGE_DETECTION_MODE == "switch":
+        print(f"🔀 Lingua e cambi lingua per finestre da {LANGUAGE_SWITCH_WINDOW_SECONDS}s\n")
+        language_map, language_segments = switch_detect_languages(chunks)
+
+    # === MODALITÀ AUTO (default: tutto italiano) ===
+    else:
+        print("📌 Lingua predefinita: ITALIANO\n")
+        for chunk in chunks:
+            language_map[str(chunk)] = "it"
+            print(f"   🇮🇹 {chunk.name}")
+
+    # Statistiche finali
+    print_section("RIEPILOGO")
+
+    stats = {}
+    for lang in language_map.values():
+        stats[lang] = stats.get(lang, 0) + 1
+
+    emoji_map = {'it': '🇮🇹', 'es': '🇪🇸', 'en': '🇬🇧', 'fr': '🇫🇷'}
+    for lang, count in sorted(stats.items()):
+        emoji = emoji_map.get(lang, '🌍')
+        lang_name = {'it': 'Italiano', 'es': 'Spagnolo', 'en': 'Inglese', 'fr': 'Francese'}.get(lang, lang.upper())
+        print(f"{emoji} {lang_name}: {count} chunk")
+    print()
+
+    # Salva mappa
+    map_file = CHUNKS_DIR / "language_map.json"
+    map_file.write_text(json.dumps(language_map, indent=2), encoding="utf-8")
+    (CHUNKS_DIR / "language_map.partial.json").unlink(missing_ok=True)
+    print(f"💾 Mappa salvata: {map_file}")
+
+    # Intervalli per i chunk con cambio lingua interno (solo modalità switch)
+    segments_file = CHUNKS_DIR / "language_segments.json"
+    if language_segments:
+        segments_file.write_text(json.dumps(language_segments, indent=2), encoding="utf-8")
+        print(f"💾 Cambi lingua interni: {len(language_segments)} chunk → {segments_file}")
+    else:
+        segments_file.unlink(missing_ok=True)
+    print()
+
+    return language_map
+
+
+def main():
+    """Esegue detection e salva mappa"""
+    
+    language_map = detect_languages()
+
+    if language_map:
+        print("✅ Rilevamento completato!")
+        print("➡️  Prossimo step: python 3_transcription.py")
+
+
+if __name__ == "__main__":
+    with stage_io("language_detection"):
+        main()
\ No newline at end of file
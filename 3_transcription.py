@@ -1,248 +1,1166 @@
-"""
-STEP 3: Trascrizione con Whisper
-
-Trascrive ogni chunk usando la lingua rilevata.
-Gestisce overlap tra chunk e cambio lingua.
-"""
-
-from pathlib import Path
-import subprocess
-import json
-import sys
-import torch
-import whisper
-import gc
-from config import *
-from utils import *
-
-
-def extract_audio(video_path: Path) -> Path:
-    """
-    Estrae traccia audio da video in formato WAV mono 16kHz (richiesto da Whisper)
-    
-    Args:
-        video_path: Percorso chunk video
-        
-    Returns:
-        Percorso file WAV estratto (cache, se esiste già non rielabora)
-    """
-    wav_path = video_path.with_suffix(".wav")
-
-    # Cache: se WAV già esiste, riutilizza
-    if wav_path.exists():
-        return wav_path
-    
-    # Estrae audio: mono (-ac 1), 16kHz (-ar 16000)
-    cmd = [
-        "ffmpeg", "-y", "-i", str(video_path),
-        "-vn",           # No video
-        "-ac", "1",      # Mono
-        "-ar", "16000",  # 16kHz sample rate
-        "-f", "wav", str(wav_path)
-    ]
-    subprocess.run(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, check=True)
-
-    return wav_path
-
-
-def clean_overlap(prev: str, curr: str, overlap_second: int = 2) -> str:
-    """
-    Rimuove sovrapposizione tra chunk consecutivi
-    
-    Algoritmo:
-    1. Cerca pattern comune tra fine di prev e inizio di curr
-    2. Match minimo: 30 caratteri (~1.2 secondi di parlato italiano)
-    3. Stima: ~25 caratteri/secondo in italiano medio
-    
-    Args:
-        prev: Testo chunk precedente
-        curr: Testo chunk corrente
-        overlap_second: Secondi di overlap configurati
-        
-    Returns:
-        Testo curr senza duplicazione
-    """
-    if not prev:
-        return curr
-    
-    # Cerca solo nella coda di prev (zona overlap stimata)
-    max_overlap_chars = overlap_second * 25  # ~25 caratteri/secondo
-    tail = prev[-max_overlap_chars:]
-
-    min_match_len = 30  # ~1.2s di parlato, evita falsi positivi
-    best_cut = 0
-
-    # Cerca il match più lungo tra tail e inizio di curr
-    for i in range(len(tail) - min_match_len):
-        match_len = 0
-        
-        # BUG FIX 1: Era ">" invece di "<" (loop usciva subito)
-        # Continua FINCHÉ c'è spazio, non quando finisce
-        while (i + match_len < len(tail) and 
-               match_len < len(curr) and
-               tail[i + match_len].lower() == curr[match_len].lower()):
-            match_len += 1
-
-        if match_len >= min_match_len:
-            best_cut = match_len
-            break
-
-    # BUG FIX 2: Questo blocco era DENTRO il for (eseguiva ad ogni iterazione)
-    # Deve eseguirsi DOPO il loop, una volta trovato il match
-    if best_cut > 0:
-        cleaned = curr[best_cut:].lstrip()
-        overlap_text = curr[:best_cut]
-        print(f"      🔗 Overlap rimosso ({best_cut} char): \"{overlap_text[:40]}...\"")
-        return cleaned
-    
-    return curr
-
-
-def transcribe_chunk(model, wav_path: Path, language: str, device: str, config: dict) -> str:
-    """
-    Trascrive singolo chunk con Whisper
-    
-    Args:
-        model: Modello Whisper caricato
-        wav_path: Percorso audio WAV
-        language: Codice lingua ('it', 'es', 'en', 'fr')
-        device: 'cuda' o 'cpu'
-        config: Configurazione beam_size/best_of dal MODEL_CONFIGS
-        
-    Returns:
-        Testo trascritto
-    """
-    initial_prompts = INITIAL_PROMPT
-
-    result = model.transcribe(
-        str(wav_path),
-        task="transcribe",
-        language=language,
-        # BUG FIX 3: Era "initial_prompts" (plurale), parametro corretto è "initial_prompt"
-        initial_prompt=initial_prompts.get(language, ""),
-        fp16=(device == "cuda"),          # Precisione mista su GPU
-        verbose=False,
-        beam_size=config["beam_size"],    # Ricerca fascio (qualità)
-        best_of=config["best_of"],        # Candidati da valutare
-        temperature=0.0,                  # Deterministico (no random)
-        condition_on_previous_text=False  # Ogni chunk indipendente
-    )
-
-    return result["text"].strip()
-
-
-def transcribe_all():
-    """Pipeline completa trascrizione tutti i chunk"""
-    
-    print_header("TRASCRIZIONE WHISPER")
-
-    # Carica mappa lingue
-    map_file = CHUNKS_DIR / "language_map.json"
-
-    if not map_file.exists():
-        print("❌ Language map non trovata!")
-        print("   Esegui prima: python 2_language_detection.py")
-        sys.exit(1)
-    
-    with open(map_file, encoding="utf-8") as f:
-        language_map = json.load(f)
-
-    chunks = sorted(CHUNKS_DIR.glob("chunk_*.mp4"))
-
-    if not chunks:
-        print("❌ Nessun chunk trovato!")
-        sys.exit(1)
-    
-    print(f"📦 Chunk da trascrivere: {len(chunks)}")
-    print(f"🤖 Modello: {WHISPER_MODEL}")
-    
-    device = get_device()
-    print()
-
-    # Carica modello Whisper
-    print(f"▶️  Caricamento modello {WHISPER_MODEL}...")
-    model = whisper.load_model(WHISPER_MODEL, device=device)
-    config = MODEL_CONFIGS[WHISPER_MODEL]
-    print("✅ Modello caricato\n")
-    
-    # Crea output directory
-    OUTPUT_DIR.mkdir(exist_ok=True)
-    
-    # Variabili accumulo
-    full_text = ""
-    # BUG FIX 4: Inizializza tutte le lingue supportate per evitare KeyError
-    stats = {'it': 0, 'es': 0, 'en': 0, 'fr': 0}
-    prev_lang = None
-
-    # Loop trascrizione
-    for idx, chunk in enumerate(chunks, 1):
-        lang = language_map.get(str(chunk), "it")
-        stats[lang] = stats.get(lang, 0) + 1  # Usa .get() per sicurezza
-
-        # Emoji lingua per feedback visivo
-        lang_emoji = {
-            'it': '🇮🇹',
-            'es': '🇪🇸',
-            'en': '🇬🇧',
-            'fr': '🇫🇷',
-        }.get(lang, '🌍')
-        
-        print(f"▶️  [{idx}/{len(chunks)}] {lang_emoji} {chunk.name}")
-
-        # Estrai audio
-        wav_path = extract_audio(chunk)
-        print(f"   ├─ Audio: {wav_path.name}")
-            
-        # Trascrivi
-        print(f"   ├─ Trascrizione...", end=" ", flush=True)
-        text = transcribe_chunk(model, wav_path, lang, device, config)
-        print(f"✅ ({len(text)} char)")
-            
-        # Gestione overlap e cambio lingua
-        if full_text and prev_lang == lang:
-            # Stessa lingua → rimuovi overlap
-            print(f"   ├─ Controllo overlap...")
-            text = clean_overlap(full_text, text, OVERLAP_SECONDS)
-        elif prev_lang and prev_lang != lang:
-            # Cambio lingua → separatore visivo
-            full_text += "\n\n--- CAMBIO LINGUA ---\n\n"
-            print(f"   ├─ 🔄 Cambio lingua: {prev_lang.upper()} → {lang.upper()}")
-        
-        full_text += text + " "
-        prev_lang = lang
-        
-        # Salva progressivo (non perdi tutto se crasha)
-        output_raw = OUTPUT_DIR / "trascrizione_raw.txt"
-        output_raw.write_text(full_text, encoding="utf-8")
-        print(f"   └─ 💾 Salvato progressivo\n")
-        
-        # Libera memoria GPU
-        if device == "cuda":
-            torch.cuda.empty_cache()
-    
-    # Cleanup finale memoria
-    del model
-    if device == "cuda":
-        torch.cuda.empty_cache()
-    gc.collect()
-
-    # Statistiche finali
-    print_section("STATISTICHE")
-    print(f"🇮🇹 Chunk italiani:  {stats.get('it', 0)}")
-    print(f"🇪🇸 Chunk spagnoli:  {stats.get('es', 0)}")
-    print(f"🇬🇧 Chunk inglesi:   {stats.get('en', 0)}")
-    print(f"🇫🇷 Chunk francesi:  {stats.get('fr', 0)}")
-    print(f"📝 Caratteri totali: {len(full_text):,}")
-    print(f"💾 File: {output_raw}\n")
-    
-    print("✅ Trascrizione completata!")
-    print("➡️  Prossimo step (opzionale): python 4_correction.py")
-
-
-def main():
-    """Entry point"""
-    transcribe_all()
-
-
-if __name__ == "__main__":
-    main()
\ No newline at end of file
+"""
+STEP 3: Trascrizione con Whisper
+
+Trascrive ogni chunk usando la lingua rilevata.
+Gestisce overlap tra chunk e cambio lingua.
+"""
+
+from pathlib import Path
+import subprocess
+import json
+import hashlib
+import math
+import os
+import sys
+import time
+import gc
+from config import *
+from utils import get_device, get_video_duration, print_header, print_section
+from concurrent.futures.process import BrokenProcessPool
+from workers import Dispatcher, merge_stats
+from batch_engine import transcribe_batched
+from fingerprint import FingerprintIndex
+from model_server import RemoteModel, connect_model_server
+from planner import Replanner, load_plan
+from profiling import profile_stage, written as profiles_written
+import progress
+from segment_store import STORE_FILE, SegmentStoreWriter
+from storage import (
+    audio_codec_args,
+    audio_path,
+    commit_chunk,
+    ensure_budget,
+    estimate_audio_bytes,
+    release_committed,
+    released,
+    stage_io,
+)
+from vad import compact_audio, detect_speech, load_audio, remap_segments
+from models import load_whisper_model
+from memory_watchdog import MemoryWatchdog, smaller_model
+from segments import (
+    find_repetition_loops,
+    is_low_confidence,
+    merge_ranges,
+    pad_range,
+    segments_to_text,
+    splice_segments,
+    to_clip_timestamps,
+    total_duration,
+)
+
+# torch e whisper sono importati in transcribe_all solo se il modello è locale:
+# con il model server attivo questo step non li carica affatto
+
+
+def extract_audio(video_path: Path) -> Path:
+    """
+    Estrae traccia audio da video mono 16kHz (richiesto da Whisper)
+    
+    Formato (WAV o FLAC) e cartella (accanto al chunk o STAGING_DIR) da storage.py.
+    
+    Args:
+        video_path: Percorso chunk video
+        
+    Returns:
+        Percorso file audio estratto (cache, se esiste già non rielabora)
+        
+    Raises:
+        RuntimeError: Se l'audio non sta nel DISK_BUDGET_MB
+    """
+    wav_path = audio_path(video_path)
+
+    # Cache: se l'audio già esiste, riutilizza
+    if wav_path.exists():
+        return wav_path
+
+    ensure_budget(estimate_audio_bytes(MAX_CHUNK_SECONDS))
+    wav_path.parent.mkdir(parents=True, exist_ok=True)
+    
+    # Estrae audio: mono (-ac 1), 16kHz (-ar 16000)
+    # Scrittura atomica: un processo interrotto non lascia in cache un file troncato
+    tmp_path = wav_path.with_name(f"{wav_path.stem}.tmp{wav_path.suffix}")
+    cmd = [
+        "ffmpeg", "-y", "-i", str(video_path),
+        "-vn",           # No video
+        "-ac", "1",      # Mono
+        "-ar", "16000",  # 16kHz sample rate
+        *audio_codec_args(), str(tmp_path)
+    ]
+    subprocess.run(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, check=True)
+    os.replace(tmp_path, wav_path)
+
+    return wav_path
+
+
+def cut_audio(wav_path: Path, start: float, end: float) -> Path:
+    """
+    Ritaglia un intervallo dell'audio di un chunk (cache come extract_audio)
+    
+    Args:
+        wav_path: Audio del chunk
+        start: Inizio in secondi
+        end: Fine in secondi
+        
+    Returns:
+        Percorso dell'audio ritagliato (stesso formato)
+    """
+    part_path = wav_path.with_name(f"{wav_path.stem}_{start:.2f}-{end:.2f}{wav_path.suffix}")
+
+    if part_path.exists():
+        return part_path
+
+    ensure_budget(estimate_audio_bytes(end - start))
+    # Scrittura atomica come extract_audio: un ritaglio troncato non entra in cache
+    tmp_path = part_path.with_name(f"{part_path.stem}.tmp{part_path.suffix}")
+    cmd = [
+        "ffmpeg", "-y", "-i", str(wav_path),
+        "-ss", f"{start:.2f}", "-to", f"{end:.2f}",
+        "-ac", "1", "-ar", "16000",
+        *audio_codec_args(), str(tmp_path)
+    ]
+    subprocess.run(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, check=True)
+    os.replace(tmp_path, part_path)
+
+    return part_path
+
+
+def chunk_pieces(chunk: Path, language_map: dict, language_segments: dict) -> list[tuple[str, Path, str, float]]:
+    """
+    Parti del chunk da trascrivere, ognuna con la sua lingua
+    
+    Senza cambi lingua interni (language_segments.json) il chunk è un pezzo solo;
+    altrimenti un pezzo per intervallo, tagliato nel punto di cambio rilevato.
+    
+    Returns:
+        Lista di (chiave, percorso WAV, codice lingua, inizio del pezzo nel chunk in secondi)
+    """
+    wav_path = extract_audio(chunk)
+    segments = language_segments.get(str(chunk))
+
+    if not segments:
+        return [(str(chunk), wav_path, language_map.get(str(chunk), "it"), 0.0)]
+
+    return [
+        (f"{chunk}#{i}", cut_audio(wav_path, segment["start"], segment["end"]), segment["language"], segment["start"])
+        for i, segment in enumerate(segments)
+    ]
+
+
+def chunk_offsets(chunks: list[Path]) -> dict:
+    """
+    Inizio di ogni chunk nel video (secondi), da chunks_info.json
+    
+    Senza chunks_info.json ricostruisce gli inizi come 1_chunking.py
+    (passo MAX_CHUNK_SECONDS - OVERLAP_SECONDS).
+    
+    Returns:
+        Dict {percorso_chunk: inizio in secondi}
+    """
+    info_file = CHUNKS_DIR / "chunks_info.json"
+    if info_file.exists():
+        info = json.loads(info_file.read_text(encoding="utf-8"))
+        return {c["path"]: c["start_seconds"] for c in info}
+    return {str(chunk): i * (MAX_CHUNK_SECONDS - OVERLAP_SECONDS) for i, chunk in enumerate(chunks)}
+
+
+def chunk_durations(chunks: list[Path]) -> dict:
+    """
+    Durata di ogni chunk (secondi), da chunks_info.json
+    
+    Senza chunks_info.json (o per chunk non elencati) la misura con ffprobe.
+    
+    Returns:
+        Dict {percorso_chunk: durata in secondi}
+    """
+    info_file = CHUNKS_DIR / "chunks_info.json"
+    known = {}
+    if info_file.exists():
+        info = json.loads(info_file.read_text(encoding="utf-8"))
+        known = {c["path"]: c["duration_seconds"] for c in info}
+    return {str(chunk): known.get(str(chunk)) or get_video_duration(chunk) for chunk in chunks}
+
+
+def check_upfront_budget(chunks: list[Path], language_segments: dict) -> None:
+    """
+    Verifica che l'audio di tutti i chunk stia in DISK_BUDGET_MB (motori batched e worker)
+
+    Questi motori estraggono l'audio di ogni chunk prima di trascriverne uno:
+    nessun chunk è ancora trascritto, quindi ensure_budget non ha nulla da
+    liberare e fallirebbe a metà estrazione. Meglio fermarsi subito.
+    """
+    if DISK_BUDGET_MB is None:
+        return
+
+    pending = [chunk for chunk in chunks if not audio_path(chunk).exists()]
+    durations = chunk_durations(pending)
+    # Con cambi lingua ai ritagli si aggiunge l'audio intero del chunk
+    seconds = sum(
+        durations[str(chunk)] * (2 if language_segments.get(str(chunk)) else 1)
+        for chunk in pending
+    )
+
+    try:
+        ensure_budget(estimate_audio_bytes(seconds))
+    except RuntimeError as e:
+        print(f"❌ {e}")
+        print("   Batched e worker estraggono l'audio di tutti i chunk all'inizio:")
+        print("   il budget libera spazio chunk per chunk solo con il motore sequential e 1 worker")
+        sys.exit(1)
+
+
+def clean_overlap(prev: str, curr: str, overlap_second: int = 2) -> str:
+    """
+    Rimuove sovrapposizione tra chunk consecutivi
+    
+    Algoritmo:
+    1. Cerca pattern comune tra fine di prev e inizio di curr
+    2. Match minimo: 30 caratteri (~1.2 secondi di parlato italiano)
+    3. Stima: ~25 caratteri/secondo in italiano medio
+    
+    Args:
+        prev: Testo chunk precedente
+        curr: Testo chunk corrente
+        overlap_second: Secondi di overlap configurati
+        
+    Returns:
+        Testo curr senza duplicazione
+    """
+    if not prev:
+        return curr
+    
+    # Cerca solo nella coda di prev (zona overlap stimata)
+    max_overlap_chars = overlap_second * 25  # ~25 caratteri/secondo
+    tail = prev[-max_overlap_chars:]
+
+    min_match_len = 30  # ~1.2s di parlato, evita falsi positivi
+    best_cut = 0
+
+    # Cerca il match più lungo tra tail e inizio di curr
+    for i in range(len(tail) - min_match_len):
+        match_len = 0
+        
+        # BUG FIX 1: Era ">" invece di "<" (loop usciva subito)
+        # Continua FINCHÉ c'è spazio, non quando finisce
+        while (i + match_len < len(tail) and 
+               match_len < len(curr) and
+               tail[i + match_len].lower() == curr[match_len].lower()):
+            match_len += 1
+
+        if match_len >= min_match_len:
+            best_cut = match_len
+            break
+
+    # BUG FIX 2: Questo blocco era DENTRO il for (eseguiva ad ogni iterazione)
+    # Deve eseguirsi DOPO il loop, una volta trovato il match
+    if best_cut > 0:
+        cleaned = curr[best_cut:].lstrip()
+        overlap_text = curr[:best_cut]
+        print(f"      🔗 Overlap rimosso ({best_cut} char): \"{overlap_text[:40]}...\"")
+        return cleaned
+    
+    return curr
+
+
+def append_transcript(full_text: str, text: str, prev_lang: str | None, lang: str,
+                      index: int | None = None) -> str:
+    """
+    Accoda il testo di un chunk (o di un suo pezzo) alla trascrizione
+    
+    Stessa lingua del pezzo precedente → rimuove l'overlap; lingua diversa →
+    separatore CAMBIO LINGUA (anche a metà chunk, nel punto rilevato).
+    
+    Args:
+        full_text: Trascrizione accumulata finora
+        text: Testo del pezzo
+        prev_lang: Lingua del pezzo precedente (None se è il primo)
+        lang: Lingua del pezzo
+        index: Indice del chunk (per il profiling di clean_overlap)
+        
+    Returns:
+        Trascrizione aggiornata
+    """
+    if full_text and prev_lang == lang:
+        # Stessa lingua → rimuovi overlap
+        print(f"   ├─ Controllo overlap...")
+        with profile_stage("clean_overlap", index):
+            text = clean_overlap(full_text, text, OVERLAP_SECONDS)
+    elif prev_lang and prev_lang != lang:
+        # Cambio lingua → separatore visivo
+        full_text += "\n\n--- CAMBIO LINGUA ---\n\n"
+        print(f"   ├─ 🔄 Cambio lingua: {prev_lang.upper()} → {lang.upper()}")
+
+    return full_text + text + " "
+
+
+def whisper_options(language: str, device: str, config: dict) -> dict:
+    """
+    Opzioni di model.transcribe comuni a tutte le modalità di decoding
+    
+    Args:
+        language: Codice lingua ('it', 'es', 'en', 'fr')
+        device: 'cuda' o 'cpu'
+        config: Configurazione beam_size/best_of dal MODEL_CONFIGS
+        
+    Returns:
+        Dict di keyword argument per model.transcribe
+    """
+    initial_prompts = INITIAL_PROMPT
+
+    return dict(
+        task="transcribe",
+        language=language,
+        # BUG FIX 3: Era "initial_prompts" (plurale), parametro corretto è "initial_prompt"
+        initial_prompt=initial_prompts.get(language, ""),
+        fp16=(device == "cuda"),          # Precisione mista su GPU
+        verbose=False,
+        beam_size=config["beam_size"],    # Ricerca fascio (qualità)
+        best_of=config["best_of"],        # Candidati da valutare
+        temperature=0.0,                  # Deterministico (no random)
+        condition_on_previous_text=False, # Ogni chunk indipendente
+        word_timestamps=WORD_TIMESTAMPS   # Tempi per parola (archivio segmenti)
+    )
+
+
+def decoding_signature(language: str, config: dict, cascade: bool = False) -> str:
+    """
+    Impronta delle impostazioni che cambiano il testo prodotto per una lingua
+    
+    Prompt, beam/best_of, modalità di decoding, precisione, motore, VAD,
+    riparazione dei loop e cascata: è la chiave di riuso dell'indice dei
+    fingerprint insieme a lingua e modello. Cambiandone una le trascrizioni
+    già indicizzate non vengono riusate.
+    
+    Args:
+        language: Codice lingua (il prompt iniziale dipende dalla lingua)
+        config: Configurazione beam_size/best_of usata
+        cascade: Trascrizione in cascata (CASCADE_FAST_MODEL → modello principale)
+        
+    Returns:
+        Hash esadecimale (16 caratteri)
+    """
+    options = whisper_options(language, WHISPER_DEVICE, config)
+    del options["verbose"]
+    settings = {
+        "options": options,
+        "engine": TRANSCRIPTION_ENGINE,
+        "decoding": "cascade" if cascade else DECODING_MODE,
+        "confidence": CONFIDENCE_THRESHOLDS if cascade or DECODING_MODE == "adaptive" else None,
+        "cascade": [CASCADE_FAST_MODEL, CASCADE_WINDOW_SECONDS] if cascade else None,
+        "compute_type": WHISPER_COMPUTE_TYPE,
+        "vad": [VAD_THRESHOLD_DB, VAD_MIN_SILENCE_SECONDS, VAD_PADDING_SECONDS, VAD_MODULATION_DB]
+        if VAD_ENABLED else None,
+        "loop_repair": [LOOP_NGRAM, LOOP_MAX_REPEATS, LOOP_MAX_COMPRESSION_RATIO, LOOP_WINDOW_SECONDS,
+                        list(LOOP_FALLBACK_TEMPERATURES)]
+        if LOOP_REPAIR_ENABLED else None,
+    }
+    return hashlib.sha256(json.dumps(settings, sort_keys=True).encode("utf-8")).hexdigest()[:16]
+
+
+def decode_adaptive(model, audio, language: str, device: str, config: dict, stats: dict) -> list[dict]:
+    """
+    Decoding adattivo: greedy ovunque, beam search solo dove serve
+    
+    Algoritmo:
+    1. Prima passata greedy su tutto il chunk (costo ~1 candidato per token)
+    2. Segmenti fuori da CONFIDENCE_THRESHOLDS → intervalli di tempo
+    3. Seconda passata con il beam configurato SOLO su quegli intervalli (clip_timestamps)
+    4. I segmenti beam sostituiscono quelli greedy negli stessi intervalli
+    
+    Args:
+        model: Modello Whisper caricato
+        audio: Percorso audio o array float32 16kHz
+        language: Codice lingua
+        device: 'cuda' o 'cpu'
+        config: Configurazione beam_size/best_of dal MODEL_CONFIGS
+        stats: Contatori aggiornati in-place (segmenti totali/ri-decodificati, secondi)
+        
+    Returns:
+        Segmenti ricuciti
+    """
+    options = whisper_options(language, device, config)
+
+    # beam_size/best_of = None → decoding greedy
+    greedy = model.transcribe(audio, **{**options, "beam_size": None, "best_of": None})
+    segments = greedy["segments"]
+
+    flagged = [s for s in segments if is_low_confidence(s, CONFIDENCE_THRESHOLDS)]
+    stats["segments"] = stats.get("segments", 0) + len(segments)
+    stats["redecoded_segments"] = stats.get("redecoded_segments", 0) + len(flagged)
+    stats["audio_seconds"] = stats.get("audio_seconds", 0.0) + (segments[-1]["end"] if segments else 0.0)
+
+    if not flagged:
+        return segments
+
+    ranges = merge_ranges([(s["start"], s["end"]) for s in flagged])
+    stats["redecoded_seconds"] = stats.get("redecoded_seconds", 0.0) + total_duration(ranges)
+
+    beam = model.transcribe(audio, **options, clip_timestamps=to_clip_timestamps(ranges))
+    return splice_segments(segments, beam["segments"], ranges)
+
+
+def repair_loops(model, audio, segments: list[dict], language: str, device: str, config: dict,
+                 stats: dict) -> list[dict]:
+    """
+    Ri-decodifica solo le finestre con loop di ripetizione
+    
+    Algoritmo:
+    1. find_repetition_loops individua i segmenti in loop (n-grammi ripetuti,
+       compression ratio, segmenti consecutivi identici)
+    2. Ogni loop è allargato a una finestra di LOOP_WINDOW_SECONDS (la finestra nativa di Whisper)
+    3. Le finestre sono ri-decodificate (clip_timestamps) con LOOP_FALLBACK_TEMPERATURES:
+       Whisper passa alla temperatura successiva finché il testo supera la soglia di compressione
+    4. I segmenti ri-decodificati sostituiscono quelli in loop
+    
+    Args:
+        model: Modello Whisper caricato
+        audio: Percorso audio o array float32 16kHz (lo stesso della prima passata)
+        segments: Segmenti della prima passata
+        language: Codice lingua
+        device: 'cuda' o 'cpu'
+        config: Configurazione beam_size/best_of dal MODEL_CONFIGS
+        stats: Contatori aggiornati in-place (segmenti in loop, finestre, secondi ri-decodificati)
+        
+    Returns:
+        Segmenti ricuciti (invariati se non ci sono loop)
+    """
+    looped = find_repetition_loops(segments, LOOP_NGRAM, LOOP_MAX_REPEATS, LOOP_MAX_COMPRESSION_RATIO)
+    if not looped:
+        return segments
+
+    # L'ultimo segmento approssima la durata senza rileggere l'audio
+    limit = max(s["end"] for s in segments)
+    windows = merge_ranges([
+        pad_range(s["start"], s["end"], LOOP_WINDOW_SECONDS, limit) for s in looped
+    ])
+
+    options = {
+        **whisper_options(language, device, config),
+        "temperature": LOOP_FALLBACK_TEMPERATURES,
+        "compression_ratio_threshold": LOOP_MAX_COMPRESSION_RATIO,
+    }
+    t0 = time.perf_counter()
+    redecoded = model.transcribe(audio, **options, clip_timestamps=to_clip_timestamps(windows))["segments"]
+    remaining = find_repetition_loops(redecoded, LOOP_NGRAM, LOOP_MAX_REPEATS, LOOP_MAX_COMPRESSION_RATIO)
+
+    stats["loop_segments"] = stats.get("loop_segments", 0) + len(looped)
+    stats["loop_windows"] = stats.get("loop_windows", 0) + len(windows)
+    stats["loop_redecoded_seconds"] = stats.get("loop_redecoded_seconds", 0.0) + total_duration(windows)
+    stats["loop_time"] = stats.get("loop_time", 0.0) + time.perf_counter() - t0
+    stats["loop_remaining_segments"] = stats.get("loop_remaining_segments", 0) + len(remaining)
+
+    return splice_segments(segments, redecoded, windows)
+
+
+def compact_speech(wav_path: str, stats: dict):
+    """
+    Carica l'audio e tiene solo i tratti di parlato (VAD)
+    
+    Aggiorna in stats i secondi saltati e le finestre da 30s risparmiate
+    (il costo di Whisper è proporzionale alle finestre elaborate).
+    
+    Returns:
+        Tupla (audio compattato float32 16kHz, OffsetMap)
+    """
+    audio = load_audio(wav_path)
+    audio_seconds = len(audio) / 16000
+    compacted, offset_map = compact_audio(audio, detect_speech(audio))
+    speech_seconds = len(compacted) / 16000
+
+    stats["vad_audio_seconds"] = stats.get("vad_audio_seconds", 0.0) + audio_seconds
+    stats["vad_skipped_seconds"] = stats.get("vad_skipped_seconds", 0.0) + audio_seconds - speech_seconds
+    stats["vad_windows_total"] = stats.get("vad_windows_total", 0) + math.ceil(audio_seconds / 30)
+    stats["vad_windows_run"] = stats.get("vad_windows_run", 0) + math.ceil(speech_seconds / 30)
+    return compacted, offset_map
+
+
+def decode_cascade(fast_model, accurate_model, audio: str, duration: float, language: str,
+                   device: str, stats: dict) -> list[dict]:
+    """
+    Cascata a due modelli: modello veloce ovunque, modello accurato solo dove serve
+    
+    Algoritmo:
+    1. CASCADE_FAST_MODEL trascrive tutto il chunk
+    2. Segmenti fuori da CONFIDENCE_THRESHOLDS → finestre di CASCADE_WINDOW_SECONDS
+       (Whisper lavora comunque su 30s: finestre più corte non costano meno)
+    3. WHISPER_MODEL ri-trascrive solo le finestre (clip_timestamps)
+    4. I segmenti accurati sostituiscono quelli veloci nelle finestre
+    
+    Args:
+        fast_model: Modello veloce
+        accurate_model: Modello accurato (WHISPER_MODEL)
+        audio: Percorso audio
+        duration: Durata audio in secondi
+        language: Codice lingua
+        device: 'cuda' o 'cpu'
+        stats: Contatori aggiornati in-place (secondi audio e tempi per livello)
+        
+    Returns:
+        Segmenti ricuciti
+    """
+    t0 = time.perf_counter()
+    fast_options = whisper_options(language, device, MODEL_CONFIGS[CASCADE_FAST_MODEL])
+    segments = fast_model.transcribe(audio, **fast_options)["segments"]
+    stats["fast_time"] = stats.get("fast_time", 0.0) + time.perf_counter() - t0
+    stats["audio_seconds"] = stats.get("audio_seconds", 0.0) + duration
+
+    flagged = [s for s in segments if is_low_confidence(s, CONFIDENCE_THRESHOLDS)]
+    if not flagged:
+        return segments
+
+    windows = merge_ranges([
+        pad_range(s["start"], s["end"], CASCADE_WINDOW_SECONDS, duration) for s in flagged
+    ])
+
+    t0 = time.perf_counter()
+    accurate_options = whisper_options(language, device, MODEL_CONFIGS[WHISPER_MODEL])
+    accurate = accurate_model.transcribe(audio, **accurate_options, clip_timestamps=to_clip_timestamps(windows))
+    stats["accurate_time"] = stats.get("accurate_time", 0.0) + time.perf_counter() - t0
+    stats["accurate_seconds"] = stats.get("accurate_seconds", 0.0) + total_duration(windows)
+
+    return splice_segments(segments, accurate["segments"], windows)
+
+
+def cascade_report(stats: dict) -> dict:
+    """
+    Riepilogo cascata: quota di audio per livello e speedup stimato
+    
+    Lo speedup confronta il tempo reale con quello stimato se WHISPER_MODEL
+    avesse trascritto tutto (tempo accurato estrapolato sulla durata totale).
+    """
+    audio_seconds = stats.get("audio_seconds", 0.0)
+    accurate_seconds = stats.get("accurate_seconds", 0.0)
+    elapsed = stats.get("fast_time", 0.0) + stats.get("accurate_time", 0.0)
+
+    report = {
+        "fast_model": CASCADE_FAST_MODEL,
+        "accurate_model": WHISPER_MODEL,
+        "audio_seconds": audio_seconds,
+        "accurate_audio_fraction": accurate_seconds / audio_seconds if audio_seconds else 0.0,
+        "elapsed_seconds": elapsed,
+        "estimated_speedup": None,
+    }
+    if accurate_seconds > 0 and elapsed > 0:
+        accurate_only = stats["accurate_time"] / accurate_seconds * audio_seconds
+        report["estimated_speedup"] = accurate_only / elapsed
+    return report
+
+
+def open_model(model_key: str, device: str | None = None, load_local: bool = True):
+    """
+    Modello dal model server se attivo, altrimenti caricato localmente
+    
+    Args:
+        model_key: Chiave MODEL_CONFIGS
+        device: Device già scelto (None = rileva da WHISPER_DEVICE)
+        load_local: False = senza server non carica nulla (modello None),
+                    per chi caricherà il modello altrove (worker)
+        
+    Returns:
+        Tupla (modello, device, True se locale)
+    """
+    # Model server residente: se attivo, niente caricamento locale
+    model = connect_model_server(model_key) if MODEL_SERVER_ENABLED else None
+
+    if model is not None:
+        print(f"🔌 Model server: {MODEL_SERVER_SOCKET} ({model_key}, device {model.device})\n")
+        return model, model.device, False
+
+    if device is None:
+        device = get_device(WHISPER_DEVICE)
+        print()
+
+    if not load_local:
+        return None, device, True
+
+    # Carica modello Whisper
+    print(f"▶️  Caricamento modello {model_key}...")
+    model = load_whisper_model(model_key, device)
+    print("✅ Modello caricato\n")
+    return model, device, True
+
+
+def transcribe_batched_watched(model, jobs: list[tuple[str, Path, str]], device: str, config: dict,
+                               watchdog: MemoryWatchdog) -> dict[str, list[dict]]:
+    """
+    Motore batched a gruppi di chunk, con batch dimezzato sotto pressione di memoria
+    
+    Il batch size decide la memoria di picco della decodifica: tra un gruppo
+    di BATCH_GROUP_JOBS chunk e l'altro il watchdog può ridurlo.
+    
+    Returns:
+        Dict {chiave chunk: segmenti} come transcribe_batched
+    """
+    batch_size = BATCH_SIZE
+    segments = {}
+    for start in range(0, len(jobs), BATCH_GROUP_JOBS):
+        group = jobs[start:start + BATCH_GROUP_JOBS]
+        level = watchdog.level()
+        if level != "ok" and batch_size > 1:
+            watchdog.record("shrink_batch", group[0][0], batch_size, batch_size // 2)
+            batch_size //= 2
+        elif level != "ok" and watchdog.can_wait() and watchdog.held_by_others():
+            recovered = watchdog.wait_for_memory()
+            watchdog.record("wait", group[0][0], level, "ok" if recovered else level)
+        segments.update(transcribe_batched(model, group, device, config, batch_size))
+    return segments
+
+
+def collect_from_pool(dispatcher: Dispatcher, key: str, watchdog: MemoryWatchdog | None) -> tuple[list[dict], dict]:
+    """
+    Risultato di un chunk dal pool; se un worker muore (OOM killer) il pool riparte degradato
+    
+    Prima si dimezzano i worker, con un solo worker si passa al modello più piccolo.
+    Senza watchdog l'errore si propaga come prima.
+    
+    Raises:
+        BrokenProcessPool: Se non c'è più niente da ridurre
+    """
+    while True:
+        try:
+            return dispatcher.result(key)
+        except BrokenProcessPool:
+            smaller = smaller_model(dispatcher.model_key)
+            if watchdog is None or (dispatcher.workers == 1 and smaller is None):
+                raise
+            if dispatcher.workers > 1:
+                watchdog.record("worker_lost_shrink_workers", key, dispatcher.workers, dispatcher.workers // 2)
+                dispatcher.restart(workers=dispatcher.workers // 2)
+            else:
+                watchdog.record("worker_lost_smaller_model", key, dispatcher.model_key, smaller)
+                dispatcher.restart(model_key=smaller, config=MODEL_CONFIGS[smaller])
+
+
+def transcribe_uncovered(model, wav_path: Path, match: dict, language: str, device: str, config: dict,
+                         stats: dict) -> list[dict]:
+    """
+    Trascrive solo gli intervalli non coperti da audio già trascritto
+    
+    I tratti riconosciuti dal fingerprint (fingerprint.py) riusano i segmenti
+    salvati; Whisper decodifica il resto con clip_timestamps e i due insiemi
+    sono ricuciti. Niente VAD né decoding adattivo sugli intervalli scoperti.
+    
+    Args:
+        model: Modello Whisper caricato
+        wav_path: Percorso audio WAV
+        match: Risultato di FingerprintIndex.lookup (segmenti riusati e intervalli scoperti)
+        language: Codice lingua
+        device: 'cuda' o 'cpu'
+        config: Configurazione beam_size/best_of dal MODEL_CONFIGS
+        stats: Contatori di run (aggiornati in-place)
+        
+    Returns:
+        Segmenti completi del chunk
+    """
+    ranges = match["uncovered"]
+    options = whisper_options(language, device, config)
+    segments = model.transcribe(str(wav_path), **options, clip_timestamps=to_clip_timestamps(ranges))["segments"]
+    if LOOP_REPAIR_ENABLED:
+        segments = repair_loops(model, str(wav_path), segments, language, device, config, stats)
+    return splice_segments(match["segments"], segments, ranges)
+
+
+def lookup_jobs(fp_index: FingerprintIndex, jobs: list[tuple[str, Path, str]], model_key: str, config: dict,
+                matches: dict) -> list[tuple[str, Path, str]]:
+    """
+    Cerca l'audio dei job nell'indice dei fingerprint (motore batched e worker)
+    
+    Args:
+        fp_index: Indice dei fingerprint
+        jobs: Lista di (chiave, audio, lingua)
+        model_key: Modello che trascrive i job
+        config: Configurazione beam_size/best_of (per decoding_signature)
+        matches: Risultati di lookup per chiave (aggiornato in-place)
+        
+    Returns:
+        Job ancora da trascrivere: quelli riusati per intero sono tolti
+    """
+    for key, wav_path, lang in jobs:
+        matches[key] = fp_index.lookup(wav_path, lang, model_key, decoding_signature(lang, config))
+    return [job for job in jobs if matches[job[0]]["uncovered"]]
+
+
+def transcribe_chunk_segments(model, wav_path: Path, language: str, device: str, config: dict,
+                              stats: dict | None = None) -> list[dict]:
+    """
+    Trascrive singolo chunk con Whisper restituendo i segmenti (con timestamp)
+    
+    Args:
+        model: Modello Whisper caricato
+        wav_path: Percorso audio WAV
+        language: Codice lingua ('it', 'es', 'en', 'fr')
+        device: 'cuda' o 'cpu'
+        config: Configurazione beam_size/best_of dal MODEL_CONFIGS
+        stats: Contatori di run opzionali (aggiornati in-place)
+        
+    Returns:
+        Lista di segmenti Whisper
+    """
+    stats = stats if stats is not None else {}
+    audio = str(wav_path)
+
+    # VAD: a Whisper arriva solo il parlato, i timestamp tornano sul chunk originale
+    offset_map = None
+    if VAD_ENABLED:
+        audio, offset_map = compact_speech(audio, stats)
+        if len(audio) == 0:
+            return []
+
+    if DECODING_MODE == "adaptive":
+        segments = decode_adaptive(model, audio, language, device, config, stats)
+    else:
+        segments = model.transcribe(audio, **whisper_options(language, device, config))["segments"]
+
+    # Stesso audio della prima passata: con il VAD i tempi sono ancora quelli compattati
+    if LOOP_REPAIR_ENABLED:
+        segments = repair_loops(model, audio, segments, language, device, config, stats)
+
+    if offset_map is not None:
+        remap_segments(segments, offset_map)
+    return segments
+
+
+def transcribe_chunk(model, wav_path: Path, language: str, device: str, config: dict,
+                     stats: dict | None = None) -> str:
+    """
+    Trascrive singolo chunk con Whisper
+    
+    Args:
+        model: Modello Whisper caricato
+        wav_path: Percorso audio WAV
+        language: Codice lingua ('it', 'es', 'en', 'fr')
+        device: 'cuda' o 'cpu'
+        config: Configurazione beam_size/best_of dal MODEL_CONFIGS
+        stats: Contatori di run opzionali (aggiornati in-place)
+        
+    Returns:
+        Testo trascritto
+    """
+    segments = transcribe_chunk_segments(model, wav_path, language, device, config, stats)
+    return segments_to_text(segments)
+
+
+def transcribe_all():
+    """Pipeline completa trascrizione tutti i chunk"""
+    
+    print_header("TRASCRIZIONE WHISPER")
+
+    # Carica mappa lingue
+    map_file = CHUNKS_DIR / "language_map.json"
+
+    if not map_file.exists():
+        print("❌ Language map non trovata!")
+        print("   Esegui prima: python 2_language_detection.py")
+        sys.exit(1)
+    
+    with open(map_file, encoding="utf-8") as f:
+        language_map = json.load(f)
+
+    # Cambi lingua dentro i chunk (modalità "switch" di 2_language_detection.py)
+    segments_file = CHUNKS_DIR / "language_segments.json"
+    language_segments = {}
+    if segments_file.exists():
+        language_segments = json.loads(segments_file.read_text(encoding="utf-8"))
+
+    chunks = sorted(CHUNKS_DIR.glob("chunk_*.mp4"))
+
+    if not chunks:
+        print("❌ Nessun chunk trovato!")
+        sys.exit(1)
+    
+    # Piano a scadenza (planner.py): modello e beam scelti per finire in tempo
+    plan = load_plan()
+    model_key = WHISPER_MODEL
+    config = MODEL_CONFIGS[WHISPER_MODEL]
+    if plan is not None and not CASCADE_ENABLED:
+        model_key = plan["choice"]["model"]
+        config = {**MODEL_CONFIGS[model_key], **{k: plan["choice"][k] for k in ("beam_size", "best_of")}}
+
+    print(f"📦 Chunk da trascrivere: {len(chunks)}")
+    print(f"🤖 Modello: {model_key}")
+    if plan is not None and not CASCADE_ENABLED:
+        print(f"⏰ Piano a scadenza: {plan['deadline']} (beam {config['beam_size']})")
+    if TRANSCRIPTION_ENGINE == "batched":
+        print(f"📚 Motore batched: {BATCH_SIZE} finestre da 30s per batch")
+    elif CASCADE_ENABLED:
+        print(f"🪜 Cascata: {CASCADE_FAST_MODEL} → {WHISPER_MODEL} (zone a bassa confidenza)")
+    else:
+        print(f"🎯 Decoding: {DECODING_MODE}")
+
+    fast_model = None
+    dispatcher = None
+    if CASCADE_ENABLED and TRANSCRIPTION_ENGINE != "batched":
+        fast_model, device, local_model = open_model(CASCADE_FAST_MODEL)
+        model, device, _ = open_model(WHISPER_MODEL, device)
+    else:
+        # Più worker: ogni processo carica il suo modello (solo senza model server)
+        use_pool = TRANSCRIPTION_WORKERS > 1 and TRANSCRIPTION_ENGINE == "sequential"
+        model, device, local_model = open_model(model_key, load_local=not use_pool)
+
+        if model is None and device == "cpu":
+            check_upfront_budget(chunks, language_segments)
+            threads = TORCH_THREADS or "default"
+            print(f"👷 Avvio {TRANSCRIPTION_WORKERS} worker (thread torch per worker: {threads})...")
+            # Con il watchdog al più 2 chunk in coda per worker: la finestra si può ridurre
+            window = 2 * TRANSCRIPTION_WORKERS if WATCHDOG_ENABLED else None
+            dispatcher = Dispatcher(model_key, device, TRANSCRIPTION_WORKERS, TORCH_THREADS, config, window)
+            print("✅ Worker pronti\n")
+        elif model is None:
+            # Su GPU un solo processo: i worker si contenderebbero la VRAM
+            model, device, local_model = open_model(model_key, device)
+
+    if local_model:
+        import torch
+    
+    # Crea output directory
+    OUTPUT_DIR.mkdir(exist_ok=True)
+
+    # Watchdog di memoria (memory_watchdog.py): sotto pressione si degrada invece di morire
+    watchdog = MemoryWatchdog() if WATCHDOG_ENABLED and Path("/proc/meminfo").exists() else None
+    pressure_streak = 0   # Chunk consecutivi sotto pressione
+    last_level = "ok"
+
+    # Deduplicazione (fingerprint.py): audio già trascritto → segmenti riusati, Whisper solo sul resto
+    fp_index = FingerprintIndex() if FINGERPRINT_ENABLED else None
+    matches = {}
+    dedup_stats = {"pieces": 0, "audio_seconds": 0.0, "reused_seconds": 0.0,
+                   "full_hits": 0, "partial_hits": 0, "fingerprint_seconds": 0.0}
+    transcribe_started = time.perf_counter()
+
+    # Motore batched: tutte le finestre decodificate prima del loop di composizione
+    batched_segments = None
+    if TRANSCRIPTION_ENGINE == "batched":
+        if isinstance(model, RemoteModel):
+            print("⚠️  Motore batched non disponibile con il model server, uso sequential\n")
+        else:
+            check_upfront_budget(chunks, language_segments)
+            print("▶️  Estrazione audio...")
+            jobs = [
+                (key, wav_path, lang)
+                for chunk in chunks
+                for key, wav_path, lang, _ in chunk_pieces(chunk, language_map, language_segments)
+            ]
+            if fp_index is not None:
+                jobs = lookup_jobs(fp_index, jobs, model_key, config, matches)
+            print(f"▶️  Trascrizione batched di {len(jobs)} chunk...")
+            t0 = time.perf_counter()
+            if watchdog is not None:
+                batched_segments = transcribe_batched_watched(model, jobs, device, config, watchdog)
+            else:
+                batched_segments = transcribe_batched(model, jobs, device, config, BATCH_SIZE)
+            print(f"✅ Completata in {time.perf_counter() - t0:.1f}s\n")
+
+    # Ripianificazione durante la trascrizione: solo nel percorso sequenziale,
+    # dove si può cambiare modello tra un chunk e l'altro
+    replanner = None
+    if plan is not None and batched_segments is None and dispatcher is None and fast_model is None:
+        replanner = Replanner(plan)
+
+    # Durate dei chunk: per il ripianificatore e per l'ETA dell'endpoint di avanzamento
+    durations = chunk_durations(chunks) if replanner is not None or PROGRESS_ENABLED else {}
+
+    # Worker paralleli: chunk in coda in ordine, risultati raccolti in ordine
+    if dispatcher is not None:
+        jobs = [
+            (key, wav_path, lang)
+            for chunk in chunks
+            for key, wav_path, lang, _ in chunk_pieces(chunk, language_map, language_segments)
+        ]
+        if fp_index is not None:
+            jobs = lookup_jobs(fp_index, jobs, model_key, config, matches)
+        dispatcher.enqueue(jobs)
+    
+    # Variabili accumulo
+    full_text = ""
+    # BUG FIX 4: Inizializza tutte le lingue supportate per evitare KeyError
+    stats = {'it': 0, 'es': 0, 'en': 0, 'fr': 0}
+    decode_stats = {}
+    run_report = {
+        "model": model_key,
+        "device": device,
+        "engine": TRANSCRIPTION_ENGINE,
+        "decoding": "cascade" if CASCADE_ENABLED else DECODING_MODE,
+        "chunks": len(chunks),
+        "workers": TRANSCRIPTION_WORKERS if dispatcher is not None else 1,
+        "torch_threads": TORCH_THREADS,
+    }
+    prev_lang = None
+
+    # Archivio segmenti con timestamp assoluti (segment_store.py)
+    store = SegmentStoreWriter(STORE_FILE, str(INPUT_VIDEO)) if SEGMENT_STORE_ENABLED else None
+    offsets = chunk_offsets(chunks)
+
+    # Trascrizione grezza in sola aggiunta: dopo ogni chunk si scrive solo il testo nuovo
+    output_raw = OUTPUT_DIR / "trascrizione_raw.txt"
+    raw_file = open(output_raw, "w", encoding="utf-8")
+    written = 0
+
+    # Avanzamento in memoria (progress.py): con PROGRESS_ENABLED anche via HTTP
+    progress.start("transcription", len(chunks), sum(durations.values()))
+
+    # Loop trascrizione
+    for idx, chunk in enumerate(chunks, 1):
+        pieces = chunk_pieces(chunk, language_map, language_segments)
+
+        # Emoji lingua per feedback visivo
+        lang_emoji = {
+            'it': '🇮🇹',
+            'es': '🇪🇸',
+            'en': '🇬🇧',
+            'fr': '🇫🇷',
+        }
+        
+        print(f"▶️  [{idx}/{len(chunks)}] {lang_emoji.get(pieces[0][2], '🌍')} {chunk.name}")
+        if len(pieces) > 1:
+            print(f"   ├─ 🔀 Cambi lingua interni: {' → '.join(lang.upper() for _, _, lang, _ in pieces)}")
+
+        # Pressione di memoria: prima si rallenta, poi meno worker, poi un modello più piccolo
+        # (subito se critica, dopo WATCHDOG_SUSTAINED_CHUNKS chunk se la pressione non rientra)
+        if watchdog is not None and batched_segments is None:
+            level = watchdog.level()
+            pressure_streak = pressure_streak + 1 if level != "ok" else 0
+            step_down = level == "critical" or pressure_streak >= WATCHDOG_SUSTAINED_CHUNKS
+            smaller = smaller_model(dispatcher.model_key if dispatcher is not None else model_key)
+            if level == "ok":
+                pass
+            elif dispatcher is not None and level == "pressure" and dispatcher.window > 1:
+                watchdog.record("throttle", chunk.name, dispatcher.window, dispatcher.window // 2)
+                dispatcher.window //= 2
+            elif dispatcher is not None and level == "critical" and dispatcher.workers > 1:
+                watchdog.record("shrink_workers", chunk.name, dispatcher.workers, dispatcher.workers // 2)
+                dispatcher.restart(workers=dispatcher.workers // 2)
+            elif dispatcher is not None and step_down and smaller is not None:
+                watchdog.record("smaller_model", chunk.name, dispatcher.model_key, smaller)
+                dispatcher.restart(model_key=smaller, config=MODEL_CONFIGS[smaller])
+                pressure_streak = 0
+            elif fast_model is not None and step_down:
+                # Cascata: resta solo il modello veloce, senza ri-trascrizione delle zone incerte
+                watchdog.record("drop_cascade", chunk.name, WHISPER_MODEL, CASCADE_FAST_MODEL)
+                model, fast_model = fast_model, None
+                gc.collect()
+                model_key, config = CASCADE_FAST_MODEL, MODEL_CONFIGS[CASCADE_FAST_MODEL]
+                pressure_streak = 0
+            elif local_model and dispatcher is None and step_down and smaller is not None:
+                watchdog.record("smaller_model", chunk.name, model_key, smaller)
+                del model
+                gc.collect()
+                model_key, config = smaller, MODEL_CONFIGS[smaller]
+                model, device, _ = open_model(model_key, device)
+                pressure_streak = 0
+            elif watchdog.can_wait() and watchdog.held_by_others():
+                # Memoria occupata soprattutto da altri processi del nodo: può liberarsi
+                recovered = watchdog.wait_for_memory()
+                watchdog.record("wait", chunk.name, level, "ok" if recovered else level)
+            elif level != last_level:
+                # Il consumo è del job (o il budget di attesa è finito): aspettare non libera nulla
+                watchdog.record("continue", chunk.name, last_level, level)
+            last_level = level
+
+        compute_seconds = 0.0
+        for key, wav_path, lang, piece_offset in pieces:
+            stats[lang] = stats.get(lang, 0) + 1  # Usa .get() per sicurezza
+            print(f"   ├─ Audio: {wav_path.name} {lang_emoji.get(lang, '🌍')}")
+            
+            # Audio già trascritto? (nel percorso sequenziale anche da chunk di questa esecuzione)
+            # Chiave di riuso: lingua, modello (in cascata la coppia di modelli) e impostazioni di decoding
+            if dispatcher is not None:
+                fp_model, fp_config = dispatcher.model_key, dispatcher.config
+            elif fast_model is not None:
+                fp_model, fp_config = f"{CASCADE_FAST_MODEL}+{model_key}", config
+            else:
+                fp_model, fp_config = model_key, config
+            fp_options = decoding_signature(lang, fp_config, fast_model is not None)
+            match = matches.get(key)
+            if match is None and fp_index is not None and batched_segments is None and dispatcher is None:
+                match = fp_index.lookup(wav_path, lang, fp_model, fp_options)
+            reused = match is not None and not match["uncovered"]
+            reused_seconds = match["reused_seconds"] if reused else 0.0
+
+            # Trascrivi
+            print(f"   ├─ Trascrizione...", end=" ", flush=True)
+            with profile_stage("transcribe_chunk", idx):
+                if reused:
+                    segments = match["segments"]
+                elif batched_segments is not None:
+                    segments = batched_segments[key]
+                elif dispatcher is not None:
+                    segments, chunk_stats = collect_from_pool(dispatcher, key, watchdog)
+                    merge_stats(decode_stats, chunk_stats)
+                elif fast_model is not None:
+                    segments = decode_cascade(
+                        fast_model, model, str(wav_path), get_video_duration(wav_path), lang, device, decode_stats
+                    )
+                elif match is not None and match["segments"]:
+                    t0 = time.perf_counter()
+                    segments = transcribe_uncovered(model, wav_path, match, lang, device, config, decode_stats)
+                    compute_seconds += time.perf_counter() - t0
+                    reused_seconds = match["reused_seconds"]
+                else:
+                    t0 = time.perf_counter()
+                    segments = transcribe_chunk_segments(model, wav_path, lang, device, config, decode_stats)
+                    compute_seconds += time.perf_counter() - t0
+
+                # Batched e cascata non passano da transcribe_chunk_segments
+                if LOOP_REPAIR_ENABLED and not reused and (batched_segments is not None or fast_model is not None):
+                    segments = repair_loops(model, str(wav_path), segments, lang, device, config, decode_stats)
+            text = segments_to_text(segments)
+            if reused:
+                print(f"♻️  Audio già trascritto ({len(text)} char)")
+            elif reused_seconds:
+                print(f"✅ ({len(text)} char) ♻️  {reused_seconds:.0f}/{match['duration']:.0f}s riusati")
+            else:
+                print(f"✅ ({len(text)} char)")
+
+            if match is not None:
+                dedup_stats["pieces"] += 1
+                dedup_stats["audio_seconds"] += match["duration"]
+                dedup_stats["reused_seconds"] += reused_seconds
+                dedup_stats["fingerprint_seconds"] += match["fingerprint_seconds"]
+                if reused:
+                    dedup_stats["full_hits"] += 1
+                elif reused_seconds:
+                    dedup_stats["partial_hits"] += 1
+                fp_index.add(match, segments, f"{INPUT_VIDEO.name} / {wav_path.name}", lang, fp_model, fp_options)
+
+            if store is not None:
+                store.add_segments(segments, offsets.get(str(chunk), 0.0) + piece_offset, lang)
+
+            full_text = append_transcript(full_text, text, prev_lang, lang, idx)
+            prev_lang = lang
+
+        # Scadenza a rischio → configurazione più veloce per i chunk restanti
+        if replanner is not None:
+            replanner.observe(durations[str(chunk)], compute_seconds)
+            remaining_audio = sum(durations[str(c)] for c in chunks[idx:])
+            choice = replanner.check(remaining_audio)
+            if choice is not None:
+                print(f"   ├─ ⏰ Ripianificazione: {replanner.decisions[-1]['from']} → {replanner.decisions[-1]['to']}")
+                if choice["model"] != model_key:
+                    del model
+                    gc.collect()
+                    model_key = choice["model"]
+                    model, device, _ = open_model(model_key, device)
+                config = {**MODEL_CONFIGS[model_key], "beam_size": choice["beam_size"], "best_of": choice["best_of"]}
+        
+        # Salva progressivo (non perdi tutto se crasha): solo il testo nuovo, in coda
+        delta = full_text[written:]
+        raw_file.write(delta)
+        raw_file.flush()
+        written = len(full_text)
+        progress.append_text(delta)
+        progress.advance(durations.get(str(chunk), 0.0))
+        print(f"   └─ 💾 Salvato progressivo\n")
+
+        # Trascrizione salvata: audio e feature del chunk sono liberabili, il video a fine step (storage.py)
+        commit_chunk(chunk)
+        
+        # Libera memoria GPU
+        if local_model and device == "cuda":
+            torch.cuda.empty_cache()
+    
+    # Cleanup finale memoria
+    if dispatcher is not None:
+        dispatcher.shutdown()
+    if watchdog is not None:
+        watchdog.stop()
+    if fp_index is not None:
+        fp_index.close()
+    raw_file.close()
+    progress.finish()
+    del model, fast_model
+    if local_model and device == "cuda":
+        torch.cuda.empty_cache()
+    gc.collect()
+
+    # Statistiche finali
+    print_section("STATISTICHE")
+    print(f"🇮🇹 Chunk italiani:  {stats.get('it', 0)}")
+    print(f"🇪🇸 Chunk spagnoli:  {stats.get('es', 0)}")
+    print(f"🇬🇧 Chunk inglesi:   {stats.get('en', 0)}")
+    print(f"🇫🇷 Chunk francesi:  {stats.get('fr', 0)}")
+    if DECODING_MODE == "adaptive" and decode_stats.get("segments"):
+        redecoded_pct = decode_stats.get("redecoded_seconds", 0.0) / max(decode_stats["audio_seconds"], 1e-9) * 100
+        print(f"🎯 Beam search su {decode_stats['redecoded_segments']}/{decode_stats['segments']} segmenti "
+              f"({redecoded_pct:.1f}% dell'audio)")
+        run_report["adaptive"] = decode_stats
+    if "fast_time" in decode_stats:  # Cascata (fast_model è già stato rilasciato)
+        cascade = cascade_report(decode_stats)
+        accurate_pct = cascade["accurate_audio_fraction"] * 100
+        print(f"🪜 Audio {CASCADE_FAST_MODEL}: {100 - accurate_pct:.1f}% | {WHISPER_MODEL}: {accurate_pct:.1f}%")
+        if cascade["estimated_speedup"]:
+            print(f"⚡ Speedup stimato vs solo {WHISPER_MODEL}: {cascade['estimated_speedup']:.2f}x")
+        run_report["cascade"] = cascade
+    if decode_stats.get("vad_audio_seconds"):
+        skipped_pct = decode_stats["vad_skipped_seconds"] / decode_stats["vad_audio_seconds"] * 100
+        saved_pct = (1 - decode_stats["vad_windows_run"] / max(decode_stats["vad_windows_total"], 1)) * 100
+        print(f"🔇 Audio senza parlato saltato: {decode_stats['vad_skipped_seconds']:.0f}s ({skipped_pct:.1f}%)")
+        print(f"⚡ Finestre Whisper risparmiate: ~{saved_pct:.1f}% del calcolo")
+        run_report["vad"] = {
+            "audio_seconds": decode_stats["vad_audio_seconds"],
+            "skipped_seconds": decode_stats["vad_skipped_seconds"],
+            "windows_total": decode_stats["vad_windows_total"],
+            "windows_run": decode_stats["vad_windows_run"],
+            "compute_saved_fraction": saved_pct / 100,
+        }
+    if decode_stats.get("loop_segments"):
+        print(f"🔁 Loop di ripetizione: {decode_stats['loop_segments']} segmenti → "
+              f"{decode_stats['loop_windows']} finestre ri-decodificate "
+              f"({decode_stats['loop_redecoded_seconds']:.0f}s in {decode_stats['loop_time']:.1f}s)")
+        if decode_stats["loop_remaining_segments"]:
+            print(f"⚠️  Loop ancora presenti dopo il fallback: {decode_stats['loop_remaining_segments']} segmenti")
+        run_report["loops"] = {
+            "segments": decode_stats["loop_segments"],
+            "windows": decode_stats["loop_windows"],
+            "redecoded_seconds": decode_stats["loop_redecoded_seconds"],
+            "elapsed_seconds": decode_stats["loop_time"],
+            "remaining_segments": decode_stats["loop_remaining_segments"],
+        }
+    if dedup_stats["pieces"]:
+        # Calcolo risparmiato stimato: audio riusato × tempo medio per secondo di audio trascritto
+        transcribed_seconds = dedup_stats["audio_seconds"] - dedup_stats["reused_seconds"]
+        elapsed = time.perf_counter() - transcribe_started - dedup_stats["fingerprint_seconds"]
+        saved_seconds = dedup_stats["reused_seconds"] * elapsed / transcribed_seconds if transcribed_seconds > 0 else 0.0
+        hit_rate = dedup_stats["reused_seconds"] / max(dedup_stats["audio_seconds"], 1e-9)
+        if dedup_stats["reused_seconds"]:
+            print(f"♻️  Audio già trascritto: {dedup_stats['reused_seconds']:.0f}s ({hit_rate * 100:.1f}%) | "
+                  f"chunk riusati: {dedup_stats['full_hits']} interi, {dedup_stats['partial_hits']} in parte")
+            print(f"⚡ Calcolo Whisper risparmiato: ~{saved_seconds:.0f}s "
+                  f"(fingerprint: {dedup_stats['fingerprint_seconds']:.1f}s)")
+        run_report["dedup"] = {**dedup_stats, "hit_rate": hit_rate, "estimated_saved_seconds": saved_seconds}
+    if replanner is not None:
+        if replanner.decisions:
+            print(f"⏰ Ripianificazioni: {len(replanner.decisions)} (modello finale: {model_key})")
+        run_report["plan"] = {"deadline": plan["deadline"], "final_model": model_key,
+                              "decisions": replanner.decisions}
+    if profiles_written:
+        print(f"🔬 Profili salvati: {len(profiles_written)} in {PROFILE_DIR}/")
+    if watchdog is not None:
+        print(f"🧯 Memoria: picco RSS {watchdog.peak_rss_mb:.0f} MB, minimo disponibile "
+              f"{watchdog.min_available_mb:.0f} MB, {len(watchdog.decisions)} interventi")
+        run_report["memory"] = watchdog.report()
+    if store is not None:
+        print(f"🧩 Segmenti con timestamp: {len(store):,} → {store.close()}")
+    # Trascrizione e archivio segmenti salvati: solo ora si eliminano i video dei chunk
+    release_committed()
+    if released["bytes"]:
+        print(f"🧹 Chunk trascritti eliminati: {released['chunks']} ({released['bytes'] / 1024 ** 2:.0f} MB liberati)")
+        run_report["storage"] = {"released_chunks": released["chunks"], "released_bytes": released["bytes"]}
+    print(f"📝 Caratteri totali: {len(full_text):,}")
+    print(f"💾 File: {output_raw}\n")
+
+    # Report di esecuzione (statistiche delle modalità di performance)
+    report_file = OUTPUT_DIR / "report_trascrizione.json"
+    report_file.write_text(json.dumps(run_report, indent=2), encoding="utf-8")
+    
+    print("✅ Trascrizione completata!")
+    print("➡️  Prossimo step (opzionale): python 4_correction.py")
+
+
+def main():
+    """Entry point"""
+    transcribe_all()
+
+
+if __name__ == "__main__":
+    with stage_io("transcription"):
+        main()
\ No newline at end of file
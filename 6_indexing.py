@@ -0,0 +1,374 @@
+"""
+STEP 6: Indicizzazione Full-Text (opzionale)
+
+Aggiunge la trascrizione a un indice SQLite FTS5 condiviso tra tutte le
+registrazioni (INDEX_DB), con tokenizzazione insensibile agli accenti
+(unicode61 remove_diacritics 2: "citta" trova "città", "garcon" trova "garçon").
+
+Ogni riga dell'indice è un segmento con il suo tempo di inizio/fine in ms,
+dall'archivio segmenti (trascrizione.segs): una ricerca restituisce registrazioni
+e punti in cui saltare nel video. Senza archivio segmenti si indicizzano i
+paragrafi del testo (senza tempi).
+
+Incrementale: una cartella già indicizzata con lo stesso contenuto (hash) viene
+saltata; se il contenuto è cambiato i suoi segmenti sono sostituiti. Le colonne
+UNINDEXED di FTS5 non hanno indici: la tabella segment_rows (rowid → registrazione,
+indicizzata) permette di cancellare i segmenti di una registrazione per rowid,
+senza scandire tutto l'indice.
+
+Uso:
+    python 6_indexing.py                         # Indicizza OUTPUT_DIR
+    python 6_indexing.py add archivio/*/output   # Indicizza altre cartelle di output
+    python 6_indexing.py search "rete neurale"   # Cerca in tutte le registrazioni
+    python 6_indexing.py search "citta" --limit 50
+    python 6_indexing.py list                    # Registrazioni indicizzate
+"""
+
+from pathlib import Path
+import argparse
+import hashlib
+import sqlite3
+import sys
+from datetime import datetime
+from config import *
+from segment_store import SegmentStore
+from storage import stage_io
+from utils import print_header, print_section
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS recordings (
+    id INTEGER PRIMARY KEY,
+    path TEXT UNIQUE NOT NULL,
+    source TEXT,
+    content_hash TEXT NOT NULL,
+    segment_count INTEGER NOT NULL,
+    timestamped INTEGER NOT NULL,
+    indexed_at TEXT NOT NULL
+);
+CREATE VIRTUAL TABLE IF NOT EXISTS segments USING fts5(
+    text,
+    recording_id UNINDEXED,
+    start_ms UNINDEXED,
+    end_ms UNINDEXED,
+    language UNINDEXED,
+    tokenize = "unicode61 remove_diacritics 2"
+);
+CREATE TABLE IF NOT EXISTS segment_rows (
+    rowid INTEGER PRIMARY KEY,
+    recording_id INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS segment_rows_recording ON segment_rows (recording_id);
+"""
+
+
+def open_index(db_path: Path = INDEX_DB) -> sqlite3.Connection:
+    """
+    Apre (o crea) l'indice
+
+    Returns:
+        Connessione SQLite con lo schema pronto
+    """
+    db_path.parent.mkdir(parents=True, exist_ok=True)
+    conn = sqlite3.connect(db_path)
+    conn.execute("PRAGMA journal_mode=WAL")  # Ricerche possibili mentre si indicizza
+    conn.executescript(SCHEMA)
+
+    # Indice creato prima di segment_rows: mappa i rowid esistenti (una volta sola)
+    if conn.execute("SELECT 1 FROM segment_rows LIMIT 1").fetchone() is None:
+        with conn:
+            conn.execute("INSERT INTO segment_rows (rowid, recording_id) SELECT rowid, recording_id FROM segments")
+    return conn
+
+
+def transcript_source(output_dir: Path) -> Path | None:
+    """
+    File da indicizzare in una cartella di output
+
+    Preferisce l'archivio segmenti (con tempi), poi il testo formattato,
+    corretto o grezzo.
+
+    Returns:
+        Percorso del file o None se la cartella non contiene trascrizioni
+    """
+    candidates = [
+        "trascrizione.segs",
+        "trascrizione_formattata.txt",
+        "trascrizione_corretta.txt",
+        "trascrizione_raw.txt",
+    ]
+    for name in candidates:
+        if (output_dir / name).exists():
+            return output_dir / name
+    return None
+
+
+def file_hash(path: Path) -> str:
+    """SHA-256 del file (a blocchi)"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def iter_rows(source: Path):
+    """
+    Righe da indicizzare: (testo, start_ms, end_ms, lingua)
+
+    Dall'archivio segmenti un segmento alla volta (memory-map);
+    da un file di testo un paragrafo alla volta, senza tempi.
+    """
+    if source.suffix == ".segs":
+        store = SegmentStore(source)
+        try:
+            for segment in store:
+                yield (
+                    segment["text"],
+                    round(segment["start"] * 1000),
+                    round(segment["end"] * 1000),
+                    segment["language"],
+                )
+        finally:
+            store.close()
+    else:
+        for paragraph in source.read_text(encoding="utf-8").split("\n\n"):
+            if paragraph.strip():
+                yield paragraph.strip(), None, None, None
+
+
+def index_output(conn: sqlite3.Connection, output_dir: Path) -> str:
+    """
+    Indicizza una cartella di output (incrementale)
+
+    Args:
+        conn: Connessione all'indice
+        output_dir: Cartella con le trascrizioni di una registrazione
+
+    Returns:
+        Esito: "added", "updated", "unchanged" o "missing"
+    """
+    source = transcript_source(output_dir)
+    if source is None:
+        return "missing"
+
+    key = str(output_dir.resolve())
+    content_hash = f"{source.name}:{file_hash(source)}"
+    row = conn.execute("SELECT id, content_hash FROM recordings WHERE path = ?", (key,)).fetchone()
+
+    if row is not None and row[1] == content_hash:
+        return "unchanged"
+
+    # Una transazione per registrazione: un'interruzione non lascia l'indice a metà
+    with conn:
+        if row is not None:
+            recording_id = row[0]
+            rowids = conn.execute("SELECT rowid FROM segment_rows WHERE recording_id = ?", (recording_id,)).fetchall()
+            conn.executemany("DELETE FROM segments WHERE rowid = ?", rowids)
+            conn.execute("DELETE FROM segment_rows WHERE recording_id = ?", (recording_id,))
+        else:
+            recording_id = conn.execute(
+                "INSERT INTO recordings (path, content_hash, segment_count, timestamped, indexed_at) "
+                "VALUES (?, '', 0, 0, '')",
+                (key,),
+            ).lastrowid
+
+        count = 0
+        source_video = None
+        if source.suffix == ".segs":
+            store = SegmentStore(source)
+            source_video = store.meta.get("source") or None
+            store.close()
+
+        # Rowid espliciti, registrati anche in segment_rows
+        next_rowid = conn.execute("SELECT COALESCE(MAX(rowid), 0) + 1 FROM segment_rows").fetchone()[0]
+        for batch_rows in iter_batches(iter_rows(source), 1000):
+            rowids = range(next_rowid, next_rowid + len(batch_rows))
+            conn.executemany(
+                "INSERT INTO segments (rowid, text, recording_id, start_ms, end_ms, language) VALUES (?, ?, ?, ?, ?, ?)",
+                [(rowid, text, recording_id, start, end, lang) for rowid, (text, start, end, lang) in zip(rowids, batch_rows)],
+            )
+            conn.executemany(
+                "INSERT INTO segment_rows (rowid, recording_id) VALUES (?, ?)",
+                [(rowid, recording_id) for rowid in rowids],
+            )
+            next_rowid += len(batch_rows)
+            count += len(batch_rows)
+
+        conn.execute(
+            "UPDATE recordings SET source = ?, content_hash = ?, segment_count = ?, timestamped = ?, indexed_at = ? "
+            "WHERE id = ?",
+            (
+                source_video,
+                content_hash,
+                count,
+                int(source.suffix == ".segs"),
+                datetime.now().isoformat(timespec="seconds"),
+                recording_id,
+            ),
+        )
+
+    return "updated" if row is not None else "added"
+
+
+def iter_batches(rows, size: int):
+    """Raggruppa un iteratore in liste da `size` (inserimenti a blocchi)"""
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def to_match_query(query: str) -> str:
+    """
+    Query utente → sintassi FTS5
+
+    Ogni parola diventa un termine tra virgolette (niente errori di sintassi
+    con apostrofi o trattini); un termine che finisce con * resta un prefisso.
+    """
+    terms = []
+    for term in query.split():
+        prefix = term.endswith("*")
+        term = term.rstrip("*").replace('"', '""')
+        if term:
+            terms.append(f'"{term}"' + ("*" if prefix else ""))
+    return " ".join(terms)
+
+
+def search(conn: sqlite3.Connection, query: str, limit: int = 20) -> list[dict]:
+    """
+    Cerca nei segmenti di tutte le registrazioni
+
+    Args:
+        conn: Connessione all'indice
+        query: Parole da cercare (tutte presenti nel segmento)
+        limit: Risultati massimi
+
+    Returns:
+        Risultati ordinati per rilevanza (bm25): {path, source, start_ms, end_ms, language, snippet}
+    """
+    match = to_match_query(query)
+    if not match:
+        return []
+
+    rows = conn.execute(
+        """
+        SELECT r.path, r.source, s.start_ms, s.end_ms, s.language,
+               snippet(segments, 0, '[', ']', '…', 16)
+        FROM segments s
+        JOIN recordings r ON r.id = s.recording_id
+        WHERE s.segments MATCH ?
+        ORDER BY bm25(segments)
+        LIMIT ?
+        """,
+        (match, limit),
+    ).fetchall()
+
+    return [
+        {"path": path, "source": source, "start_ms": start, "end_ms": end, "language": lang, "snippet": snippet}
+        for path, source, start, end, lang, snippet in rows
+    ]
+
+
+def format_ms(ms: int | None) -> str:
+    """Millisecondi → H:MM:SS (o "-" senza tempi)"""
+    if ms is None:
+        return "-"
+    seconds = ms // 1000
+    return f"{seconds // 3600}:{seconds % 3600 // 60:02}:{seconds % 60:02}"
+
+
+def index_folders(folders: list[Path]) -> None:
+    """Indicizza più cartelle di output e stampa il riepilogo"""
+    print_header("INDICIZZAZIONE FULL-TEXT")
+    print(f"🗂️  Indice: {INDEX_DB}\n")
+
+    conn = open_index()
+    outcomes = {}
+    labels = {
+        "added": "➕ aggiunta",
+        "updated": "🔄 aggiornata",
+        "unchanged": "⚪ invariata",
+        "missing": "❌ nessuna trascrizione",
+    }
+    for folder in folders:
+        outcome = index_output(conn, folder)
+        outcomes[outcome] = outcomes.get(outcome, 0) + 1
+        print(f"   {labels[outcome]}: {folder}")
+
+    recordings, segments = conn.execute("SELECT COUNT(*), COALESCE(SUM(segment_count), 0) FROM recordings").fetchone()
+    conn.close()
+
+    print_section("RIEPILOGO")
+    print(f"➕ Aggiunte: {outcomes.get('added', 0)} | 🔄 Aggiornate: {outcomes.get('updated', 0)} | "
+          f"⚪ Invariate: {outcomes.get('unchanged', 0)}")
+    print(f"📚 Indice: {recordings} registrazioni, {segments:,} segmenti")
+    print('\n🔍 Cerca con: python 6_indexing.py search "parola"')
+
+
+def main():
+    """Entry point"""
+    parser = argparse.ArgumentParser(description="Indice full-text delle trascrizioni")
+    commands = parser.add_subparsers(dest="command")
+
+    cmd = commands.add_parser("add", help="Indicizza cartelle di output")
+    cmd.add_argument("folders", type=Path, nargs="+")
+
+    cmd = commands.add_parser("search", help="Cerca in tutte le registrazioni")
+    cmd.add_argument("query")
+    cmd.add_argument("--limit", type=int, default=20)
+
+    commands.add_parser("list", help="Registrazioni indicizzate")
+
+    args = parser.parse_args()
+
+    if args.command is None:
+        index_folders([OUTPUT_DIR])
+
+    elif args.command == "add":
+        index_folders(args.folders)
+
+    elif args.command == "search":
+        if not INDEX_DB.exists():
+            print("❌ Indice vuoto: esegui prima python 6_indexing.py")
+            sys.exit(1)
+        conn = open_index()
+        results = search(conn, args.query, args.limit)
+        conn.close()
+
+        if not results:
+            print(f"🔍 Nessun risultato per: {args.query}")
+            return
+
+        # Raggruppa per registrazione mantenendo l'ordine di rilevanza
+        by_recording = {}
+        for result in results:
+            by_recording.setdefault(result["path"], []).append(result)
+
+        for path, hits in by_recording.items():
+            print(f"\n🎬 {hits[0]['source'] or path}")
+            for hit in hits:
+                lang = f" ({hit['language']})" if hit["language"] else ""
+                print(f"   ⏱️  {format_ms(hit['start_ms'])} [{hit['start_ms'] if hit['start_ms'] is not None else '-'} ms]"
+                      f"{lang} {hit['snippet']}")
+
+    else:
+        if not INDEX_DB.exists():
+            print("❌ Indice vuoto: esegui prima python 6_indexing.py")
+            sys.exit(1)
+        conn = open_index()
+        for path, source, segments, timestamped, indexed_at in conn.execute(
+            "SELECT path, source, segment_count, timestamped, indexed_at FROM recordings ORDER BY indexed_at"
+        ):
+            clock = "⏱️ " if timestamped else "📄"
+            print(f"{clock} {source or path}: {segments:,} segmenti (indicizzata {indexed_at})")
+        conn.close()
+
+
+if __name__ == "__main__":
+    with stage_io("indexing"):
+        main()
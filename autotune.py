@@ -0,0 +1,212 @@
+"""
+Autotune: thread torch, worker e durata chunk per QUESTA macchina
+
+Esegue brevi passate di calibrazione di transcribe_chunk su una clip di riferimento
+per ogni combinazione di:
+- thread intra-op di torch per processo
+- processi worker in parallelo
+- durata chunk (MAX_CHUNK_SECONDS)
+
+e salva la combinazione più veloce nel profilo host (HOST_PROFILE), che config.py
+carica all'avvio della pipeline.
+
+Ogni passata trascrive lo stesso numero di job (minimo comune multiplo dei worker
+provati, pezzi ripetuti se la clip ne dà meno): chunk corti non danno più lavoro
+parallelo di quelli lunghi, cambia solo la variabile sotto test.
+
+Uso:
+    python autotune.py clip.wav
+    python autotune.py clip.wav --threads 2 4 8 --workers 1 2 4 --chunk-seconds 240 480
+"""
+
+import argparse
+import json
+import math
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+
+from config import HOST_PROFILE, MODEL_CONFIGS, WHISPER_DEVICE, WHISPER_MODEL
+from utils import get_device, get_video_duration, print_header, print_section, seconds_to_timestamp
+from workers import create_pool, transcribe_in_worker
+
+
+def default_thread_grid(cpu_count: int) -> list[int]:
+    """Potenze di 2 fino al numero di core (es. 1, 2, 4, 8 su 8 core)"""
+    grid = []
+    n = 1
+    while n <= cpu_count:
+        grid.append(n)
+        n *= 2
+    return grid
+
+
+def split_clip(clip: Path, chunk_seconds: int, output_dir: Path) -> list[Path]:
+    """
+    Taglia la clip in pezzi WAV mono 16kHz da chunk_seconds (come 1_chunking + extract_audio)
+
+    Returns:
+        Lista dei pezzi WAV
+    """
+    duration = get_video_duration(clip)
+    pieces = []
+    start = 0.0
+    while start < duration:
+        end = min(start + chunk_seconds, duration)
+        piece = output_dir / f"calib_{chunk_seconds}_{len(pieces):03}.wav"
+        subprocess.run(
+            [
+                "ffmpeg", "-y", "-i", str(clip),
+                "-ss", seconds_to_timestamp(start), "-to", seconds_to_timestamp(end),
+                "-vn", "-ac", "1", "-ar", "16000", "-f", "wav", str(piece),
+            ],
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+            check=True,
+        )
+        pieces.append(piece)
+        start = end
+    return pieces
+
+
+def tile_jobs(pieces: list[Path], n_jobs: int) -> list[Path]:
+    """
+    Ripete i pezzi in ordine fino a n_jobs job
+
+    Returns:
+        Lista di n_jobs pezzi (con ripetizioni se la clip ne ha meno)
+    """
+    return [pieces[i % len(pieces)] for i in range(n_jobs)]
+
+
+def calibrate(model_key: str, device: str, pieces: list[Path], language: str, threads: int, workers: int) -> float:
+    """
+    Una passata di calibrazione: trascrive tutti i job con il pool configurato
+
+    Il caricamento del modello è escluso dalla misura (create_pool attende i worker).
+
+    Returns:
+        Secondi di calcolo (wall clock) per trascrivere tutti i job
+    """
+    config = MODEL_CONFIGS[model_key]
+    pool = create_pool(model_key, device, workers, threads)
+    try:
+        t0 = time.perf_counter()
+        futures = [pool.submit(transcribe_in_worker, str(piece), language, config) for piece in pieces]
+        for future in futures:
+            future.result()
+        return time.perf_counter() - t0
+    finally:
+        pool.shutdown()
+
+
+def save_profile(best: dict, grid: list[dict], model_key: str) -> None:
+    """Scrive il risultato nel profilo host, preservando le altre sezioni"""
+    profile = {}
+    if HOST_PROFILE.exists():
+        profile = json.loads(HOST_PROFILE.read_text(encoding="utf-8"))
+
+    profile["autotune"] = {
+        "threads": best["threads"],
+        "workers": best["workers"],
+        "chunk_seconds": best["chunk_seconds"],
+        "throughput": best["throughput"],
+        "model": model_key,
+        "measured_at": datetime.now().isoformat(timespec="seconds"),
+        "grid": grid,
+    }
+
+    HOST_PROFILE.parent.mkdir(parents=True, exist_ok=True)
+    HOST_PROFILE.write_text(json.dumps(profile, indent=2), encoding="utf-8")
+
+
+def main():
+    cpu_count = os.cpu_count() or 1
+
+    parser = argparse.ArgumentParser(description="Autotune thread/worker/durata chunk")
+    parser.add_argument("clip", type=Path, help="Clip audio/video di riferimento (qualche minuto)")
+    parser.add_argument("--model", default=WHISPER_MODEL, choices=list(MODEL_CONFIGS))
+    parser.add_argument("--language", default="it")
+    parser.add_argument("--threads", type=int, nargs="+", default=default_thread_grid(cpu_count))
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--chunk-seconds", type=int, nargs="+", default=[120, 240, 480])
+    args = parser.parse_args()
+
+    if not args.clip.exists():
+        print(f"❌ Clip non trovata: {args.clip}")
+        sys.exit(1)
+
+    print_header("AUTOTUNE")
+
+    device = get_device(WHISPER_DEVICE)
+    if device != "cpu":
+        print("⚠️  Su GPU si usa un solo worker: calibro solo la durata chunk")
+        args.threads, args.workers = [0], [1]
+
+    # Combinazioni che sovrascrivono i core sono scartate (più lente per costruzione)
+    combos = [
+        (threads, workers)
+        for threads in args.threads
+        for workers in args.workers
+        if threads * workers <= cpu_count or device != "cpu"
+    ]
+    if not combos:
+        print(f"❌ Nessuna combinazione thread × worker entro {cpu_count} core: riduci --threads o --workers")
+        sys.exit(1)
+
+    clip_seconds = get_video_duration(args.clip)
+
+    # Una durata chunk più lunga della clip misurerebbe la clip, non il chunk
+    chunk_grid = [c for c in args.chunk_seconds if c <= clip_seconds]
+    for skipped in sorted(set(args.chunk_seconds) - set(chunk_grid)):
+        print(f"⚠️  Chunk da {skipped}s saltato: la clip dura {clip_seconds:.0f}s")
+    if not chunk_grid:
+        print("❌ Nessuna durata chunk calibrabile: usa una clip più lunga o --chunk-seconds più corti")
+        sys.exit(1)
+
+    # Stesso numero di job per ogni passata: ogni numero di worker fa turni completi
+    n_jobs = math.lcm(*{workers for _, workers in combos})
+
+    print(f"🎧 Clip: {args.clip.name} ({clip_seconds:.0f}s)")
+    print(f"🤖 Modello: {args.model}")
+    print(f"🧮 Core: {cpu_count} | Passate: {len(combos) * len(chunk_grid)} | Job per passata: {n_jobs}\n")
+
+    grid = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for chunk_seconds in chunk_grid:
+            # Solo pezzi interi: l'ultimo pezzo, più corto, falserebbe la durata sotto test
+            pieces = split_clip(args.clip, chunk_seconds, Path(tmp))
+            durations = {piece: get_video_duration(piece) for piece in pieces}
+            full = [piece for piece in pieces if durations[piece] >= chunk_seconds - 1] or pieces
+            jobs = tile_jobs(full, n_jobs)
+            audio_seconds = sum(durations[piece] for piece in jobs)
+            for threads, workers in combos:
+                print(f"▶️  chunk {chunk_seconds}s | thread {threads} | worker {workers}...", end=" ", flush=True)
+                elapsed = calibrate(args.model, device, jobs, args.language, threads, workers)
+                throughput = audio_seconds / elapsed
+                print(f"{throughput:.2f}x tempo reale")
+                grid.append({
+                    "threads": threads,
+                    "workers": workers,
+                    "chunk_seconds": chunk_seconds,
+                    "seconds": elapsed,
+                    "throughput": throughput,
+                })
+
+    best = max(grid, key=lambda r: r["throughput"])
+    save_profile(best, grid, args.model)
+
+    print_section("RISULTATO")
+    print(f"🏆 Thread torch:  {best['threads'] or 'default'}")
+    print(f"🏆 Worker:        {best['workers']}")
+    print(f"🏆 Durata chunk:  {best['chunk_seconds']}s")
+    print(f"⚡ Throughput:    {best['throughput']:.2f}x tempo reale")
+    print(f"💾 Profilo: {HOST_PROFILE} (caricato da config.py all'avvio)")
+
+
+if __name__ == "__main__":
+    main()
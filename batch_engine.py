@@ -0,0 +1,185 @@
+"""
+Motore di trascrizione batched
+
+model.transcribe elabora le finestre di 30s di un chunk una dopo l'altra, con batch 1:
+su CPU buona parte del throughput delle moltiplicazioni di matrici resta inutilizzato.
+Qui le finestre di 30s di TUTTI i chunk con la stessa lingua (quindi stesso prompt)
+vengono raccolte in batch da BATCH_SIZE per encoder e decoder, e i segmenti
+ottenuti sono rimappati su chunk e tempo.
+
+Il log-mel di ogni chunk viene dal feature store (features.py): calcolato una volta
+sull'intero chunk, con la stessa normalizzazione di model.transcribe, e riletto
+in memory-map; le finestre sono slice senza copie.
+
+Differenze rispetto a model.transcribe:
+- Le finestre sono a passo fisso di 30s (niente seek sull'ultimo timestamp):
+  una parola a cavallo di due finestre può risultare spezzata
+- Nessun fallback a temperatura > 0 (decoding deterministico come in transcribe_chunk)
+"""
+
+from collections import defaultdict
+
+from config import BATCH_SIZE, INITIAL_PROMPT
+from features import load_log_mel
+
+# Risoluzione dei token timestamp di Whisper (secondi)
+TIME_PRECISION = 0.02
+
+# Finestra di silenzio: stessa regola di model.transcribe
+NO_SPEECH_THRESHOLD = 0.6
+LOGPROB_THRESHOLD = -1.0
+
+
+def parse_segments(tokens: list[int], tokenizer, offset: float, duration: float) -> list[tuple[float, float, list[int]]]:
+    """
+    Converte i token di una finestra in segmenti usando i token timestamp
+
+    Formato Whisper: <|0.00|> testo <|2.40|><|2.40|> testo <|5.00|>
+
+    Args:
+        tokens: Token prodotti dal decoder (senza sequenza iniziale)
+        tokenizer: Tokenizer Whisper
+        offset: Inizio finestra nel chunk (secondi)
+        duration: Durata effettiva della finestra (secondi)
+
+    Returns:
+        Lista di (start, end, token testuali) con tempi relativi al chunk
+    """
+    segments = []
+    start = None
+    text_tokens = []
+
+    for token in tokens:
+        if token >= tokenizer.timestamp_begin:
+            t = (token - tokenizer.timestamp_begin) * TIME_PRECISION
+            if start is not None and text_tokens:
+                segments.append((offset + start, offset + min(t, duration), text_tokens))
+                start, text_tokens = None, []
+            else:
+                start = t
+        elif token < tokenizer.eot:
+            text_tokens.append(token)
+
+    # Testo finale senza timestamp di chiusura: arriva a fine finestra
+    if text_tokens:
+        segments.append((offset + (start or 0.0), offset + duration, text_tokens))
+
+    return segments
+
+
+def iter_windows(jobs: list[tuple[str, str]], n_mels: int):
+    """
+    Genera le finestre di 30s dei chunk, un chunk alla volta
+
+    Args:
+        jobs: Lista di (chiave chunk, percorso audio)
+        n_mels: Bande mel del modello
+
+    Yields:
+        Tupla (chiave chunk, offset in secondi, durata in secondi, log-mel finestra)
+    """
+    from whisper.audio import HOP_LENGTH, N_FRAMES, SAMPLE_RATE
+
+    for key, audio_path in jobs:
+        mel = load_log_mel(audio_path, n_mels)
+        # Il feature store include 30s di padding finale: ogni slice ha N_FRAMES frame
+        content_frames = mel.shape[-1] - N_FRAMES
+        for seek in range(0, content_frames, N_FRAMES):
+            frames = min(N_FRAMES, content_frames - seek)
+            yield key, seek * HOP_LENGTH / SAMPLE_RATE, frames * HOP_LENGTH / SAMPLE_RATE, mel[:, seek:seek + N_FRAMES]
+
+
+def decode_batch(model, batch: list, options, tokenizer) -> list[tuple[str, dict]]:
+    """
+    Encoder + decoder su un batch di finestre
+
+    Args:
+        model: Modello Whisper locale
+        batch: Finestre da iter_windows
+        options: DecodingOptions comuni al batch
+        tokenizer: Tokenizer della lingua del batch
+
+    Returns:
+        Lista di (chiave chunk, segmento) con tempi relativi al chunk
+    """
+    import torch
+
+    mel = torch.stack([window for _, _, _, window in batch]).to(model.device)
+
+    results = model.decode(mel, options)
+    segments = []
+
+    for (key, offset, duration, _), result in zip(batch, results):
+        # Finestra di silenzio: scartata come fa model.transcribe
+        if result.no_speech_prob > NO_SPEECH_THRESHOLD and result.avg_logprob < LOGPROB_THRESHOLD:
+            continue
+        for start, end, text_tokens in parse_segments(result.tokens, tokenizer, offset, duration):
+            segments.append((key, {
+                "start": start,
+                "end": end,
+                "text": tokenizer.decode(text_tokens),
+                "tokens": text_tokens,
+                "temperature": 0.0,
+                "avg_logprob": result.avg_logprob,
+                "compression_ratio": result.compression_ratio,
+                "no_speech_prob": result.no_speech_prob,
+            }))
+
+    return segments
+
+
+def transcribe_batched(model, jobs: list[tuple[str, str, str]], device: str, config: dict,
+                       batch_size: int = BATCH_SIZE) -> dict[str, list[dict]]:
+    """
+    Trascrive più chunk raggruppando le finestre di 30s in batch
+
+    Args:
+        model: Modello Whisper locale (non RemoteModel: serve model.decode)
+        jobs: Lista di (chiave chunk, percorso audio, lingua)
+        device: 'cuda' o 'cpu'
+        config: Configurazione beam_size dal MODEL_CONFIGS
+        batch_size: Finestre per batch
+
+    Returns:
+        Dict {chiave chunk: segmenti ordinati}, tempi relativi al chunk
+    """
+    from whisper.decoding import DecodingOptions
+    from whisper.tokenizer import get_tokenizer
+
+    # Stessa lingua = stesso prompt = stesse DecodingOptions per tutto il batch
+    by_language = defaultdict(list)
+    for key, audio_path, language in jobs:
+        by_language[language].append((key, str(audio_path)))
+
+    segments = {key: [] for key, _, _ in jobs}
+
+    for language, language_jobs in by_language.items():
+        tokenizer = get_tokenizer(
+            model.is_multilingual, num_languages=model.num_languages, language=language, task="transcribe"
+        )
+        options = DecodingOptions(
+            task="transcribe",
+            language=language,
+            prompt=INITIAL_PROMPT.get(language) or None,
+            temperature=0.0,
+            beam_size=config["beam_size"],  # best_of vale solo con temperatura > 0
+            fp16=(device == "cuda"),
+        )
+
+        batch = []
+        for window in iter_windows(language_jobs, model.dims.n_mels):
+            batch.append(window)
+            if len(batch) == batch_size:
+                for key, segment in decode_batch(model, batch, options, tokenizer):
+                    segments[key].append(segment)
+                batch = []
+        if batch:
+            for key, segment in decode_batch(model, batch, options, tokenizer):
+                segments[key].append(segment)
+
+    for chunk_segments in segments.values():
+        chunk_segments.sort(key=lambda s: s["start"])
+        for i, segment in enumerate(chunk_segments):
+            segment["id"] = i
+
+    return segments
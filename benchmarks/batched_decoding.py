@@ -0,0 +1,71 @@
+"""
+Benchmark motore batched vs transcribe_chunk
+
+Trascrive gli stessi file audio prima chunk per chunk (transcribe_chunk, come
+TRANSCRIPTION_ENGINE = "sequential") e poi con transcribe_batched, e confronta
+il throughput (secondi di audio trascritti per secondo di calcolo).
+
+Uso:
+    python benchmarks/batched_decoding.py chunks/chunk_000.wav chunks/chunk_001.wav
+    python benchmarks/batched_decoding.py chunks/*.wav --batch-size 4 8 16 --language it
+"""
+
+import argparse
+import importlib
+import sys
+import time
+from pathlib import Path
+
+# Import da directory parent
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from batch_engine import transcribe_batched
+from config import MODEL_CONFIGS, WHISPER_DEVICE, WHISPER_MODEL
+from models import load_whisper_model
+from utils import get_device, get_video_duration, print_header
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark motore batched vs sequential")
+    parser.add_argument("audio", type=Path, nargs="+", help="File audio (chunk WAV)")
+    parser.add_argument("--model", default=WHISPER_MODEL, choices=list(MODEL_CONFIGS))
+    parser.add_argument("--language", default="it")
+    parser.add_argument("--batch-size", type=int, nargs="+", default=[8])
+    args = parser.parse_args()
+
+    transcription = importlib.import_module("3_transcription")
+    config = MODEL_CONFIGS[args.model]
+
+    print_header(f"BENCHMARK MOTORE BATCHED ({args.model})")
+    device = get_device(WHISPER_DEVICE)
+    model = load_whisper_model(args.model, device)
+
+    audio_seconds = sum(get_video_duration(path) for path in args.audio)
+    print(f"🎧 Audio: {len(args.audio)} file, {audio_seconds:.0f}s totali\n")
+
+    # Riferimento: un chunk alla volta, batch 1
+    print("▶️  Sequential (transcribe_chunk)...", flush=True)
+    t0 = time.perf_counter()
+    for path in args.audio:
+        transcription.transcribe_chunk(model, path, args.language, device, config)
+    sequential_seconds = time.perf_counter() - t0
+    rows = [("sequential", sequential_seconds)]
+
+    jobs = [(str(path), path, args.language) for path in args.audio]
+    for batch_size in args.batch_size:
+        print(f"▶️  Batched (batch {batch_size})...", flush=True)
+        t0 = time.perf_counter()
+        transcribe_batched(model, jobs, device, config, batch_size)
+        rows.append((f"batched x{batch_size}", time.perf_counter() - t0))
+
+    print(f"\n{'Motore':<16} {'Tempo':>9} {'Audio/s':>9} {'Speedup':>9}")
+    print("─" * 46)
+    for name, elapsed in rows:
+        print(
+            f"{name:<16} {elapsed:>8.1f}s {audio_seconds / elapsed:>8.1f}x "
+            f"{sequential_seconds / elapsed:>8.2f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
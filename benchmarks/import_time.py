@@ -0,0 +1,123 @@
+"""
+Benchmark tempo di import degli step della pipeline
+
+Misura con `python -X importtime` quanto costa importare ogni entry point
+e fallisce se uno step supera il suo budget o carica dipendenze pesanti
+(torch, whisper, datapizza) che non gli servono.
+
+Uso:
+    python benchmarks/import_time.py            # tutti gli step
+    python benchmarks/import_time.py 1_chunking # solo uno step
+"""
+
+import subprocess
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).parent.parent
+
+# Budget di import per entry point (millisecondi)
+# Nessun entry point deve toccare torch all'import: budget stretti.
+# 3_transcription e stream_transcription usano Whisper, ma torch e whisper
+# vanno importati solo quando si carica un modello locale (HEAVY_MODULES).
+IMPORT_BUDGET_MS = {
+    "1_chunking": 150,
+    "2_language_detection": 150,
+    "3_transcription": 300,
+    "4_correction": 150,
+    "5_formatting": 150,
+    "6_indexing": 150,
+    "stream_transcription": 150,
+    "distributed": 150,
+    "evaluate": 150,
+    "fingerprint": 150,
+    "storage": 150,
+    "planner": 150,
+    "autotune": 200,
+    "model_server": 150,
+}
+
+# Moduli pesanti che NON devono comparire nell'import di uno step
+HEAVY_MODULES = ("torch", "whisper", "datapizza", "requests")
+
+
+def measure_import(module: str) -> tuple[float, set[str]]:
+    """
+    Importa un modulo in un processo pulito con -X importtime
+
+    Args:
+        module: Nome modulo (es. "1_chunking")
+
+    Returns:
+        Tupla (tempo di import in ms, insieme dei package top-level importati)
+
+    Raises:
+        RuntimeError: Se l'import fallisce
+    """
+    # Il tempo è misurato nel processo figlio attorno al solo import dello step,
+    # -X importtime serve a sapere QUALI package vengono caricati
+    code = (
+        "import importlib, time\n"
+        "t0 = time.perf_counter()\n"
+        f"importlib.import_module({module!r})\n"
+        "print(time.perf_counter() - t0)\n"
+    )
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        cwd=ROOT,
+        capture_output=True,
+        text=True,
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"Import di {module} fallito:\n{result.stderr[-2000:]}")
+
+    packages = set()
+
+    # Formato riga: "import time:  self [us] | cumulative | imported package"
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        fields = line[len("import time:"):].split("|")
+        if not fields[1].strip().isdigit():
+            continue  # Riga di intestazione
+        packages.add(fields[2].strip().split(".")[0])
+
+    return float(result.stdout.strip()) * 1000, packages
+
+
+def main():
+    modules = sys.argv[1:] or list(IMPORT_BUDGET_MS)
+    failures = []
+
+    print(f"{'Entry point':<24} {'Import':>10} {'Budget':>10}  Esito")
+    print("─" * 60)
+
+    for module in modules:
+        budget = IMPORT_BUDGET_MS.get(module)
+        try:
+            elapsed_ms, packages = measure_import(module)
+        except RuntimeError as e:
+            print(f"{module:<24} {'-':>10} {'-':>10}  ❌ {e}")
+            failures.append(module)
+            continue
+
+        heavy = sorted(packages.intersection(HEAVY_MODULES))
+        ok = not heavy and (budget is None or elapsed_ms <= budget)
+        budget_str = f"{budget}ms" if budget is not None else "-"
+        outcome = "✅" if ok else "❌"
+        if heavy:
+            outcome += f" importa {', '.join(heavy)}"
+        print(f"{module:<24} {elapsed_ms:>8.1f}ms {budget_str:>10}  {outcome}")
+
+        if not ok:
+            failures.append(module)
+
+    if failures:
+        print(f"\n❌ Budget superato: {', '.join(failures)}")
+        sys.exit(1)
+
+    print("\n✅ Tutti gli entry point entro budget")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+"""
+Benchmark caricamento pesi: whisper.load_model vs memory-map
+
+Avvia N processi worker insieme per ogni modalità (come TRANSCRIPTION_WORKERS > 1)
+e misura per worker tempo di caricamento, RSS, memoria privata e PSS (la quota
+proporzionale delle pagine condivise) da /proc/self/smaps_rollup, con tutti i
+worker vivi dopo un forward dell'encoder (che legge tutti i pesi dell'encoder).
+
+Con load_model ogni worker ha la sua copia privata dei pesi; in memory-map le
+pagine dei pesi sono condivise tramite la page cache e la PSS scende con N.
+
+Uso:
+    python benchmarks/mmap_weights.py
+    python benchmarks/mmap_weights.py --model large --workers 4
+"""
+
+import argparse
+import multiprocessing
+import sys
+import time
+from pathlib import Path
+
+# Import da directory parent
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from config import MODEL_CONFIGS, WHISPER_MODEL
+from models import load_mmap_model, mmap_checkpoint
+from utils import print_header
+
+MODES = ("load_model", "mmap")
+
+
+def memory_mb() -> dict:
+    """Rss, Pss, memoria privata e condivisa del processo (MB)"""
+    fields = {}
+    with open("/proc/self/smaps_rollup", encoding="utf-8") as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) == 3 and parts[2] == "kB":
+                fields[parts[0].rstrip(":")] = int(parts[1]) / 1024
+    return {
+        "rss": fields.get("Rss", 0.0),
+        "pss": fields.get("Pss", 0.0),
+        "private": fields.get("Private_Clean", 0.0) + fields.get("Private_Dirty", 0.0),
+        "shared": fields.get("Shared_Clean", 0.0) + fields.get("Shared_Dirty", 0.0),
+    }
+
+
+def run_worker(mode: str, model_key: str, barrier, results) -> None:
+    """Carica il modello, esegue l'encoder e misura la memoria con tutti i worker vivi"""
+    import torch
+    import whisper
+
+    torch.set_num_threads(1)
+
+    t0 = time.perf_counter()
+    if mode == "mmap":
+        model = load_mmap_model(model_key)
+    else:
+        model = whisper.load_model(MODEL_CONFIGS[model_key]["name"], device="cpu")
+    load_seconds = time.perf_counter() - t0
+
+    # Forward dell'encoder su 30s di silenzio: tocca tutte le pagine dei pesi dell'encoder
+    mel = whisper.log_mel_spectrogram(torch.zeros(whisper.audio.N_SAMPLES), model.dims.n_mels)
+    with torch.no_grad():
+        model.embed_audio(mel.unsqueeze(0))
+
+    barrier.wait()  # Tutti caricati: la PSS riflette la condivisione reale
+    results.put({"mode": mode, "load_seconds": load_seconds, **memory_mb()})
+    barrier.wait()  # Nessuno esce prima che tutti abbiano misurato
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark load_model vs pesi in memory-map")
+    parser.add_argument("--model", default=WHISPER_MODEL, choices=list(MODEL_CONFIGS))
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--modes", nargs="+", default=list(MODES), choices=MODES)
+    args = parser.parse_args()
+
+    print_header(f"BENCHMARK PESI IN MEMORY-MAP ({args.model}, {args.workers} worker)")
+
+    # Conversione fuori dalla misura (una tantum)
+    if "mmap" in args.modes:
+        print(f"💾 Checkpoint mmap: {mmap_checkpoint(args.model)}\n")
+
+    context = multiprocessing.get_context("spawn")
+    rows = []
+    for mode in args.modes:
+        print(f"▶️  {mode}...", flush=True)
+        barrier = context.Barrier(args.workers)
+        results = context.Queue()
+        workers = [
+            context.Process(target=run_worker, args=(mode, args.model, barrier, results))
+            for _ in range(args.workers)
+        ]
+        for worker in workers:
+            worker.start()
+        measured = [results.get() for _ in workers]
+        for worker in workers:
+            worker.join()
+
+        rows.append({
+            "mode": mode,
+            "load_seconds": max(r["load_seconds"] for r in measured),
+            **{key: sum(r[key] for r in measured) / len(measured) for key in ("rss", "pss", "private", "shared")},
+        })
+
+    print(f"\n{'Modalità':<12} {'Load':>8} {'RSS/worker':>11} {'PSS/worker':>11} {'Privata':>9} {'Totale PSS':>11}")
+    print("─" * 68)
+    for r in rows:
+        print(
+            f"{r['mode']:<12} {r['load_seconds']:>7.1f}s {r['rss']:>8.0f} MB {r['pss']:>8.0f} MB "
+            f"{r['private']:>6.0f} MB {r['pss'] * args.workers:>8.0f} MB"
+        )
+
+    if len(rows) == 2:
+        base, mapped = rows
+        print(
+            f"\n📊 mmap vs load_model: caricamento {base['load_seconds'] / max(mapped['load_seconds'], 1e-9):.1f}x "
+            f"più veloce, memoria totale {(mapped['pss'] - base['pss']) * args.workers:+.0f} MB"
+        )
+
+
+if __name__ == "__main__":
+    main()
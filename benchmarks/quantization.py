@@ -0,0 +1,126 @@
+"""
+Benchmark fp32 vs int8 su CPU
+
+Trascrive una clip di riferimento con ogni precisione (WHISPER_COMPUTE_TYPE)
+e confronta real-time factor, memoria di picco e WER rispetto al testo di riferimento.
+Ogni modalità gira in un processo separato, così la memoria di picco è misurata pulita.
+
+Uso:
+    python benchmarks/quantization.py clip.wav riferimento.txt
+    python benchmarks/quantization.py clip.wav riferimento.txt --model small --language it
+"""
+
+import argparse
+import importlib
+import json
+import resource
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+# Import da directory parent
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from config import MODEL_CONFIGS, WHISPER_MODEL
+from metrics import word_error_rate
+from models import COMPUTE_TYPES, load_whisper_model
+from utils import print_header
+
+
+def run_mode(clip: Path, model_key: str, language: str, compute_type: str) -> dict:
+    """
+    Carica il modello e trascrive la clip (eseguito nel processo figlio)
+
+    Returns:
+        Dict con tempi, durata audio, memoria di picco e testo
+    """
+    import whisper
+
+    transcription = importlib.import_module("3_transcription")
+
+    t0 = time.perf_counter()
+    model = load_whisper_model(model_key, "cpu", compute_type)
+    load_seconds = time.perf_counter() - t0
+
+    audio_seconds = len(whisper.load_audio(str(clip))) / whisper.audio.SAMPLE_RATE
+
+    t0 = time.perf_counter()
+    text = transcription.transcribe_chunk(model, clip, language, "cpu", MODEL_CONFIGS[model_key])
+    transcribe_seconds = time.perf_counter() - t0
+
+    return {
+        "compute_type": compute_type,
+        "load_seconds": load_seconds,
+        "transcribe_seconds": transcribe_seconds,
+        "audio_seconds": audio_seconds,
+        "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,  # KB su Linux
+        "text": text,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark fp32 vs int8 su CPU")
+    parser.add_argument("clip", type=Path, help="Clip audio di riferimento")
+    parser.add_argument("reference", type=Path, nargs="?", help="Trascrizione di riferimento (.txt)")
+    parser.add_argument("--model", default=WHISPER_MODEL, choices=list(MODEL_CONFIGS))
+    parser.add_argument("--language", default="it")
+    parser.add_argument("--modes", nargs="+", default=list(COMPUTE_TYPES), choices=COMPUTE_TYPES)
+    parser.add_argument("--run-mode", choices=COMPUTE_TYPES, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    # Processo figlio: una sola modalità, risultato JSON su stdout (ultima riga)
+    if args.run_mode:
+        result = run_mode(args.clip, args.model, args.language, args.run_mode)
+        print(json.dumps(result))
+        return
+
+    if args.reference is None:
+        parser.error("riferimento richiesto")
+
+    print_header(f"BENCHMARK QUANTIZZAZIONE ({args.model}, CPU)")
+    reference = args.reference.read_text(encoding="utf-8")
+    results = []
+
+    for mode in args.modes:
+        print(f"▶️  {mode}...", flush=True)
+        proc = subprocess.run(
+            [
+                sys.executable, __file__, str(args.clip),
+                "--model", args.model, "--language", args.language, "--run-mode", mode,
+            ],
+            capture_output=True,
+            text=True,
+        )
+        if proc.returncode != 0:
+            print(f"   ❌ Errore:\n{proc.stderr[-2000:]}")
+            sys.exit(1)
+
+        result = json.loads(proc.stdout.strip().splitlines()[-1])
+        result["rtf"] = result["transcribe_seconds"] / result["audio_seconds"]
+        result["wer"] = word_error_rate(reference, result["text"])
+        results.append(result)
+
+    print(f"\n{'Modalità':<10} {'Load':>8} {'RTF':>8} {'RSS picco':>11} {'WER':>8}")
+    print("─" * 50)
+    for r in results:
+        print(
+            f"{r['compute_type']:<10} {r['load_seconds']:>7.1f}s {r['rtf']:>8.3f} "
+            f"{r['peak_rss_mb']:>8.0f} MB {r['wer']*100:>7.2f}%"
+        )
+
+    baseline = next((r for r in results if r["compute_type"] == "fp32"), None)
+    if baseline:
+        for r in results:
+            if r is baseline:
+                continue
+            print(
+                f"\n📊 {r['compute_type']} vs fp32: "
+                f"{baseline['rtf'] / r['rtf']:.2f}x più veloce, "
+                f"RSS {r['peak_rss_mb'] - baseline['peak_rss_mb']:+.0f} MB, "
+                f"WER {(r['wer'] - baseline['wer'])*100:+.2f} punti"
+            )
+
+
+if __name__ == "__main__":
+    main()
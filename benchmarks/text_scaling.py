@@ -0,0 +1,274 @@
+"""
+Benchmark di scalabilità delle funzioni di testo
+
+clean_overlap, chunk_text, extract_text, validate_output, clean_text e smart_wrap
+sono codice Python puro su stringhe: su trascrizioni lunghe un comportamento
+quadratico diventa minuti. Qui ogni funzione gira su testo multilingua generato
+(it/es/en/fr, accenti, punteggiatura, paragrafi) di dimensione crescente; si misurano
+tempo e picco di allocazioni (tracemalloc) e si stima l'esponente di crescita
+(pendenza log-log: 1.0 = lineare, 2.0 = quadratica).
+
+Il confronto è con la baseline salvata nel profilo host (sezione "text_scaling"):
+fallisce se la pendenza supera la baseline di SLOPE_TOLERANCE o se il tempo a
+una dimensione supera TIME_TOLERANCE volte quello della baseline.
+
+Uso:
+    python benchmarks/text_scaling.py                      # fino a 10MB, confronto con baseline
+    python benchmarks/text_scaling.py --max-size 100MB     # fino a 100MB (lento)
+    python benchmarks/text_scaling.py smart_wrap clean_text
+    python benchmarks/text_scaling.py --update-baseline    # salva le misure come baseline
+"""
+
+import argparse
+import contextlib
+import importlib
+import io
+import json
+import math
+import random
+import sys
+import time
+import tracemalloc
+from datetime import datetime
+from pathlib import Path
+from types import SimpleNamespace
+
+# Import da directory parent
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from config import HOST_PROFILE
+from utils import print_header
+
+SIZES = [10_000, 100_000, 1_000_000, 10_000_000, 100_000_000]
+
+# Tolleranze rispetto alla baseline
+SLOPE_TOLERANCE = 0.25  # Pendenza log-log in più ammessa
+TIME_TOLERANCE = 2.0    # Rapporto massimo tempo / tempo baseline
+
+# Parole per lingua (con accenti e caratteri non ASCII)
+WORDS = {
+    "it": "perché però città università già più così attività qualità lezione esempio quindi "
+          "dobbiamo considerare sistema funzione risultato analisi modello dati parte".split(),
+    "es": "también están aquí después información público número música corazón niño "
+          "año señor mañana pequeño difícil último según análisis canción".split(),
+    "en": "the model should consider this function because results depend on data "
+          "analysis system example which however there their language speech".split(),
+    "fr": "être déjà très où français élève problème après système réponse "
+          "leçon garçon naïve façon hôpital forêt théâtre même préféré".split(),
+}
+
+
+def generate_text(size: int, seed: int = 0) -> str:
+    """
+    Testo multilingua di circa `size` caratteri
+
+    Frasi in una lingua per paragrafo, con spazi doppi e spazi prima della
+    punteggiatura (come l'output di Whisper), paragrafi separati da righe vuote.
+    Un blocco da ~256KB è generato e poi ripetuto per le dimensioni grandi.
+    """
+    rng = random.Random(seed)
+    paragraphs = []
+    length = 0
+    block = min(size, 256_000)
+
+    while length < block:
+        words = WORDS[rng.choice(list(WORDS))]
+        sentences = []
+        for _ in range(rng.randint(2, 8)):
+            sentence = " ".join(rng.choice(words) for _ in range(rng.randint(5, 20)))
+            sentences.append(sentence.capitalize() + rng.choice([".", " .", "?", "!", " ,  e poi."]))
+        paragraph = "  ".join(sentences) if rng.random() < 0.2 else " ".join(sentences)
+        paragraphs.append(paragraph)
+        length += len(paragraph) + 2
+
+    text = "\n\n".join(paragraphs)
+    return (text * (size // len(text) + 1))[:size]
+
+
+def make_cases(text: str) -> dict:
+    """
+    Argomenti per ogni funzione sul testo dato
+
+    Returns:
+        Dict {nome: (funzione, args)}
+    """
+    transcription = importlib.import_module("3_transcription")
+    correction = importlib.import_module("4_correction")
+    formatting = importlib.import_module("5_formatting")
+
+    # Coda del testo precedente ripetuta all'inizio del successivo (come l'overlap tra chunk)
+    curr = text[-40:] + text
+    response = SimpleNamespace(content=[SimpleNamespace(text=p) for p in text.split("\n\n")])
+
+    return {
+        "clean_overlap": (transcription.clean_overlap, (text, curr)),
+        "chunk_text": (correction.chunk_text, (text,)),
+        "extract_text": (correction.extract_text, (response,)),
+        "validate_output": (correction.validate_output, (text, text)),
+        "clean_text": (formatting.clean_text, (text,)),
+        "smart_wrap": (formatting.smart_wrap, (text,)),
+    }
+
+
+def measure(func, args: tuple, repeats: int) -> tuple[float, int]:
+    """
+    Tempo migliore su `repeats` esecuzioni e picco di memoria allocata
+
+    Il picco è misurato in un'esecuzione separata: tracemalloc rallenta il codice.
+
+    Returns:
+        Tupla (secondi, byte di picco)
+    """
+    # Le funzioni stampano diagnostica (overlap rimosso, output troppo lungo...)
+    with contextlib.redirect_stdout(io.StringIO()):
+        best = math.inf
+        for _ in range(repeats):
+            t0 = time.perf_counter()
+            func(*args)
+            best = min(best, time.perf_counter() - t0)
+
+        tracemalloc.start()
+        func(*args)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+    return best, peak
+
+
+def fit_slope(sizes: list[int], seconds: list[float]) -> float:
+    """Pendenza della retta ai minimi quadrati su log(dimensione), log(tempo)"""
+    xs = [math.log(s) for s in sizes]
+    ys = [math.log(max(t, 1e-9)) for t in seconds]
+    mean_x, mean_y = sum(xs) / len(xs), sum(ys) / len(ys)
+    den = sum((x - mean_x) ** 2 for x in xs)
+    return sum((x - mean_x) * (y - mean_y) for x, y in zip(xs, ys)) / den if den else 0.0
+
+
+def parse_size(value: str) -> int:
+    """Interpreta "10KB", "1MB", "100MB" o un numero di caratteri"""
+    units = {"KB": 1_000, "MB": 1_000_000, "GB": 1_000_000_000}
+    value = value.strip().upper()
+    for unit, factor in units.items():
+        if value.endswith(unit):
+            return int(float(value[:-len(unit)]) * factor)
+    return int(value)
+
+
+def format_size(size: int) -> str:
+    return f"{size / 1_000_000:g}MB" if size >= 1_000_000 else f"{size / 1_000:g}KB"
+
+
+def load_baseline() -> dict:
+    if not HOST_PROFILE.exists():
+        return {}
+    return json.loads(HOST_PROFILE.read_text(encoding="utf-8")).get("text_scaling", {})
+
+
+def save_baseline(results: dict) -> None:
+    """Salva le misure nel profilo host, preservando le altre sezioni e funzioni"""
+    profile = json.loads(HOST_PROFILE.read_text(encoding="utf-8")) if HOST_PROFILE.exists() else {}
+    baseline = profile.get("text_scaling", {})
+    baseline.update(results)
+    for result in baseline.values():
+        result.setdefault("measured_at", datetime.now().isoformat(timespec="seconds"))
+    profile["text_scaling"] = baseline
+    HOST_PROFILE.parent.mkdir(parents=True, exist_ok=True)
+    HOST_PROFILE.write_text(json.dumps(profile, indent=2), encoding="utf-8")
+
+
+def compare(name: str, result: dict, baseline: dict) -> list[str]:
+    """
+    Regressioni di una funzione rispetto alla baseline
+
+    Returns:
+        Descrizioni delle regressioni (vuota se nessuna)
+    """
+    if name not in baseline:
+        return []
+
+    regressions = []
+    reference = baseline[name]
+    if result["slope"] > reference["slope"] + SLOPE_TOLERANCE:
+        regressions.append(f"pendenza {result['slope']:.2f} (baseline {reference['slope']:.2f})")
+
+    for size, seconds in result["seconds"].items():
+        reference_seconds = reference["seconds"].get(size)
+        if reference_seconds and seconds > reference_seconds * TIME_TOLERANCE and seconds > 0.01:
+            regressions.append(f"{format_size(int(size))}: {seconds:.3f}s (baseline {reference_seconds:.3f}s)")
+
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark di scalabilità delle funzioni di testo")
+    parser.add_argument("functions", nargs="*", help="Funzioni da misurare (default: tutte)")
+    parser.add_argument("--max-size", default="10MB", help="Dimensione massima del testo (es. 100MB)")
+    parser.add_argument("--update-baseline", action="store_true", help="Salva le misure come baseline")
+    args = parser.parse_args()
+
+    sizes = [size for size in SIZES if size <= parse_size(args.max_size)]
+    if len(sizes) < 2:
+        print("❌ Servono almeno due dimensioni: usa --max-size 100KB o più")
+        sys.exit(1)
+
+    names = args.functions or list(make_cases("x"))
+    unknown = [name for name in names if name not in make_cases("x")]
+    if unknown:
+        print(f"❌ Funzioni sconosciute: {', '.join(unknown)}")
+        sys.exit(1)
+
+    print_header("SCALABILITÀ FUNZIONI DI TESTO")
+    print(f"📏 Dimensioni: {', '.join(format_size(s) for s in sizes)}\n")
+
+    results = {name: {"seconds": {}, "peak_bytes": {}} for name in names}
+    for size in sizes:
+        text = generate_text(size)
+        cases = make_cases(text)
+        repeats = 5 if size <= 1_000_000 else 1
+        for name in names:
+            func, func_args = cases[name]
+            seconds, peak = measure(func, func_args, repeats)
+            results[name]["seconds"][str(size)] = seconds
+            results[name]["peak_bytes"][str(size)] = peak
+            print(f"   {name:<16} {format_size(size):>7}: {seconds * 1000:>10.2f}ms  picco {peak / 1e6:>8.1f}MB")
+        del text, cases
+
+    for result in results.values():
+        result["slope"] = fit_slope(sizes, [result["seconds"][str(s)] for s in sizes])
+
+    baseline = load_baseline()
+    failures = {}
+
+    print(f"\n{'Funzione':<16} {'Pendenza':>9} {'Baseline':>9} {'Picco/char':>11}  Esito")
+    print("─" * 64)
+    for name, result in results.items():
+        largest = str(sizes[-1])
+        per_char = result["peak_bytes"][largest] / int(largest)
+        reference = baseline.get(name, {}).get("slope")
+        reference_str = f"{reference:.2f}" if reference is not None else "-"
+        regressions = compare(name, result, baseline)
+        if regressions:
+            failures[name] = regressions
+        print(f"{name:<16} {result['slope']:>9.2f} {reference_str:>9} {per_char:>10.1f}B  "
+              f"{'❌' if regressions else '✅'}")
+
+    if args.update_baseline:
+        save_baseline(results)
+        print(f"\n💾 Baseline salvata in {HOST_PROFILE}")
+        return
+
+    if not baseline:
+        print("\n💡 Nessuna baseline per questo host: python benchmarks/text_scaling.py --update-baseline")
+
+    if failures:
+        print()
+        for name, regressions in failures.items():
+            for regression in regressions:
+                print(f"❌ {name}: {regression}")
+        sys.exit(1)
+
+    print("\n✅ Nessuna regressione")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,81 +1,358 @@
-"""
-Configurazione centralizzata del progetto
-
-Modifica questi parametri secondo le tue esigenze prima di eseguire la pipeline.
-"""
-
-import os
-from pathlib import Path
-
-# =============================================================================
-# PERCORSI
-# =============================================================================
-
-INPUT_VIDEO = Path("video.mp4")      # Video da trascrivere
-CHUNKS_DIR = Path("chunks")          # Directory chunk temporanei
-OUTPUT_DIR = Path("output")          # Directory output trascrizioni
-
-# =============================================================================
-# PARAMETRI CHUNKING
-# =============================================================================
-
-MAX_CHUNK_SECONDS = 480  # Durata massima chunk (8 minuti, raccomandato)
-OVERLAP_SECONDS = 2      # Overlap tra chunk per continuità (2s raccomandato)
-
-# =============================================================================
-# WHISPER
-# =============================================================================
-
-WHISPER_MODEL = "medium"  # Opzioni: base, small, medium, large
-WHISPER_DEVICE = "cuda"   # "cuda" per GPU, "cpu" per CPU
-
-# Configurazioni modelli Whisper (beam_size e best_of per accuratezza)
-MODEL_CONFIGS = {
-    "base": {
-        "name": "base",
-        "beam_size": 2,
-        "best_of": 2,
-    },
-    "small": {
-        "name": "small",
-        "beam_size": 3,
-        "best_of": 2,
-    },
-    "medium": {
-        "name": "medium",
-        "beam_size": 3,
-        "best_of": 3,
-    },
-    "large": {
-        "name": "large-v3",
-        "beam_size": 5,
-        "best_of": 5,
-    }
-}
-
-# =============================================================================
-# RILEVAMENTO LINGUA
-# =============================================================================
-
-# Modalità detection: "auto" (tutto IT), "manual" (chiede per ogni chunk), "fixed" (usa FIXED_LANGUAGE)
-LANGUAGE_DETECTION_MODE = "auto"
-FIXED_LANGUAGE = "it"  # Usato solo se mode = "fixed"
-
-# Prompt iniziali per Whisper (migliorano accuratezza su termini tecnici)
-# Personalizza questi prompt in base al contenuto del tuo video
-INITIAL_PROMPT = {
-    "it": "Trascrizione audio in italiano con terminologia tecnica e formale.",
-    "es": "Transcripción de audio en español con terminología técnica y formal.",
-    "en": "Audio transcription in English with technical and formal terminology.",
-    "fr": "Transcription audio en français avec terminologie technique et formelle."
-}
-
-# =============================================================================
-# OLLAMA (Correzione AI)
-# =============================================================================
-
-# API Key da variabile d'ambiente (sicuro) o fallback vuoto
-# Per Ollama locale (default), nessuna chiave necessaria
-OLLAMA_API_KEY = os.getenv("OLLAMA_API_KEY", "")
-OLLAMA_MODEL = "llama3.1:8b"
-OLLAMA_BASE_URL = "http://localhost:11434/v1"
+"""
+Configurazione centralizzata del progetto
+
+Modifica questi parametri secondo le tue esigenze prima di eseguire la pipeline.
+"""
+
+import getpass
+import json
+import os
+import socket
+from pathlib import Path
+
+# =============================================================================
+# PERCORSI
+# =============================================================================
+
+INPUT_VIDEO = Path("video.mp4")      # Video da trascrivere
+CHUNKS_DIR = Path("chunks")          # Directory chunk temporanei
+OUTPUT_DIR = Path("output")          # Directory output trascrizioni
+FEATURES_DIR = CHUNKS_DIR / "features"  # Cache log-mel (.npy) riusata tra modelli e riesecuzioni
+
+# =============================================================================
+# PARAMETRI CHUNKING
+# =============================================================================
+
+MAX_CHUNK_SECONDS = 480  # Durata massima chunk (8 minuti, raccomandato)
+OVERLAP_SECONDS = 2      # Overlap tra chunk per continuità (2s raccomandato)
+
+# =============================================================================
+# STORAGE INTERMEDIO
+# =============================================================================
+
+# Audio estratto dai chunk: "wav" (PCM, default) o "flac" (lossless, circa metà dei byte)
+AUDIO_FORMAT = "wav"
+
+# Area di staging per l'audio estratto, ricalcolabile dai chunk: su tmpfs (es.
+# Path("/dev/shm/trascrizione")) non costa I/O su disco. None = accanto ai chunk
+STAGING_DIR = None
+
+# Budget disco per CHUNKS_DIR + STAGING_DIR in MB (None = nessun limite): oltre il
+# budget si liberano audio e feature dei chunk già trascritti, poi lo step si interrompe
+# con un errore
+DISK_BUDGET_MB = None
+
+# Elimina audio e feature di un chunk appena la sua trascrizione è salvata, il video a
+# fine trascrizione riuscita (3_transcription.py non riprende: se si interrompe riparte
+# dal primo chunk). Dopo, per rieseguire 3_transcription.py servirà di nuovo 1_chunking.py
+DELETE_COMMITTED_CHUNKS = False
+
+# Byte letti/scritti su disco da ogni step (python storage.py)
+IO_REPORT_FILE = CHUNKS_DIR / "io_report.json"
+
+# =============================================================================
+# WHISPER
+# =============================================================================
+
+WHISPER_MODEL = "medium"  # Opzioni: base, small, medium, large
+WHISPER_DEVICE = "cuda"   # "cuda" per GPU, "cpu" per CPU (se CUDA manca si usa la CPU)
+
+# Precisione inferenza su CPU: "fp32" (default) o "int8" (quantizzazione dinamica
+# dei layer lineari: più veloce e meno RAM, accuratezza leggermente inferiore)
+# Misura il trade-off con: python benchmarks/quantization.py
+WHISPER_COMPUTE_TYPE = "fp32"
+
+# Pesi in memory-map su CPU: il checkpoint è convertito una volta in WHISPER_WEIGHTS_DIR
+# e mappato da ogni processo, così più worker sullo stesso nodo condividono i pesi
+# (con "int8" i pesi quantizzati restano privati: si risparmia solo sul caricamento)
+# Misura RSS e tempi di caricamento con: python benchmarks/mmap_weights.py
+WHISPER_WEIGHTS_MMAP = False
+WHISPER_WEIGHTS_DIR = Path("models") / "mmap"
+
+# Configurazioni modelli Whisper (beam_size e best_of per accuratezza)
+MODEL_CONFIGS = {
+    "base": {
+        "name": "base",
+        "beam_size": 2,
+        "best_of": 2,
+    },
+    "small": {
+        "name": "small",
+        "beam_size": 3,
+        "best_of": 2,
+    },
+    "medium": {
+        "name": "medium",
+        "beam_size": 3,
+        "best_of": 3,
+    },
+    "large": {
+        "name": "large-v3",
+        "beam_size": 5,
+        "best_of": 5,
+    }
+}
+
+# Modalità di decoding:
+# - "beam": beam search (beam_size/best_of di MODEL_CONFIGS) su tutto l'audio (default)
+# - "adaptive": prima passata greedy, beam search solo sui segmenti a bassa confidenza
+DECODING_MODE = "beam"
+
+# Soglie di confidenza per segmento (le stesse metriche che Whisper usa per il fallback)
+CONFIDENCE_THRESHOLDS = {
+    "avg_logprob": -1.0,       # Sotto soglia → decoding incerto
+    "compression_ratio": 2.4,  # Sopra soglia → testo ripetitivo
+    "no_speech_prob": 0.6,     # Sopra soglia → probabile silenzio/rumore
+}
+
+# Cascata a due modelli: CASCADE_FAST_MODEL trascrive tutto, WHISPER_MODEL
+# ri-trascrive solo le zone a bassa confidenza (stesse CONFIDENCE_THRESHOLDS),
+# allargate a finestre di CASCADE_WINDOW_SECONDS (la finestra nativa di Whisper)
+# In cascata entrambi i modelli usano il beam di MODEL_CONFIGS (DECODING_MODE ignorato)
+CASCADE_ENABLED = False
+CASCADE_FAST_MODEL = "small"
+CASCADE_WINDOW_SECONDS = 30
+
+# Loop di ripetizione (con temperature=0 e senza contesto Whisper può ripetere la stessa
+# frase decine di volte): un segmento è in loop se un n-gramma di LOOP_NGRAM parole compare
+# almeno LOOP_MAX_REPEATS volte, se il suo testo ha compression ratio oltre
+# LOOP_MAX_COMPRESSION_RATIO o se LOOP_MAX_REPEATS segmenti consecutivi hanno lo stesso testo.
+# Solo la finestra di LOOP_WINDOW_SECONDS attorno al loop è ri-decodificata con le
+# temperature di fallback e ricucita, non l'intero chunk
+LOOP_REPAIR_ENABLED = True
+LOOP_NGRAM = 3
+LOOP_MAX_REPEATS = 4
+LOOP_MAX_COMPRESSION_RATIO = 2.4
+LOOP_WINDOW_SECONDS = 30
+LOOP_FALLBACK_TEMPERATURES = (0.2, 0.4, 0.6, 0.8, 1.0)
+
+# Motore di trascrizione:
+# - "sequential": model.transcribe chunk per chunk (default, supporta tutte le modalità)
+# - "batched": finestre di 30s di più chunk (stessa lingua) decodificate in batch
+#   → più throughput su CPU; richiede modello locale, ignora DECODING_MODE e cascata
+TRANSCRIPTION_ENGINE = "sequential"
+BATCH_SIZE = 8  # Finestre da 30s per batch (più alto = più RAM/VRAM)
+
+# =============================================================================
+# VAD (salto dei tratti senza parlato, opzionale)
+# =============================================================================
+
+# Prima di Whisper rimuove pause lunghe e silenzi (meno calcolo, meno testo
+# "inventato" sul silenzio); i timestamp sono riportati sul tempo originale
+VAD_ENABLED = False
+VAD_THRESHOLD_DB = 12.0        # dB sopra il rumore di fondo per considerare un frame parlato
+VAD_MIN_SILENCE_SECONDS = 2.0  # Solo le pause più lunghe vengono saltate
+VAD_PADDING_SECONDS = 0.3      # Margine mantenuto attorno al parlato
+VAD_MODULATION_DB = 0.0        # >0 scarta anche blocchi troppo stazionari (musica), es. 4.0
+
+# =============================================================================
+# DEDUPLICAZIONE AUDIO (fingerprint)
+# =============================================================================
+
+# Audio già trascritto (ri-caricamenti, sigle di apertura/chiusura, video ri-tagliati
+# da un master) riconosciuto con un fingerprint spettrale (fingerprint.py): i tratti
+# in comune riusano i segmenti con timestamp già salvati, Whisper gira solo sul resto.
+# L'indice è condiviso tra esecuzioni; si riusa solo con stessa lingua, stesso modello
+# e stesse impostazioni di decoding (prompt, beam, DECODING_MODE, precisione, VAD, loop, cascata)
+FINGERPRINT_ENABLED = False
+FINGERPRINT_DB = Path("fingerprint_audio.db")
+FINGERPRINT_MIN_SPAN_SECONDS = 10.0  # Tratti più brevi non sono riusati (es. overlap tra chunk)
+FINGERPRINT_MIN_MATCH_RATE = 1.0     # Hash coincidenti al secondo per riconoscere un tratto
+
+# =============================================================================
+# PARALLELISMO
+# =============================================================================
+
+TORCH_THREADS = 0          # Thread intra-op di torch per processo (0 = default di torch)
+TRANSCRIPTION_WORKERS = 1  # Processi di trascrizione in parallelo (solo CPU, motore sequential)
+
+# =============================================================================
+# WATCHDOG MEMORIA
+# =============================================================================
+
+# Durante la trascrizione un thread campiona la memoria disponibile (sistema/cgroup)
+# e la RSS del job (processo + worker). Sotto pressione il job si degrada invece di
+# farsi uccidere dall'OOM killer; ogni intervento è nel report (chiave "memory"):
+# - sotto WATCHDOG_PRESSURE_MB: meno chunk in coda ai worker, batch più piccoli; se dura
+#   WATCHDOG_SUSTAINED_CHUNKS chunk, il modello precedente in MODEL_CONFIGS
+# - sotto WATCHDOG_CRITICAL_MB: meno worker, poi il modello precedente in MODEL_CONFIGS
+# Si attende che la memoria si liberi solo se è occupata soprattutto da altri processi
+WATCHDOG_ENABLED = True
+WATCHDOG_PRESSURE_MB = 2048
+WATCHDOG_CRITICAL_MB = 1024
+WATCHDOG_RSS_LIMIT_MB = None      # Tetto RSS del job (None = solo memoria disponibile)
+WATCHDOG_INTERVAL_SECONDS = 1.0
+WATCHDOG_MAX_TOTAL_WAIT_SECONDS = 120  # Attesa massima che la memoria si liberi, per esecuzione
+WATCHDOG_SUSTAINED_CHUNKS = 3     # Chunk consecutivi sotto pressione prima di ridurre il modello
+BATCH_GROUP_JOBS = 4              # Motore batched: chunk tra due controlli del watchdog
+
+# =============================================================================
+# ARCHIVIO SEGMENTI
+# =============================================================================
+
+# Segmenti e parole con timestamp assoluti (output/trascrizione.segs, vedi segment_store.py):
+# ricerche per tempo ed export SRT/VTT senza ritrascrivere
+SEGMENT_STORE_ENABLED = True
+WORD_TIMESTAMPS = True  # Tempi per parola (costo extra contenuto: allineamento sull'attenzione)
+
+# =============================================================================
+# PIANIFICAZIONE A SCADENZA (opzionale)
+# =============================================================================
+
+# Piano scritto da `python planner.py plan --deadline 09:00`: se esiste,
+# 3_transcription.py usa modello e beam scelti dal planner invece di WHISPER_MODEL
+DEADLINE_PLAN_FILE = CHUNKS_DIR / "plan.json"
+PLANNER_SAFETY_MARGIN = 1.15  # Tempo previsto x margine (overhead I/O, variabilità)
+
+# =============================================================================
+# MODEL SERVER (opzionale)
+# =============================================================================
+
+# Server residente che tiene i modelli Whisper in memoria tra un'esecuzione e l'altra
+# Avvio: python model_server.py  → con MODEL_SERVER_ENABLED 3_transcription.py lo usa se è attivo
+# La socket sta in una cartella dell'utente (0700): server e client rifiutano processi di altri utenti
+MODEL_SERVER_ENABLED = False                               # Usa il server se raggiungibile
+MODEL_SERVER_DIR = Path(os.getenv("XDG_RUNTIME_DIR") or f"/tmp/whisper-{getpass.getuser()}")
+MODEL_SERVER_SOCKET = MODEL_SERVER_DIR / "whisper_model_server.sock"
+MODEL_SERVER_MODELS = [WHISPER_MODEL]                      # Modelli precaricati all'avvio
+MODEL_SERVER_TIMEOUT_SECONDS = 900  # Risposta massima per chunk; oltre → modello caricato localmente
+
+# =============================================================================
+# TRASCRIZIONE DISTRIBUITA (opzionale)
+# =============================================================================
+
+# Coda di lavoro su filesystem condiviso (NFS): python distributed.py worker su ogni nodo
+DISTRIBUTED_DIR = CHUNKS_DIR / "queue"       # Lease e risultati (stesso share dei chunk)
+DISTRIBUTED_HEARTBEAT_SECONDS = 10           # Ogni quanto un worker rinnova il suo lease
+DISTRIBUTED_LEASE_TIMEOUT_SECONDS = 120      # Lease senza heartbeat da più di così → chunk riassegnato
+DISTRIBUTED_MAX_ATTEMPTS = 3                 # Tentativi per chunk (worker morti o errori) prima di failed/
+
+# =============================================================================
+# STREAMING (opzionale)
+# =============================================================================
+
+# Trascrizione di registrazioni in corso: python stream_transcription.py <file|->
+# Ogni STREAM_STEP_SECONDS di audio nuovo la finestra (al più STREAM_WINDOW_SECONDS)
+# è ri-decodificata; il testo confermato è aggiunto a STREAM_OUTPUT man mano
+STREAM_STEP_SECONDS = 2.0
+STREAM_WINDOW_SECONDS = 30.0        # Finestra nativa di Whisper
+STREAM_MAX_LATENCY_SECONDS = 10.0   # Una parola è confermata al più N secondi dopo la sua fine
+STREAM_IDLE_TIMEOUT_SECONDS = 30.0  # File fermo da N secondi → registrazione conclusa
+STREAM_OUTPUT = OUTPUT_DIR / "trascrizione_live.txt"
+
+# =============================================================================
+# AVANZAMENTO (endpoint HTTP locale, opzionale)
+# =============================================================================
+
+# Gli step 3 e 4 pubblicano stage, chunk, ETA e testo prodotto su un server HTTP
+# in memoria (solo 127.0.0.1, libreria standard, vedi progress.py):
+#   GET /progress               → stato ed ETA dal real-time factor misurato
+#   GET /transcript?offset=N    → solo il testo nuovo dal carattere N
+PROGRESS_ENABLED = False
+PROGRESS_PORT = 8765
+
+# =============================================================================
+# RILEVAMENTO LINGUA
+# =============================================================================
+
+# Modalità detection: "auto" (tutto IT), "manual" (chiede per ogni chunk), "fixed" (usa FIXED_LANGUAGE),
+# "switch" (rileva la lingua e i cambi lingua dentro ogni chunk con un modello piccolo)
+LANGUAGE_DETECTION_MODE = "auto"
+FIXED_LANGUAGE = "it"  # Usato solo se mode = "fixed"
+
+# Modalità "manual": clip di preview tagliate in background mentre l'operatore risponde
+PREVIEW_DIR = CHUNKS_DIR / "previews"  # Cache clip (audio mono a basso bitrate)
+PREVIEW_SECONDS = 10                   # Durata di ogni clip
+PREVIEW_POINTS = 1                     # Clip per chunk, distribuite nel chunk ('p' ripetuto = successiva)
+PREVIEW_WORKERS = 4                    # Processi ffmpeg in parallelo
+
+# Modalità "switch": lingua stimata su finestre scorrevoli dentro il chunk
+LANGUAGE_SWITCH_MODEL = "base"                     # Basta un modello piccolo per la lingua
+LANGUAGE_SWITCH_CANDIDATES = ["it", "es", "en", "fr"]
+LANGUAGE_SWITCH_WINDOW_SECONDS = 10                # Audio per stima
+LANGUAGE_SWITCH_HOP_SECONDS = 5                    # Passo tra le finestre (risoluzione del confine)
+LANGUAGE_SWITCH_MIN_SECONDS = 20                   # Tratti più brevi non contano come cambio lingua
+LANGUAGE_SWITCH_MIN_PROB = 0.5                     # Sotto: finestra incerta (silenzio, rumore)
+
+# Prompt iniziali per Whisper (migliorano accuratezza su termini tecnici)
+# Personalizza questi prompt in base al contenuto del tuo video
+INITIAL_PROMPT = {
+    "it": "Trascrizione audio in italiano con terminologia tecnica e formale.",
+    "es": "Transcripción de audio en español con terminología técnica y formal.",
+    "en": "Audio transcription in English with technical and formal terminology.",
+    "fr": "Transcription audio en français avec terminologie technique et formelle."
+}
+
+# =============================================================================
+# OLLAMA (Correzione AI)
+# =============================================================================
+
+# API Key da variabile d'ambiente (sicuro) o fallback vuoto
+# Per Ollama locale (default), nessuna chiave necessaria
+OLLAMA_API_KEY = os.getenv("OLLAMA_API_KEY", "")
+OLLAMA_MODEL = "llama3.1:8b"
+OLLAMA_BASE_URL = "http://localhost:11434/v1"
+
+# =============================================================================
+# INDICIZZAZIONE (Step 6)
+# =============================================================================
+
+# Indice full-text SQLite FTS5 condiviso da tutte le registrazioni (python 6_indexing.py)
+INDEX_DB = Path("indice_trascrizioni.db")
+
+# =============================================================================
+# VALUTAZIONE (guardrail di accuratezza)
+# =============================================================================
+
+# Set di riferimento: coppie audio + trascrizione con lo stesso nome (lezione.wav + lezione.txt)
+EVAL_DIR = Path("eval")
+
+# Varianti da confrontare (python evaluate.py): override di questo file per ciascuna
+EVAL_VARIANTS = {
+    "baseline": {},
+    "int8": {"WHISPER_COMPUTE_TYPE": "int8"},
+    "adaptive": {"DECODING_MODE": "adaptive"},
+    "vad": {"VAD_ENABLED": True},
+    "small": {"WHISPER_MODEL": "small"},
+}
+EVAL_BASELINE = "baseline"
+
+# Peggioramento massimo rispetto alla baseline (punti assoluti, 0.02 = +2% WER)
+EVAL_MAX_WER_INCREASE = 0.02
+EVAL_MAX_CER_INCREASE = 0.01
+
+# =============================================================================
+# PROFILING (opzionale)
+# =============================================================================
+
+# Stage da profilare: "transcribe_chunk", "clean_overlap", "correct_transcription"
+# Anche da variabile d'ambiente, senza toccare questo file:
+#   PROFILE_STAGES=transcribe_chunk PROFILE_BACKEND=torch python 3_transcription.py
+PROFILE_STAGES = [s for s in os.getenv("PROFILE_STAGES", "").split(",") if s]
+PROFILE_BACKEND = os.getenv("PROFILE_BACKEND", "cprofile")  # "cprofile" (.pstats) o "torch" (Chrome trace)
+# Valori non numerici: avviso e default, invece di far fallire l'import di ogni step
+try:
+    PROFILE_EVERY = int(os.getenv("PROFILE_EVERY", "1"))    # Profila un'esecuzione ogni N
+except ValueError:
+    print(f"⚠️  PROFILE_EVERY non valido ({os.getenv('PROFILE_EVERY')!r}): profilo ogni esecuzione")
+    PROFILE_EVERY = 1
+try:
+    PROFILE_CHUNKS = [int(i) for i in os.getenv("PROFILE_CHUNKS", "").split(",") if i.strip()]  # Indici espliciti (1-based)
+except ValueError:
+    print(f"⚠️  PROFILE_CHUNKS non valido ({os.getenv('PROFILE_CHUNKS')!r}): uso PROFILE_EVERY")
+    PROFILE_CHUNKS = []
+PROFILE_DIR = OUTPUT_DIR / "profiles"
+
+# =============================================================================
+# PROFILO HOST (autotune)
+# =============================================================================
+
+# Scritto da `python autotune.py`: se esiste, i valori misurati su questa macchina
+# sostituiscono MAX_CHUNK_SECONDS, TORCH_THREADS e TRANSCRIPTION_WORKERS
+HOST_PROFILE = Path("profiles") / f"{socket.gethostname()}.json"
+
+if HOST_PROFILE.exists():
+    _autotune = json.loads(HOST_PROFILE.read_text(encoding="utf-8")).get("autotune", {})
+    MAX_CHUNK_SECONDS = _autotune.get("chunk_seconds", MAX_CHUNK_SECONDS)
+    TORCH_THREADS = _autotune.get("threads", TORCH_THREADS)
+    TRANSCRIPTION_WORKERS = _autotune.get("workers", TRANSCRIPTION_WORKERS)
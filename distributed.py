@@ -0,0 +1,515 @@
+"""
+Trascrizione distribuita su più nodi con una coda su filesystem condiviso
+
+chunks_info.json diventa una coda di lavoro in DISTRIBUTED_DIR (sotto CHUNKS_DIR,
+quindi sullo stesso share NFS dei chunk). Nessun server: il coordinamento avviene
+solo con operazioni atomiche sul filesystem.
+
+- Lease: leases/chunk_NNN.lease creato con O_CREAT|O_EXCL (uno solo vince)
+- Heartbeat: un thread del worker aggiorna l'mtime del lease ogni
+  DISTRIBUTED_HEARTBEAT_SECONDS
+- Scadenza: un lease non aggiornato da DISTRIBUTED_LEASE_TIMEOUT_SECONDS (worker
+  morto, nodo spento) viene rinominato da chi lo ruba (rename atomico: uno solo
+  riesce, e controlla di aver spostato davvero il lease scaduto) e il chunk torna
+  disponibile
+- Tentativi: il lease conta i tentativi sul chunk; dopo DISTRIBUTED_MAX_ATTEMPTS
+  (worker morti o errori sullo stesso chunk) il chunk finisce in failed/ e non
+  viene più assegnato
+- Risultati: results/chunk_NNN.json scritto su file temporaneo + os.replace;
+  un chunk con risultato è fatto, anche se rielaborato due volte il risultato è lo stesso
+
+Il coordinatore (merge) attende tutti i risultati e li unisce in ordine con la
+stessa gestione di overlap e cambio lingua di 3_transcription.py.
+Gli orologi dei nodi devono essere sincronizzati (NTP): la scadenza confronta
+l'mtime del lease con l'ora locale.
+
+Uso:
+    python distributed.py worker                  # Su ogni nodo (anche più volte)
+    python distributed.py merge --wait            # Coordinatore: unisce quando tutto è pronto
+    python distributed.py local --processes 4     # Prova locale: N worker + merge
+    python distributed.py status                  # Stato della coda
+    python distributed.py retry                   # Rimette in coda i chunk falliti
+    python distributed.py reset                   # Svuota lease e risultati
+"""
+
+import argparse
+import importlib
+import json
+import multiprocessing
+import os
+import shutil
+import socket
+import sys
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+
+from config import (
+    CHUNKS_DIR,
+    DISTRIBUTED_DIR,
+    DISTRIBUTED_HEARTBEAT_SECONDS,
+    DISTRIBUTED_LEASE_TIMEOUT_SECONDS,
+    DISTRIBUTED_MAX_ATTEMPTS,
+    INPUT_VIDEO,
+    MODEL_CONFIGS,
+    OUTPUT_DIR,
+    SEGMENT_STORE_ENABLED,
+    WHISPER_MODEL,
+)
+from segment_store import STORE_FILE, SegmentStoreWriter
+from storage import commit_chunk
+from utils import print_header, print_section
+
+LEASES_DIR = DISTRIBUTED_DIR / "leases"
+RESULTS_DIR = DISTRIBUTED_DIR / "results"
+FAILED_DIR = DISTRIBUTED_DIR / "failed"
+
+
+# =============================================================================
+# CODA
+# =============================================================================
+
+def load_tasks() -> list[dict]:
+    """
+    Chunk da trascrivere (chunks_info.json di 1_chunking.py)
+
+    Raises:
+        FileNotFoundError: Se il chunking non è stato eseguito
+    """
+    info_file = CHUNKS_DIR / "chunks_info.json"
+    if not info_file.exists():
+        raise FileNotFoundError(f"{info_file} non trovato: esegui prima python 1_chunking.py")
+    return sorted(json.loads(info_file.read_text(encoding="utf-8")), key=lambda c: c["index"])
+
+
+def task_name(task: dict) -> str:
+    return Path(task["path"]).stem
+
+
+def result_path(task: dict) -> Path:
+    return RESULTS_DIR / f"{task_name(task)}.json"
+
+
+def failed_path(task: dict) -> Path:
+    return FAILED_DIR / f"{task_name(task)}.json"
+
+
+def write_result(task: dict, result: dict) -> None:
+    """Scrive il risultato in modo atomico (file temporaneo + os.replace)"""
+    _write_json(result_path(task), result)
+
+
+def _write_json(path: Path, data: dict) -> None:
+    tmp_path = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+    tmp_path.write_text(json.dumps(data, ensure_ascii=False, indent=2), encoding="utf-8")
+    os.replace(tmp_path, path)
+
+
+class Lease:
+    """
+    Lease esclusivo su un chunk, mantenuto vivo da un thread di heartbeat
+
+    Se il lease viene rubato (heartbeat troppo in ritardo) `lost` diventa True:
+    il lavoro in corso è comunque completato, il risultato è idempotente.
+    `attempt` è il numero del tentativo sul chunk (1 = prima assegnazione).
+    """
+
+    def __init__(self, task: dict, worker_id: str):
+        self.task = task
+        self.path = LEASES_DIR / f"{task_name(task)}.lease"
+        self.worker_id = worker_id
+        self.attempt = 1
+        self.lost = False
+        self._stop = threading.Event()
+        self._thread = None
+
+    def acquire(self) -> bool:
+        """
+        Prova a prendere il lease (rubandolo se scaduto)
+
+        Returns:
+            True se il lease è di questo worker
+        """
+        if self._create(1):
+            return True
+
+        try:
+            age = time.time() - self.path.stat().st_mtime
+        except FileNotFoundError:
+            return self._create(1)
+        if age < DISTRIBUTED_LEASE_TIMEOUT_SECONDS:
+            return False
+
+        # Lease scaduto: il rename è atomico, tra i worker che lo vedono scaduto uno solo ci riesce
+        stolen = self.path.with_name(f"{self.path.name}.stolen.{self.worker_id}")
+        try:
+            os.rename(self.path, stolen)
+        except FileNotFoundError:
+            return False
+
+        # Tra stat e rename un altro worker può aver già rubato e ricreato il lease:
+        # se il file spostato è vivo lo rimette al suo posto
+        mtime = stolen.stat().st_mtime
+        age = time.time() - mtime
+        if age < DISTRIBUTED_LEASE_TIMEOUT_SECONDS:
+            try:
+                os.link(stolen, self.path)
+            except FileExistsError:
+                pass
+            stolen.unlink(missing_ok=True)
+            return False
+
+        try:
+            previous = json.loads(stolen.read_text(encoding="utf-8"))
+        except json.JSONDecodeError:
+            previous = {}  # Worker morto mentre scriveva il lease
+        attempts = previous.get("attempt", 1)
+
+        if attempts >= DISTRIBUTED_MAX_ATTEMPTS:
+            FAILED_DIR.mkdir(parents=True, exist_ok=True)
+            _write_json(failed_path(self.task), {
+                "chunk": self.task["path"],
+                "attempts": attempts,
+                "last_worker": previous.get("worker"),
+                "failed_at": datetime.now().isoformat(timespec="seconds"),
+            })
+            stolen.unlink(missing_ok=True)
+            print(f"   ❌ {self.path.stem}: {attempts} tentativi falliti, spostato in {FAILED_DIR}")
+            return False
+
+        stolen.unlink(missing_ok=True)
+        reason = "lasciato dopo un errore" if mtime == 0 else f"{age:.0f}s senza heartbeat"
+        print(f"   ⏳ Lease scaduto ({reason}): {self.path.stem} riassegnato "
+              f"(tentativo {attempts + 1}/{DISTRIBUTED_MAX_ATTEMPTS})")
+        return self._create(attempts + 1)
+
+    def _create(self, attempt: int) -> bool:
+        try:
+            fd = os.open(self.path, os.O_CREAT | os.O_EXCL | os.O_WRONLY, 0o644)
+        except FileExistsError:
+            return False
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump({
+                "worker": self.worker_id,
+                "attempt": attempt,
+                "acquired_at": datetime.now().isoformat(timespec="seconds"),
+            }, f)
+        self.attempt = attempt
+
+        self._thread = threading.Thread(target=self._heartbeat, daemon=True)
+        self._thread.start()
+        return True
+
+    def owned(self) -> bool:
+        """True se il file di lease è ancora di questo worker (controllo sul file, non sull'heartbeat)"""
+        try:
+            return json.loads(self.path.read_text(encoding="utf-8"))["worker"] == self.worker_id
+        except (FileNotFoundError, json.JSONDecodeError, KeyError):
+            return False
+
+    def _heartbeat(self) -> None:
+        while not self._stop.wait(DISTRIBUTED_HEARTBEAT_SECONDS):
+            if not self.owned():
+                self.lost = True
+                return
+            try:
+                os.utime(self.path)
+            except FileNotFoundError:
+                self.lost = True
+                return
+
+    def release(self, expire: bool = False) -> None:
+        """
+        Ferma l'heartbeat e rimuove il lease (se è ancora di questo worker)
+
+        Args:
+            expire: Lascia il lease già scaduto invece di rimuoverlo: il prossimo
+                worker lo ruba subito e conta un tentativo in più
+        """
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        if self.lost or not self.owned():
+            self.lost = True
+            return
+        if expire:
+            os.utime(self.path, (0, 0))
+        else:
+            self.path.unlink(missing_ok=True)
+
+
+def queue_status(tasks: list[dict]) -> dict:
+    """Conta chunk fatti, falliti, in lavorazione (lease vivo), scaduti e in attesa"""
+    status = {"done": 0, "failed": 0, "running": 0, "expired": 0, "pending": 0}
+    now = time.time()
+    for task in tasks:
+        if result_path(task).exists():
+            status["done"] += 1
+            continue
+        if failed_path(task).exists():
+            status["failed"] += 1
+            continue
+        lease = LEASES_DIR / f"{task_name(task)}.lease"
+        try:
+            age = now - lease.stat().st_mtime
+        except FileNotFoundError:
+            status["pending"] += 1
+            continue
+        status["running" if age < DISTRIBUTED_LEASE_TIMEOUT_SECONDS else "expired"] += 1
+    return status
+
+
+# =============================================================================
+# WORKER
+# =============================================================================
+
+def run_worker(worker_id: str | None = None, model_key: str = WHISPER_MODEL) -> int:
+    """
+    Prende chunk dalla coda finché non sono tutti fatti
+
+    Il modello è caricato solo al primo chunk ottenuto. Quando nessun chunk è
+    libero ma altri sono in lavorazione, il worker attende: se un lease scade
+    il chunk viene ripreso da qui. Un errore su un chunk non ferma il worker: il
+    lease resta già scaduto e il chunk viene ritentato fino a DISTRIBUTED_MAX_ATTEMPTS.
+
+    Returns:
+        Numero di chunk trascritti da questo worker
+    """
+    transcription = importlib.import_module("3_transcription")
+
+    worker_id = worker_id or f"{socket.gethostname()}-{os.getpid()}"
+    LEASES_DIR.mkdir(parents=True, exist_ok=True)
+    RESULTS_DIR.mkdir(parents=True, exist_ok=True)
+
+    tasks = load_tasks()
+    language_map = json.loads((CHUNKS_DIR / "language_map.json").read_text(encoding="utf-8"))
+    segments_file = CHUNKS_DIR / "language_segments.json"
+    language_segments = json.loads(segments_file.read_text(encoding="utf-8")) if segments_file.exists() else {}
+    config = MODEL_CONFIGS[model_key]
+
+    model = device = None
+    done = 0
+    print(f"👷 Worker {worker_id}: {len(tasks)} chunk in coda")
+
+    while True:
+        claimed = False
+        for task in tasks:
+            if result_path(task).exists() or failed_path(task).exists():
+                continue
+            lease = Lease(task, worker_id)
+            if not lease.acquire():
+                continue
+            expire = False
+            try:
+                # Completato (o fallito) da un altro worker tra il controllo e il lease
+                if result_path(task).exists() or failed_path(task).exists():
+                    continue
+                claimed = True
+
+                # Un errore nel caricare il modello è del nodo, non del chunk: esce senza contare il tentativo
+                if model is None:
+                    model, device, _ = transcription.open_model(model_key)
+
+                attempt = f" (tentativo {lease.attempt}/{DISTRIBUTED_MAX_ATTEMPTS})" if lease.attempt > 1 else ""
+                print(f"▶️  [{worker_id}] {task_name(task)}{attempt}")
+                t0 = time.perf_counter()
+                stats = {}
+                pieces = []
+                try:
+                    for key, wav_path, lang, offset in transcription.chunk_pieces(
+                        Path(task["path"]), language_map, language_segments
+                    ):
+                        segments = transcription.transcribe_chunk_segments(model, wav_path, lang, device, config, stats)
+                        pieces.append({
+                            "key": key,
+                            "language": lang,
+                            "offset": offset,
+                            "text": transcription.segments_to_text(segments),
+                            "segments": segments,
+                        })
+                except Exception as e:
+                    print(f"   ❌ [{worker_id}] {task_name(task)}, tentativo {lease.attempt}/{DISTRIBUTED_MAX_ATTEMPTS}: {e}")
+                    expire = True
+                    continue
+
+                write_result(task, {
+                    "chunk": task["path"],
+                    "index": task["index"],
+                    "pieces": pieces,
+                    "worker": worker_id,
+                    "model": model_key,
+                    "compute_seconds": time.perf_counter() - t0,
+                    "audio_seconds": task["duration_seconds"],
+                    "stats": stats,
+                })
+                done += 1
+                # Con DELETE_COMMITTED_CHUNKS libera il chunk, ma solo se il lease è ancora
+                # di questo worker: chi l'ha rubato può star leggendo gli stessi file
+                if lease.owned():
+                    commit_chunk(Path(task["path"]), resumable=True)
+                lost = " (lease perso, risultato comunque scritto)" if lease.lost else ""
+                print(f"   ✅ [{worker_id}] {task_name(task)} in {time.perf_counter() - t0:.1f}s{lost}")
+            finally:
+                lease.release(expire)
+
+        status = queue_status(tasks)
+        if status["done"] + status["failed"] == len(tasks):
+            break
+        if not claimed:
+            # Tutto in lavorazione altrove: attende risultati o lease scaduti
+            time.sleep(DISTRIBUTED_HEARTBEAT_SECONDS)
+
+    print(f"🏁 Worker {worker_id}: {done} chunk trascritti")
+    return done
+
+
+# =============================================================================
+# COORDINATORE
+# =============================================================================
+
+def merge(wait: bool = False) -> None:
+    """
+    Unisce i risultati in ordine e scrive trascrizione_raw.txt
+
+    Args:
+        wait: Attende che tutti i chunk abbiano un risultato
+    """
+    transcription = importlib.import_module("3_transcription")
+
+    print_header("MERGE TRASCRIZIONE DISTRIBUITA")
+    tasks = load_tasks()
+
+    while True:
+        status = queue_status(tasks)
+        print(f"📊 Fatti {status['done']}/{len(tasks)} | falliti {status['failed']} | in corso {status['running']} | "
+              f"scaduti {status['expired']} | in attesa {status['pending']}")
+        if status["failed"] and status["done"] + status["failed"] == len(tasks):
+            print(f"❌ Chunk falliti dopo {DISTRIBUTED_MAX_ATTEMPTS} tentativi:")
+            for task in tasks:
+                if failed_path(task).exists():
+                    print(f"   • {task_name(task)}")
+            print("   Corretto il problema: python distributed.py retry, poi di nuovo i worker")
+            sys.exit(1)
+        if status["done"] == len(tasks):
+            break
+        if not wait:
+            print("❌ Risultati incompleti (usa --wait per attendere)")
+            sys.exit(1)
+        time.sleep(DISTRIBUTED_HEARTBEAT_SECONDS)
+
+    full_text = ""
+    prev_lang = None
+    store = SegmentStoreWriter(STORE_FILE, str(INPUT_VIDEO)) if SEGMENT_STORE_ENABLED else None
+    workers = {}
+    stats = {}
+    compute_seconds = 0.0
+    for task in tasks:
+        result = json.loads(result_path(task).read_text(encoding="utf-8"))
+        print(f"▶️  {task_name(task)} ({result['worker']})")
+        for piece in result["pieces"]:
+            full_text = transcription.append_transcript(
+                full_text, piece["text"], prev_lang, piece["language"], task["index"]
+            )
+            prev_lang = piece["language"]
+            if store is not None:
+                store.add_segments(piece["segments"], task["start_seconds"] + piece["offset"], piece["language"])
+            stats[piece["language"]] = stats.get(piece["language"], 0) + 1
+        workers[result["worker"]] = workers.get(result["worker"], 0) + 1
+        compute_seconds += result["compute_seconds"]
+
+    OUTPUT_DIR.mkdir(exist_ok=True)
+    output_raw = OUTPUT_DIR / "trascrizione_raw.txt"
+    output_raw.write_text(full_text, encoding="utf-8")
+
+    audio_seconds = sum(task["duration_seconds"] for task in tasks)
+    report_file = OUTPUT_DIR / "report_trascrizione.json"
+    report_file.write_text(json.dumps({
+        "engine": "distributed",
+        "chunks": len(tasks),
+        "languages": stats,
+        "distributed": {
+            "workers": workers,
+            "compute_seconds": compute_seconds,
+            "audio_seconds": audio_seconds,
+        },
+    }, indent=2), encoding="utf-8")
+
+    print_section("STATISTICHE")
+    print(f"👷 Worker: {len(workers)}")
+    for worker, count in sorted(workers.items()):
+        print(f"   • {worker}: {count} chunk")
+    print(f"⏱️  Calcolo totale: {compute_seconds/60:.1f} min per {audio_seconds/60:.1f} min di audio")
+    if store is not None:
+        print(f"🧩 Segmenti con timestamp: {len(store):,} → {store.close()}")
+    print(f"📝 Caratteri totali: {len(full_text):,}")
+    print(f"💾 File: {output_raw}\n")
+    print("✅ Trascrizione completata!")
+    print("➡️  Prossimo step (opzionale): python 4_correction.py")
+
+
+def _local_worker(index: int, model_key: str) -> None:
+    run_worker(f"{socket.gethostname()}-local{index}", model_key)
+
+
+def run_local(processes: int, model_key: str) -> None:
+    """Prova su un solo host: N processi worker sulla stessa coda, poi merge"""
+    print_header(f"TRASCRIZIONE DISTRIBUITA LOCALE ({processes} worker)")
+    # spawn: come workers.py, niente fork con torch inizializzato
+    context = multiprocessing.get_context("spawn")
+    workers = [context.Process(target=_local_worker, args=(i, model_key)) for i in range(processes)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    merge(wait=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Trascrizione distribuita su filesystem condiviso")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    cmd = commands.add_parser("worker", help="Prende e trascrive chunk dalla coda")
+    cmd.add_argument("--id", help="Identificativo worker (default: host-pid)")
+    cmd.add_argument("--model", default=WHISPER_MODEL, choices=list(MODEL_CONFIGS))
+
+    cmd = commands.add_parser("merge", help="Unisce i risultati in ordine")
+    cmd.add_argument("--wait", action="store_true", help="Attende che tutti i chunk siano pronti")
+
+    cmd = commands.add_parser("local", help="N worker su questo host, poi merge")
+    cmd.add_argument("--processes", type=int, default=2)
+    cmd.add_argument("--model", default=WHISPER_MODEL, choices=list(MODEL_CONFIGS))
+
+    commands.add_parser("status", help="Stato della coda")
+    commands.add_parser("retry", help="Rimette in coda i chunk falliti")
+    commands.add_parser("reset", help="Rimuove lease e risultati")
+
+    args = parser.parse_args()
+
+    try:
+        if args.command == "worker":
+            run_worker(args.id, args.model)
+        elif args.command == "merge":
+            merge(args.wait)
+        elif args.command == "local":
+            run_local(args.processes, args.model)
+        elif args.command == "status":
+            tasks = load_tasks()
+            status = queue_status(tasks)
+            print(f"📊 {DISTRIBUTED_DIR}: fatti {status['done']}/{len(tasks)} | falliti {status['failed']} | "
+                  f"in corso {status['running']} | scaduti {status['expired']} | in attesa {status['pending']}")
+        elif args.command == "retry":
+            failed = list(FAILED_DIR.glob("*.json")) if FAILED_DIR.exists() else []
+            for path in failed:
+                path.unlink()
+            print(f"🔁 Chunk rimessi in coda: {len(failed)}")
+        else:
+            shutil.rmtree(DISTRIBUTED_DIR, ignore_errors=True)
+            print(f"🗑️  Coda svuotata: {DISTRIBUTED_DIR}")
+    except FileNotFoundError as e:
+        print(f"❌ {e}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
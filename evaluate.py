@@ -0,0 +1,248 @@
+"""
+Guardrail di accuratezza: velocità vs WER/CER per ogni modalità di performance
+
+Trascrive un set di riferimento locale (EVAL_DIR: coppie audio + .txt con lo
+stesso nome, es. lezione.wav + lezione.txt) con ogni variante di EVAL_VARIANTS.
+Una variante è un insieme di override di config.py (quantizzazione, decoding
+adattivo, VAD, modello più piccolo, ...) e gira in un processo separato: config
+pulita, modello caricato da zero, RSS di picco misurata a parte. Il modello è
+sempre locale (niente model server): gli override devono valere per il modello.
+
+WER/CER sono aggregati sul set (errori totali / parole o caratteri totali).
+Rispetto a EVAL_BASELINE una variante che peggiora oltre EVAL_MAX_WER_INCREASE
+o EVAL_MAX_CER_INCREASE fa terminare il comando con codice 1 (utile in CI).
+
+Uso:
+    python evaluate.py                          # Tutte le varianti
+    python evaluate.py --variants int8 vad      # Solo alcune (più la baseline)
+    python evaluate.py --reference-dir eval_en --language en
+"""
+
+import argparse
+import importlib
+import json
+import resource
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+import config
+from config import (
+    EVAL_BASELINE,
+    EVAL_DIR,
+    EVAL_MAX_CER_INCREASE,
+    EVAL_MAX_WER_INCREASE,
+    EVAL_VARIANTS,
+    FIXED_LANGUAGE,
+    OUTPUT_DIR,
+)
+from metrics import char_errors, word_errors
+from utils import get_video_duration, print_header
+
+AUDIO_SUFFIXES = {".wav", ".flac", ".mp3", ".m4a", ".ogg", ".mp4", ".mkv", ".webm"}
+
+REPORT_FILE = OUTPUT_DIR / "report_valutazione.json"
+
+
+def reference_pairs(folder: Path) -> list[tuple[Path, Path]]:
+    """
+    Coppie (audio, trascrizione di riferimento) nella cartella
+
+    Returns:
+        Lista ordinata per nome; l'audio senza .txt corrispondente è ignorato
+    """
+    pairs = []
+    for audio in sorted(folder.iterdir()):
+        reference = audio.with_suffix(".txt")
+        if audio.suffix.lower() in AUDIO_SUFFIXES and reference.exists():
+            pairs.append((audio, reference))
+    return pairs
+
+
+def apply_overrides(overrides: dict) -> None:
+    """
+    Applica gli override della variante a config, prima di importare gli step
+
+    Raises:
+        ValueError: Se un override non corrisponde a nessuna impostazione di config.py
+    """
+    for key, value in overrides.items():
+        if not hasattr(config, key):
+            raise ValueError(f"Override sconosciuto: {key} (non esiste in config.py)")
+        setattr(config, key, value)
+
+
+def run_variant(name: str, folder: Path, language: str) -> dict:
+    """
+    Trascrive il set di riferimento con una variante (eseguito nel processo figlio)
+
+    Stesso instradamento di 3_transcription.py: sequential (con decoding
+    adattivo, VAD e loop di ripetizione), batched o cascata.
+
+    Returns:
+        Dict con tempi di caricamento, tempi e testo per file, RSS di picco
+    """
+    apply_overrides({**EVAL_VARIANTS[name], "MODEL_SERVER_ENABLED": False})
+    transcription = importlib.import_module("3_transcription")
+    from batch_engine import transcribe_batched
+
+    cascade = config.CASCADE_ENABLED and config.TRANSCRIPTION_ENGINE != "batched"
+    model_config = config.MODEL_CONFIGS[config.WHISPER_MODEL]
+
+    t0 = time.perf_counter()
+    fast_model = transcription.open_model(config.CASCADE_FAST_MODEL)[0] if cascade else None
+    model, device, _ = transcription.open_model(config.WHISPER_MODEL)
+    load_seconds = time.perf_counter() - t0
+
+    files = []
+    for audio, _ in reference_pairs(folder):
+        stats = {}
+        t0 = time.perf_counter()
+        if config.TRANSCRIPTION_ENGINE == "batched":
+            segments = transcribe_batched(model, [(audio.name, audio, language)], device, model_config,
+                                          config.BATCH_SIZE)[audio.name]
+        elif cascade:
+            segments = transcription.decode_cascade(
+                fast_model, model, str(audio), get_video_duration(audio), language, device, stats
+            )
+        else:
+            segments = transcription.transcribe_chunk_segments(model, audio, language, device, model_config, stats)
+
+        if config.LOOP_REPAIR_ENABLED and (config.TRANSCRIPTION_ENGINE == "batched" or cascade):
+            segments = transcription.repair_loops(model, str(audio), segments, language, device, model_config, stats)
+
+        files.append({
+            "name": audio.name,
+            "seconds": time.perf_counter() - t0,
+            "audio_seconds": get_video_duration(audio),
+            "text": transcription.segments_to_text(segments),
+        })
+
+    return {
+        "variant": name,
+        "model": config.WHISPER_MODEL,
+        "load_seconds": load_seconds,
+        "files": files,
+        "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,  # KB su Linux
+    }
+
+
+def score(result: dict, references: dict) -> dict:
+    """
+    WER/CER aggregati e real-time factor di una variante
+
+    Args:
+        result: Output di run_variant
+        references: {nome file audio: testo di riferimento}
+
+    Returns:
+        result con rtf, wer, cer e metriche per file
+    """
+    word_total = char_total = 0
+    word_ref = char_ref = 0
+    for file in result["files"]:
+        reference = references[file["name"]]
+        w_err, w_n = word_errors(reference, file["text"])
+        c_err, c_n = char_errors(reference, file["text"])
+        file["wer"] = w_err / w_n if w_n else 0.0
+        file["cer"] = c_err / c_n if c_n else 0.0
+        word_total, word_ref = word_total + w_err, word_ref + w_n
+        char_total, char_ref = char_total + c_err, char_ref + c_n
+
+    seconds = sum(f["seconds"] for f in result["files"])
+    audio_seconds = sum(f["audio_seconds"] for f in result["files"])
+    result["rtf"] = seconds / audio_seconds if audio_seconds else 0.0
+    result["wer"] = word_total / word_ref if word_ref else 0.0
+    result["cer"] = char_total / char_ref if char_ref else 0.0
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Velocità vs accuratezza delle modalità di performance")
+    parser.add_argument("--variants", nargs="+", choices=list(EVAL_VARIANTS), help="Default: tutte")
+    parser.add_argument("--reference-dir", type=Path, default=EVAL_DIR)
+    parser.add_argument("--language", default=FIXED_LANGUAGE)
+    parser.add_argument("--run-variant", choices=list(EVAL_VARIANTS), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    # Processo figlio: una sola variante, risultato JSON su stdout (ultima riga)
+    if args.run_variant:
+        print(json.dumps(run_variant(args.run_variant, args.reference_dir, args.language)))
+        return
+
+    if not args.reference_dir.is_dir():
+        print(f"❌ Cartella di riferimento non trovata: {args.reference_dir}")
+        print("💡 Crea coppie audio + .txt con lo stesso nome (es. lezione.wav + lezione.txt)")
+        sys.exit(1)
+
+    pairs = reference_pairs(args.reference_dir)
+    if not pairs:
+        print(f"❌ Nessuna coppia audio + .txt in {args.reference_dir}")
+        sys.exit(1)
+    references = {audio.name: text.read_text(encoding="utf-8") for audio, text in pairs}
+
+    # La baseline serve sempre come confronto
+    variants = args.variants or list(EVAL_VARIANTS)
+    variants = [EVAL_BASELINE] + [v for v in variants if v != EVAL_BASELINE]
+
+    print_header("VALUTAZIONE ACCURATEZZA")
+    audio_total = sum(get_video_duration(audio) for audio, _ in pairs)
+    print(f"📂 Riferimento: {args.reference_dir} ({len(pairs)} file, {audio_total / 60:.1f} min)")
+    print(f"🌍 Lingua: {args.language.upper()} | 📏 Soglie: WER +{EVAL_MAX_WER_INCREASE * 100:.1f} punti, "
+          f"CER +{EVAL_MAX_CER_INCREASE * 100:.1f} punti vs {EVAL_BASELINE}\n")
+
+    results = []
+    for name in variants:
+        overrides = f" {EVAL_VARIANTS[name]}" if EVAL_VARIANTS[name] else ""
+        print(f"▶️  {name}{overrides}...", flush=True)
+        proc = subprocess.run(
+            [
+                sys.executable, __file__, "--run-variant", name,
+                "--reference-dir", str(args.reference_dir), "--language", args.language,
+            ],
+            capture_output=True,
+            text=True,
+        )
+        if proc.returncode != 0:
+            print(f"   ❌ Errore:\n{proc.stderr[-2000:]}")
+            sys.exit(1)
+        results.append(score(json.loads(proc.stdout.strip().splitlines()[-1]), references))
+
+    baseline = results[0]
+    failed = []
+    print(f"\n{'Variante':<14} {'Modello':<8} {'RTF':>7} {'Speedup':>8} {'WER':>8} {'ΔWER':>8} "
+          f"{'CER':>8} {'ΔCER':>8} {'RSS':>8}")
+    print("─" * 88)
+    for r in results:
+        r["delta_wer"] = r["wer"] - baseline["wer"]
+        r["delta_cer"] = r["cer"] - baseline["cer"]
+        r["speedup"] = baseline["rtf"] / r["rtf"] if r["rtf"] else 0.0
+        r["passed"] = r["delta_wer"] <= EVAL_MAX_WER_INCREASE and r["delta_cer"] <= EVAL_MAX_CER_INCREASE
+        if not r["passed"]:
+            failed.append(r["variant"])
+        print(
+            f"{r['variant']:<14} {r['model']:<8} {r['rtf']:>7.3f} {r['speedup']:>7.2f}x "
+            f"{r['wer'] * 100:>7.2f}% {r['delta_wer'] * 100:>+7.2f} {r['cer'] * 100:>7.2f}% "
+            f"{r['delta_cer'] * 100:>+7.2f} {r['peak_rss_mb']:>5.0f} MB {'✅' if r['passed'] else '❌'}"
+        )
+
+    OUTPUT_DIR.mkdir(exist_ok=True)
+    REPORT_FILE.write_text(json.dumps({
+        "reference_dir": str(args.reference_dir),
+        "language": args.language,
+        "baseline": EVAL_BASELINE,
+        "max_wer_increase": EVAL_MAX_WER_INCREASE,
+        "max_cer_increase": EVAL_MAX_CER_INCREASE,
+        "results": results,
+    }, indent=2), encoding="utf-8")
+    print(f"\n💾 Report: {REPORT_FILE}")
+
+    if failed:
+        print(f"❌ Accuratezza oltre soglia: {', '.join(failed)}")
+        sys.exit(1)
+    print("✅ Tutte le varianti entro le soglie")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,135 @@
+"""
+Feature store log-mel
+
+Calcola lo spettrogramma log-mel di ogni audio UNA volta (STFT vettoriale con torch
+sull'intero file, stessa normalizzazione di model.transcribe) e lo salva come .npy
+in FEATURES_DIR. La chiave è hash del contenuto audio + configurazione mel, quindi
+lo stesso file è riusato da modelli diversi con le stesse bande (80 per tutti,
+128 per large-v3), da beam diversi e dopo un crash.
+
+Le feature sono rilette in memory-map copy-on-write: nessuna copia in RAM
+finché non si scrive (e nessuno scrive).
+
+Uso (precalcolo per tutti i chunk):
+    python features.py                # bande per WHISPER_MODEL
+    python features.py small large    # bande per più modelli
+"""
+
+import hashlib
+import importlib
+import os
+import sys
+from pathlib import Path
+
+from config import CHUNKS_DIR, FEATURES_DIR, MODEL_CONFIGS, WHISPER_MODEL
+from utils import print_header
+
+# Parametri STFT di Whisper (whisper.audio): inclusi nella chiave di cache
+N_FFT = 400
+HOP_LENGTH = 160
+
+# Bande mel per modello: large-v3 ne usa 128, gli altri 80
+MEL_BINS = {"large-v3": 128}
+
+
+def n_mels_for(model_key: str) -> int:
+    """Numero di bande mel richieste dal modello (chiave MODEL_CONFIGS)"""
+    return MEL_BINS.get(MODEL_CONFIGS[model_key]["name"], 80)
+
+
+def audio_hash(audio_path: Path) -> str:
+    """
+    Hash SHA-256 del contenuto del file audio (letto a blocchi)
+
+    Returns:
+        Prime 24 cifre esadecimali
+    """
+    digest = hashlib.sha256()
+    with open(audio_path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()[:24]
+
+
+def feature_path(audio_path: Path, n_mels: int) -> Path:
+    """Percorso .npy delle feature (hash audio + configurazione mel)"""
+    return FEATURES_DIR / f"{audio_hash(audio_path)}_mel{n_mels}_fft{N_FFT}_hop{HOP_LENGTH}.npy"
+
+
+def compute_log_mel(audio_path: Path, n_mels: int):
+    """
+    Calcola il log-mel dell'intero file come fa model.transcribe
+
+    Include i 30s di padding finale: le finestre si ritagliano con uno slice
+    senza ricalcolare nulla.
+
+    Returns:
+        Array float32 (n_mels, frame_contenuto + 3000)
+    """
+    import whisper
+    from whisper.audio import N_SAMPLES
+
+    audio = whisper.load_audio(str(audio_path))
+    mel = whisper.log_mel_spectrogram(audio, n_mels, padding=N_SAMPLES)
+    return mel.cpu().numpy()
+
+
+def load_log_mel(audio_path: Path, n_mels: int):
+    """
+    Log-mel dell'audio dal feature store (calcolato e salvato al primo accesso)
+
+    Args:
+        audio_path: File audio
+        n_mels: Bande mel (model.dims.n_mels)
+
+    Returns:
+        Tensor torch (n_mels, frame) che condivide la memoria del file mappato
+    """
+    import numpy as np
+    import torch
+
+    path = feature_path(Path(audio_path), n_mels)
+
+    if not path.exists():
+        FEATURES_DIR.mkdir(parents=True, exist_ok=True)
+        mel = compute_log_mel(audio_path, n_mels)
+        # Scrittura atomica: un crash a metà non lascia feature corrotte.
+        # Nome temporaneo per processo: worker diversi possono calcolare la stessa feature
+        tmp_path = path.with_name(f".{path.stem}.{os.getpid()}.tmp.npy")
+        np.save(tmp_path, mel)
+        os.replace(tmp_path, path)
+
+    # mmap "c" (copy-on-write): array scrivibile per torch, pagine condivise col file
+    return torch.from_numpy(np.load(path, mmap_mode="c"))
+
+
+def main():
+    """Precalcola le feature di tutti i chunk"""
+    model_keys = sys.argv[1:] or [WHISPER_MODEL]
+    unknown = [key for key in model_keys if key not in MODEL_CONFIGS]
+    if unknown:
+        print(f"❌ Modelli sconosciuti: {', '.join(unknown)}")
+        sys.exit(1)
+
+    print_header("FEATURE STORE LOG-MEL")
+
+    chunks = sorted(CHUNKS_DIR.glob("chunk_*.mp4"))
+    if not chunks:
+        print("❌ Nessun chunk trovato! Esegui prima: python 1_chunking.py")
+        sys.exit(1)
+
+    extract_audio = importlib.import_module("3_transcription").extract_audio
+    mel_configs = sorted({n_mels_for(key) for key in model_keys})
+
+    for idx, chunk in enumerate(chunks, 1):
+        wav_path = extract_audio(chunk)
+        for n_mels in mel_configs:
+            cached = feature_path(wav_path, n_mels).exists()
+            load_log_mel(wav_path, n_mels)
+            print(f"   [{idx}/{len(chunks)}] {chunk.name} mel{n_mels}: {'in cache' if cached else 'calcolato'}")
+
+    print(f"\n✅ Feature salvate in {FEATURES_DIR}/")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,463 @@
+"""
+Deduplicazione audio: fingerprint spettrale e riuso delle trascrizioni
+
+Molto audio in ingresso è ripetuto: ri-caricamenti della stessa registrazione,
+sigle di apertura/chiusura, video ri-tagliati da un master più lungo.
+
+Fingerprint (solo numpy, come Shazam):
+1. Spettrogramma (FFT 1024, hop 32ms) fino a 4kHz, in dB
+2. Picchi: massimi locali in un intorno tempo/frequenza, i più forti per secondo
+3. Hash: coppie di picchi vicini (frequenza ancora, frequenza bersaglio, distanza
+   in frame) → robusti a ricodifica, volume e rumore leggero
+
+L'indice (FINGERPRINT_DB, SQLite) contiene gli hash di ogni audio trascritto con
+i suoi segmenti Whisper. Per un audio nuovo gli hash coincidenti votano per uno
+scostamento di tempo: un tratto di almeno FINGERPRINT_MIN_SPAN_SECONDS con
+abbastanza voti allo stesso scostamento è lo stesso audio. I segmenti interni al
+tratto sono riusati (tempi traslati), Whisper gira solo sul resto.
+
+Si riusano solo trascrizioni con la stessa lingua, lo stesso modello (in cascata
+la coppia di modelli) e le stesse impostazioni di decoding: prompt, beam, modalità,
+precisione, VAD, riparazione dei loop (firma di decoding_signature in
+3_transcription.py, colonna options).
+
+Uso:
+    python fingerprint.py                        # Contenuto dell'indice
+    python fingerprint.py match audio.wav        # Tratti già trascritti in un file
+    python fingerprint.py clear                  # Svuota l'indice
+"""
+
+import argparse
+import importlib
+import json
+import sqlite3
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+
+from config import (
+    FINGERPRINT_DB,
+    FINGERPRINT_MIN_MATCH_RATE,
+    FINGERPRINT_MIN_SPAN_SECONDS,
+)
+from features import audio_hash
+from segments import merge_ranges
+from utils import print_header, print_section
+from vad import SAMPLE_RATE, load_audio
+
+N_FFT = 1024
+HOP = 512
+FRAME_SECONDS = HOP / SAMPLE_RATE
+MAX_BIN = 256            # Bin di frequenza usati (256 × 15.6Hz = 4kHz: voce, robusto ai codec)
+PEAK_TIME = 15           # Intorno del massimo locale: ±15 frame (~0.5s)
+PEAK_FREQ = 10           # ... e ±10 bin (~160Hz)
+PEAKS_PER_SECOND = 30    # Picchi più forti tenuti per secondo
+FAN_OUT = 5              # Coppie per picco ancora
+MAX_DT = 63              # Distanza massima ancora-bersaglio (frame, ~2s)
+MAX_GAP_SECONDS = 10.0   # Pausa massima tra voti consecutivi dello stesso tratto (silenzi senza picchi)
+SEGMENT_TOLERANCE = 1.0  # Un segmento può sbordare dal tratto di tanto (secondi)
+MIN_UNCOVERED = 0.5      # Scoperture più brevi sono ignorate (secondi)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS recordings (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL,
+    audio_hash TEXT NOT NULL,
+    language TEXT NOT NULL,
+    model TEXT NOT NULL,
+    options TEXT NOT NULL DEFAULT '',
+    duration REAL NOT NULL,
+    segments TEXT NOT NULL,
+    created_at TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS hashes (
+    hash INTEGER NOT NULL,
+    recording_id INTEGER NOT NULL,
+    frame INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS hashes_hash ON hashes (hash);
+CREATE INDEX IF NOT EXISTS recordings_audio_hash ON recordings (audio_hash);
+"""
+
+# Campi dei segmenti salvati nell'indice (quelli usati da segment_store e dalle soglie)
+SEGMENT_FIELDS = ("start", "end", "text", "avg_logprob", "compression_ratio", "no_speech_prob", "words")
+
+
+def spectral_peaks(audio):
+    """
+    Picchi dello spettrogramma
+
+    Args:
+        audio: Array float32 mono 16kHz
+
+    Returns:
+        (frame, bin) dei picchi, ordinati per frame
+    """
+    import numpy as np
+    from numpy.lib.stride_tricks import sliding_window_view
+
+    if len(audio) < N_FFT:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+
+    frames = sliding_window_view(audio, N_FFT)[::HOP]
+    window = np.hanning(N_FFT).astype(np.float32)
+    spec = np.empty((len(frames), MAX_BIN), dtype=np.float32)
+    for i in range(0, len(frames), 4096):  # A blocchi: niente copia intera dei frame
+        spec[i:i + 4096] = np.abs(np.fft.rfft(frames[i:i + 4096] * window, axis=1))[:, :MAX_BIN]
+    spec = 20 * np.log10(spec + 1e-6)
+
+    # Massimo locale separabile: prima lungo la frequenza, poi lungo il tempo
+    padded = np.pad(spec, ((PEAK_TIME, PEAK_TIME), (PEAK_FREQ, PEAK_FREQ)), constant_values=-np.inf)
+    local = sliding_window_view(padded, 2 * PEAK_FREQ + 1, axis=1).max(axis=-1)
+    local = sliding_window_view(local, 2 * PEAK_TIME + 1, axis=0).max(axis=-1)
+    peak_frames, peak_bins = np.nonzero((spec == local) & (spec > np.median(spec) + 10.0))
+
+    # Densità limitata: i PEAKS_PER_SECOND più forti per secondo
+    second = (peak_frames * FRAME_SECONDS).astype(np.int64)
+    order = np.lexsort((-spec[peak_frames, peak_bins], second))
+    second = second[order]
+    first = np.searchsorted(second, second)
+    keep = np.sort(order[np.arange(len(order)) - first < PEAKS_PER_SECOND])
+    return peak_frames[keep], peak_bins[keep]
+
+
+def fingerprint(audio):
+    """
+    Hash delle coppie di picchi
+
+    Args:
+        audio: Array float32 mono 16kHz
+
+    Returns:
+        (hash, frame dell'ancora): hash a 24 bit = bin ancora, bin bersaglio, distanza in frame
+    """
+    import numpy as np
+
+    frames, bins = spectral_peaks(audio)
+    hashes, anchors = [], []
+    for k in range(1, FAN_OUT + 1):
+        dt = frames[k:] - frames[:-k]
+        valid = (dt > 0) & (dt <= MAX_DT)
+        hashes.append((bins[:-k][valid] << 16) | (bins[k:][valid] << 8) | dt[valid])
+        anchors.append(frames[:-k][valid])
+    if not hashes:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+    return np.concatenate(hashes), np.concatenate(anchors)
+
+
+def find_spans(votes) -> list[dict]:
+    """
+    Tratti di audio in comune dai voti degli hash coincidenti
+
+    Args:
+        votes: Array (N, 3) di (recording_id, scostamento in frame, frame della query)
+
+    Returns:
+        Tratti disgiunti nel tempo della query, dal più votato:
+        {recording_id, offset (secondi da sommare al tempo query), start, end, matches}
+    """
+    import numpy as np
+
+    if len(votes) == 0:
+        return []
+
+    keys, counts = np.unique(votes[:, :2], axis=0, return_counts=True)
+    count_of = {(int(r), int(o)): int(c) for (r, o), c in zip(keys, counts)}
+    min_votes = FINGERPRINT_MIN_MATCH_RATE * FINGERPRINT_MIN_SPAN_SECONDS
+    max_gap = MAX_GAP_SECONDS / FRAME_SECONDS
+
+    # Scostamenti candidati: voti anche a ±1 frame (jitter dei picchi tra due codifiche)
+    candidates = []
+    for (recording, offset), count in count_of.items():
+        total = count + count_of.get((recording, offset - 1), 0) + count_of.get((recording, offset + 1), 0)
+        if total >= min_votes:
+            candidates.append((total, recording, offset))
+    candidates.sort(reverse=True)
+
+    spans = []
+    seen = set()
+    for _, recording, offset in candidates:
+        if any((recording, offset + d) in seen for d in (-1, 0, 1)):
+            continue
+        seen.add((recording, offset))
+        mask = (votes[:, 0] == recording) & (np.abs(votes[:, 1] - offset) <= 1)
+        frames = np.unique(votes[mask, 2])
+
+        # Voti consecutivi vicini = un tratto; pause lunghe spezzano (es. sigla + contenuto diverso)
+        breaks = np.nonzero(np.diff(frames) > max_gap)[0]
+        for run in np.split(frames, breaks + 1):
+            start, end = float(run[0] * FRAME_SECONDS), float(run[-1] * FRAME_SECONDS)
+            duration = end - start
+            if duration >= FINGERPRINT_MIN_SPAN_SECONDS and len(run) >= FINGERPRINT_MIN_MATCH_RATE * duration:
+                spans.append({
+                    "recording_id": recording,
+                    "offset": offset * FRAME_SECONDS,
+                    "start": start,
+                    "end": end,
+                    "matches": int(len(run)),
+                })
+
+    # Tratti sovrapposti nella query: vince il più votato
+    spans.sort(key=lambda s: -s["matches"])
+    accepted = []
+    for span in spans:
+        if all(span["end"] <= a["start"] or span["start"] >= a["end"] for a in accepted):
+            accepted.append(span)
+    return sorted(accepted, key=lambda s: s["start"])
+
+
+def reuse_segments(spans: list[dict], sources: dict, duration: float) -> tuple[list[dict], list[tuple[float, float]]]:
+    """
+    Segmenti riusabili e intervalli ancora da trascrivere
+
+    Un segmento della sorgente è riusato se cade dentro il tratto (con
+    SEGMENT_TOLERANCE); quelli a cavallo del bordo sono scartati e il loro tempo
+    resta da trascrivere.
+
+    Args:
+        spans: Tratti di find_spans
+        sources: {recording_id: segmenti della sorgente}
+        duration: Durata dell'audio nuovo (secondi)
+
+    Returns:
+        (segmenti riusati con tempi dell'audio nuovo, intervalli scoperti)
+    """
+    reused, covered = [], []
+    for span in spans:
+        shift = span["offset"]
+        a, b = span["start"] + shift, span["end"] + shift
+        for segment in sources[span["recording_id"]]:
+            if segment["end"] <= a or segment["start"] >= b:
+                continue
+            if segment["start"] >= a - SEGMENT_TOLERANCE and segment["end"] <= b + SEGMENT_TOLERANCE:
+                reused.append(shifted(segment, -shift))
+            elif segment["start"] < a:
+                a = max(a, segment["end"])
+            else:
+                b = min(b, segment["start"])
+        if b > a:
+            covered.append((a - shift, b - shift))
+    covered.extend((s["start"], s["end"]) for s in reused)
+
+    uncovered, cursor = [], 0.0
+    for start, end in merge_ranges(covered):
+        if start - cursor >= MIN_UNCOVERED:
+            uncovered.append((cursor, start))
+        cursor = max(cursor, end)
+    if duration - cursor >= MIN_UNCOVERED:
+        uncovered.append((cursor, duration))
+
+    reused.sort(key=lambda s: s["start"])
+    return reused, uncovered
+
+
+def shifted(segment: dict, delta: float) -> dict:
+    """Copia del segmento con tempi (anche delle parole) traslati di delta secondi"""
+    copy = {**segment, "start": segment["start"] + delta, "end": segment["end"] + delta}
+    if "words" in segment:
+        copy["words"] = [{**w, "start": w["start"] + delta, "end": w["end"] + delta} for w in segment["words"]]
+    return copy
+
+
+class FingerprintIndex:
+    """
+    Indice SQLite dei fingerprint con le trascrizioni associate
+
+    Uso: lookup() prima di trascrivere (segmenti riusabili + intervalli scoperti),
+    add() dopo con i segmenti completi.
+    """
+
+    def __init__(self, path: Path = FINGERPRINT_DB):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self.conn = sqlite3.connect(path)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.executescript(SCHEMA)
+        # Indice creato prima della colonna options: le vecchie righe non combaciano con nessuna firma
+        columns = {row[1] for row in self.conn.execute("PRAGMA table_info(recordings)")}
+        if "options" not in columns:
+            with self.conn:
+                self.conn.execute("ALTER TABLE recordings ADD COLUMN options TEXT NOT NULL DEFAULT ''")
+        self.conn.execute("CREATE TEMP TABLE IF NOT EXISTS query (hash INTEGER, frame INTEGER)")
+
+    def lookup(self, wav_path: Path, language: str, model: str, options: str) -> dict:
+        """
+        Cerca nell'indice l'audio di un chunk
+
+        Un file identico (stesso hash del contenuto) è riusato per intero senza
+        calcolare il fingerprint.
+
+        Args:
+            wav_path: Audio del chunk
+            language: Lingua del chunk
+            model: Modello che trascriverebbe il chunk (chiave MODEL_CONFIGS)
+            options: Firma delle impostazioni di decoding (decoding_signature)
+
+        Returns:
+            Dict con segments (riusati), uncovered (intervalli da trascrivere),
+            duration, reused_seconds, fingerprint_seconds e i dati per add()
+        """
+        import numpy as np
+
+        t0 = time.perf_counter()
+        content_hash = audio_hash(wav_path)
+        row = self.conn.execute(
+            "SELECT duration, segments FROM recordings "
+            "WHERE audio_hash = ? AND language = ? AND model = ? AND options = ?",
+            (content_hash, language, model, options),
+        ).fetchone()
+        if row is not None:
+            return {
+                "audio_hash": content_hash,
+                "duration": row[0],
+                "segments": json.loads(row[1]),
+                "uncovered": [],
+                "reused_seconds": row[0],
+                "fingerprint_seconds": time.perf_counter() - t0,
+            }
+
+        audio = load_audio(str(wav_path))
+        duration = len(audio) / SAMPLE_RATE
+        hashes, frames = fingerprint(audio)
+
+        self.conn.execute("DELETE FROM query")
+        self.conn.executemany("INSERT INTO query VALUES (?, ?)", zip(hashes.tolist(), frames.tolist()))
+        votes = np.array(self.conn.execute(
+            """
+            SELECT h.recording_id, h.frame - q.frame, q.frame
+            FROM query q
+            JOIN hashes h ON h.hash = q.hash
+            JOIN recordings r ON r.id = h.recording_id
+            WHERE r.language = ? AND r.model = ? AND r.options = ?
+            """,
+            (language, model, options),
+        ).fetchall(), dtype=np.int64).reshape(-1, 3)
+
+        spans = find_spans(votes)
+        sources = {
+            recording: json.loads(self.conn.execute(
+                "SELECT segments FROM recordings WHERE id = ?", (recording,)
+            ).fetchone()[0])
+            for recording in {s["recording_id"] for s in spans}
+        }
+        segments, uncovered = reuse_segments(spans, sources, duration)
+
+        return {
+            "audio_hash": content_hash,
+            "duration": duration,
+            "segments": segments,
+            "uncovered": uncovered,
+            "reused_seconds": duration - sum(end - start for start, end in uncovered),
+            "fingerprint_seconds": time.perf_counter() - t0,
+            "spans": spans,
+            "hashes": hashes,
+            "frames": frames,
+        }
+
+    def add(self, match: dict, segments: list[dict], name: str, language: str, model: str, options: str) -> None:
+        """
+        Registra un audio trascritto (risultato di lookup + segmenti finali)
+
+        Un audio riusato per intero non è registrato di nuovo: è già nell'indice.
+        """
+        if not match["uncovered"]:
+            return
+        kept = [{k: s[k] for k in SEGMENT_FIELDS if k in s} for s in segments]
+        with self.conn:
+            recording = self.conn.execute(
+                "INSERT INTO recordings (name, audio_hash, language, model, options, duration, segments, created_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    name,
+                    match["audio_hash"],
+                    language,
+                    model,
+                    options,
+                    match["duration"],
+                    json.dumps(kept, ensure_ascii=False),
+                    datetime.now().isoformat(timespec="seconds"),
+                ),
+            ).lastrowid
+            self.conn.executemany(
+                "INSERT INTO hashes (hash, recording_id, frame) VALUES (?, ?, ?)",
+                ((h, recording, f) for h, f in zip(match["hashes"].tolist(), match["frames"].tolist())),
+            )
+
+    def close(self) -> None:
+        self.conn.close()
+
+
+def format_seconds(seconds: float) -> str:
+    """Secondi → M:SS.s"""
+    return f"{int(seconds // 60)}:{seconds % 60:04.1f}"
+
+
+def main():
+    """Entry point"""
+    from config import FIXED_LANGUAGE, MODEL_CONFIGS, WHISPER_MODEL
+
+    parser = argparse.ArgumentParser(description="Indice dei fingerprint audio (deduplicazione)")
+    commands = parser.add_subparsers(dest="command")
+    cmd = commands.add_parser("match", help="Tratti di un file audio già trascritti")
+    cmd.add_argument("audio", type=Path)
+    cmd.add_argument("--language", default=FIXED_LANGUAGE)
+    cmd.add_argument("--model", default=WHISPER_MODEL)
+    commands.add_parser("clear", help="Svuota l'indice")
+    args = parser.parse_args()
+
+    if args.command == "clear":
+        for suffix in ("", "-wal", "-shm"):
+            Path(f"{FINGERPRINT_DB}{suffix}").unlink(missing_ok=True)
+        print(f"🧹 Indice eliminato: {FINGERPRINT_DB}")
+        return
+
+    if not FINGERPRINT_DB.exists():
+        print(f"❌ Indice vuoto: {FINGERPRINT_DB} (si popola con python 3_transcription.py)")
+        sys.exit(1)
+
+    index = FingerprintIndex()
+
+    if args.command == "match":
+        if not args.audio.exists():
+            print(f"❌ File non trovato: {args.audio}")
+            sys.exit(1)
+        # Stessa chiave di 3_transcription.py con le impostazioni correnti di config.py
+        transcription = importlib.import_module("3_transcription")
+        options = transcription.decoding_signature(args.language, MODEL_CONFIGS[args.model])
+        match = index.lookup(args.audio, args.language, args.model, options)
+        print_header("DEDUPLICAZIONE AUDIO")
+        print(f"🎧 {args.audio.name}: {format_seconds(match['duration'])} | "
+              f"⏱️  fingerprint in {match['fingerprint_seconds']:.2f}s")
+        if "spans" not in match:
+            print("♻️  File identico già trascritto: riuso completo")
+        for span in match.get("spans", []):
+            name = index.conn.execute(
+                "SELECT name FROM recordings WHERE id = ?", (span["recording_id"],)
+            ).fetchone()[0]
+            print(f"   🔗 {format_seconds(span['start'])}–{format_seconds(span['end'])} ↔ {name} "
+                  f"(+{span['offset']:.1f}s, {span['matches']} hash)")
+        print(f"♻️  Riusabile: {match['reused_seconds']:.0f}s di {match['duration']:.0f}s "
+              f"({len(match['segments'])} segmenti)")
+        index.close()
+        return
+
+    print_header("INDICE FINGERPRINT")
+    recordings, seconds = index.conn.execute(
+        "SELECT COUNT(*), COALESCE(SUM(duration), 0) FROM recordings"
+    ).fetchone()
+    hashes = index.conn.execute("SELECT COUNT(*) FROM hashes").fetchone()[0]
+    print(f"🗂️  {FINGERPRINT_DB}: {FINGERPRINT_DB.stat().st_size / 1024 ** 2:.1f} MB")
+    print(f"🎧 Audio: {recordings} file, {seconds / 3600:.1f} ore | #️⃣  Hash: {hashes:,}")
+
+    print_section("PER LINGUA E MODELLO")
+    for language, model, count, total, signatures in index.conn.execute(
+        "SELECT language, model, COUNT(*), SUM(duration), COUNT(DISTINCT options) "
+        "FROM recordings GROUP BY language, model"
+    ):
+        print(f"   • {language.upper()} / {model}: {count} file, {total / 60:.0f} min, "
+              f"{signatures} impostazioni di decoding")
+    index.close()
+
+
+if __name__ == "__main__":
+    main()
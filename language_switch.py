@@ -0,0 +1,164 @@
+"""
+Rilevamento dei cambi lingua all'interno dei chunk
+
+language_map.json assegna UNA lingua a ogni chunk da 8 minuti: se l'oratore passa
+dall'italiano allo spagnolo a metà chunk, metà audio viene trascritta con la lingua
+sbagliata. Qui la lingua è stimata su finestre scorrevoli dentro il chunk con un
+modello piccolo (model.detect_language su batch di finestre log-mel dal feature
+store), poi le etichette sono lisciate e trasformate in intervalli.
+
+Il chunk non viene tagliato su disco: 2_language_detection.py salva gli intervalli
+in language_segments.json e 3_transcription.py trascrive ogni intervallo con la
+sua lingua, mettendo i separatori CAMBIO LINGUA nei punti di cambio reali.
+"""
+
+from config import (
+    BATCH_SIZE,
+    LANGUAGE_SWITCH_CANDIDATES,
+    LANGUAGE_SWITCH_HOP_SECONDS,
+    LANGUAGE_SWITCH_MIN_PROB,
+    LANGUAGE_SWITCH_MIN_SECONDS,
+    LANGUAGE_SWITCH_WINDOW_SECONDS,
+)
+from features import load_log_mel
+
+
+def window_languages(model, wav_path) -> tuple[list[str | None], float]:
+    """
+    Lingua più probabile per ogni finestra scorrevole del chunk
+
+    Ogni finestra (LANGUAGE_SWITCH_WINDOW_SECONDS, passo LANGUAGE_SWITCH_HOP_SECONDS)
+    è completata a 30s con il log-mel del silenzio, come fa Whisper con l'ultimo pezzo.
+
+    Args:
+        model: Modello Whisper locale (piccolo: basta per la lingua)
+        wav_path: Audio WAV del chunk
+
+    Returns:
+        Tupla (etichette per finestra, None se incerta; durata chunk in secondi)
+    """
+    import torch
+    from whisper.audio import HOP_LENGTH, N_FRAMES, SAMPLE_RATE
+
+    mel = load_log_mel(wav_path, model.dims.n_mels)
+    content_frames = mel.shape[-1] - N_FRAMES
+    duration = content_frames * HOP_LENGTH / SAMPLE_RATE
+
+    window = int(LANGUAGE_SWITCH_WINDOW_SECONDS * SAMPLE_RATE / HOP_LENGTH)
+    hop = int(LANGUAGE_SWITCH_HOP_SECONDS * SAMPLE_RATE / HOP_LENGTH)
+    # Ultima colonna = padding finale: log-mel del silenzio
+    silence = mel[:, -1:].expand(-1, N_FRAMES - window)
+
+    starts = list(range(0, max(content_frames - window, 0) + 1, hop))
+    labels = []
+    for i in range(0, len(starts), BATCH_SIZE):
+        batch = torch.stack([
+            torch.cat([mel[:, s:s + window], silence], dim=1) for s in starts[i:i + BATCH_SIZE]
+        ]).to(model.device)
+        with torch.no_grad():
+            _, probs = model.detect_language(batch)
+
+        for window_probs in probs:
+            # Solo le lingue gestite dalla pipeline, rinormalizzate
+            scores = {lang: window_probs.get(lang, 0.0) for lang in LANGUAGE_SWITCH_CANDIDATES}
+            total = sum(scores.values()) or 1.0
+            lang = max(scores, key=scores.get)
+            labels.append(lang if scores[lang] / total >= LANGUAGE_SWITCH_MIN_PROB else None)
+
+    return labels, duration
+
+
+def smooth_labels(labels: list[str | None], min_windows: int) -> list[str | None]:
+    """
+    Elimina i cambi troppo brevi per essere reali
+
+    Le finestre incerte prendono la lingua precedente (o la successiva a inizio
+    chunk); poi i run più corti di min_windows sono assorbiti dal vicino più lungo,
+    partendo dal più corto.
+
+    Returns:
+        Etichette lisciate (tutte None se nessuna finestra è affidabile)
+    """
+    known = [label for label in labels if label is not None]
+    if not known:
+        return labels
+
+    filled = []
+    current = known[0]
+    for label in labels:
+        current = label or current
+        filled.append(current)
+
+    # Run come [lingua, lunghezza]
+    runs = []
+    for label in filled:
+        if runs and runs[-1][0] == label:
+            runs[-1][1] += 1
+        else:
+            runs.append([label, 1])
+
+    while len(runs) > 1:
+        i = min(range(len(runs)), key=lambda j: runs[j][1])
+        if runs[i][1] >= min_windows:
+            break
+        neighbours = [j for j in (i - 1, i + 1) if 0 <= j < len(runs)]
+        target = max(neighbours, key=lambda j: runs[j][1])
+        runs[target][1] += runs[i][1]
+        del runs[i]
+        # Due run vicini con la stessa lingua diventano uno
+        merged = []
+        for run in runs:
+            if merged and merged[-1][0] == run[0]:
+                merged[-1][1] += run[1]
+            else:
+                merged.append(run)
+        runs = merged
+
+    return [lang for lang, length in runs for _ in range(length)]
+
+
+def labels_to_segments(labels: list[str], duration: float) -> list[dict]:
+    """
+    Converte le etichette per finestra in intervalli {start, end, language}
+
+    Il confine tra due lingue è a metà tra i centri delle due finestre adiacenti.
+    """
+    if not labels:
+        return []
+
+    half = LANGUAGE_SWITCH_WINDOW_SECONDS / 2
+    segments = [{"start": 0.0, "end": duration, "language": labels[0]}]
+    for i in range(1, len(labels)):
+        if labels[i] != labels[i - 1]:
+            boundary = round((i - 0.5) * LANGUAGE_SWITCH_HOP_SECONDS + half, 2)
+            segments[-1]["end"] = boundary
+            segments.append({"start": boundary, "end": duration, "language": labels[i]})
+    return segments
+
+
+def detect_switches(model, wav_path) -> list[dict]:
+    """
+    Intervalli di lingua di un chunk
+
+    Args:
+        model: Modello Whisper locale
+        wav_path: Audio WAV del chunk
+
+    Returns:
+        Lista di {start, end, language} (un solo elemento se nessun cambio,
+        lista vuota se nessuna finestra ha una lingua affidabile)
+    """
+    labels, duration = window_languages(model, wav_path)
+    min_windows = max(1, round(LANGUAGE_SWITCH_MIN_SECONDS / LANGUAGE_SWITCH_HOP_SECONDS))
+    labels = smooth_labels(labels, min_windows)
+    if not labels or labels[0] is None:
+        return []
+    return labels_to_segments(labels, duration)
+
+
+def dominant_language(segments: list[dict], default: str = "it") -> str:
+    """Lingua con più secondi di audio (per language_map.json)"""
+    totals = {}
+    for segment in segments:
+        totals[segment["language"]] = totals.get(segment["language"], 0.0) + segment["end"] - segment["start"]
+    return max(totals, key=totals.get) if totals else default
@@ -0,0 +1,292 @@
+"""
+Watchdog di memoria per la trascrizione
+
+Un thread campiona ogni WATCHDOG_INTERVAL_SECONDS la memoria disponibile
+(/proc/meminfo, limitata dal cgroup se il job gira in un container) e la RSS
+del processo con tutti i suoi figli (worker). 3_transcription.py chiede il
+livello prima di ogni chunk e, sotto pressione, degrada invece di farsi
+uccidere dall'OOM killer:
+
+- "pressure": rallenta l'invio di nuovi chunk (finestra dei worker, batch più
+  piccoli); pressione che dura WATCHDOG_SUSTAINED_CHUNKS chunk → modello più piccolo
+- "critical": meno worker, oppure un modello più piccolo di MODEL_CONFIGS per
+  i chunk restanti
+
+Si attende che la memoria si liberi solo se è occupata soprattutto da altri
+processi del nodo (la RSS del job è meno della metà della memoria in uso):
+se il consumo è del job stesso aspettare non libera nulla. Le attese di tutta
+l'esecuzione sommano al più WATCHDOG_MAX_TOTAL_WAIT_SECONDS.
+
+Il livello usa il caso peggiore tra i campioni dall'ultima richiesta: un picco
+durante la decodifica di un chunk non sfugge. Ogni decisione finisce nel
+report di esecuzione.
+"""
+
+import os
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+
+from config import (
+    MODEL_CONFIGS,
+    WATCHDOG_CRITICAL_MB,
+    WATCHDOG_INTERVAL_SECONDS,
+    WATCHDOG_MAX_TOTAL_WAIT_SECONDS,
+    WATCHDOG_PRESSURE_MB,
+    WATCHDOG_RSS_LIMIT_MB,
+)
+
+LEVELS = ("ok", "pressure", "critical")
+
+
+def meminfo_mb() -> dict:
+    """Campi di /proc/meminfo in MB (MemTotal, MemAvailable, ...)"""
+    fields = {}
+    with open("/proc/meminfo", encoding="utf-8") as f:
+        for line in f:
+            key, _, value = line.partition(":")
+            parts = value.split()
+            if parts:
+                fields[key] = int(parts[0]) / 1024
+    return fields
+
+
+def cgroup_memory_mb() -> tuple[float, float] | None:
+    """
+    Limite e memoria in uso del cgroup v2 del processo (container, job scheduler)
+
+    La memoria in uso esclude la page cache inattiva (recuperabile), come
+    MemAvailable per il sistema.
+
+    Returns:
+        (memory.max, in uso) in MB, None se il cgroup non ha limite
+    """
+    root = Path("/sys/fs/cgroup")
+    try:
+        limit = (root / "memory.max").read_text().strip()
+        if limit == "max":
+            return None
+        current = int((root / "memory.current").read_text())
+    except (OSError, ValueError):
+        return None
+    try:
+        for line in (root / "memory.stat").read_text().splitlines():
+            key, _, value = line.partition(" ")
+            if key == "inactive_file":
+                current -= int(value)
+                break
+    except (OSError, ValueError):
+        pass
+    return int(limit) / (1024 * 1024), max(current, 0) / (1024 * 1024)
+
+
+def cgroup_available_mb() -> float | None:
+    """MB ancora disponibili prima di memory.max, None se il cgroup non ha limite"""
+    memory = cgroup_memory_mb()
+    return memory[0] - memory[1] if memory is not None else None
+
+
+def available_mb() -> float:
+    """Memoria disponibile per il job (il minimo tra sistema e cgroup)"""
+    available = meminfo_mb().get("MemAvailable", 0.0)
+    cgroup = cgroup_available_mb()
+    return min(available, cgroup) if cgroup is not None else available
+
+
+def used_mb() -> float:
+    """Memoria in uso da tutti i processi, nel vincolo più stretto tra sistema e cgroup"""
+    fields = meminfo_mb()
+    available = fields.get("MemAvailable", 0.0)
+    memory = cgroup_memory_mb()
+    if memory is not None and memory[0] - memory[1] < available:
+        return memory[1]
+    return fields.get("MemTotal", 0.0) - available
+
+
+def rss_mb(pid: int) -> float:
+    """RSS di un processo in MB (0 se è già terminato)"""
+    try:
+        with open(f"/proc/{pid}/status", encoding="utf-8") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return 0.0
+
+
+def descendants(pid: int) -> list[int]:
+    """PID di tutti i discendenti (worker, ffmpeg) da /proc/<pid>/task/*/children"""
+    found = []
+    try:
+        tasks = os.listdir(f"/proc/{pid}/task")
+    except OSError:
+        return found
+    for tid in tasks:
+        try:
+            with open(f"/proc/{pid}/task/{tid}/children", encoding="utf-8") as f:
+                children = [int(child) for child in f.read().split()]
+        except OSError:
+            continue
+        for child in children:
+            found.append(child)
+            found.extend(descendants(child))
+    return found
+
+
+def tree_rss_mb() -> float:
+    """RSS del processo corrente più tutti i suoi discendenti (MB)"""
+    pid = os.getpid()
+    return sum(rss_mb(p) for p in [pid, *descendants(pid)])
+
+
+def smaller_model(model_key: str) -> str | None:
+    """Modello precedente in MODEL_CONFIGS (ordinati dal più piccolo), None se è già il più piccolo"""
+    keys = list(MODEL_CONFIGS)
+    index = keys.index(model_key)
+    return keys[index - 1] if index > 0 else None
+
+
+class MemoryWatchdog:
+    """
+    Campiona la memoria in background e classifica la pressione
+
+    Uso: level() prima di ogni chunk, record() per ogni decisione presa,
+    report() a fine trascrizione, stop() per fermare il thread.
+    """
+
+    def __init__(self, pressure_mb: float = WATCHDOG_PRESSURE_MB, critical_mb: float = WATCHDOG_CRITICAL_MB,
+                 rss_limit_mb: float | None = WATCHDOG_RSS_LIMIT_MB,
+                 interval: float = WATCHDOG_INTERVAL_SECONDS,
+                 max_total_wait: float = WATCHDOG_MAX_TOTAL_WAIT_SECONDS):
+        self.pressure_mb = pressure_mb
+        self.critical_mb = critical_mb
+        self.rss_limit_mb = rss_limit_mb
+        self.interval = interval
+        self.max_total_wait = max_total_wait
+        self.waited_seconds = 0.0
+        self.decisions = []
+        self.samples = 0
+
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._window = None  # Caso peggiore dall'ultima level(): (min disponibile, max RSS)
+        self.min_available_mb = float("inf")
+        self.peak_rss_mb = 0.0
+
+        self.sample()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def sample(self) -> dict:
+        """Un campione: {available_mb, rss_mb}, accumulato nel caso peggiore corrente"""
+        current = {"available_mb": available_mb(), "rss_mb": tree_rss_mb()}
+        with self._lock:
+            self.samples += 1
+            self.min_available_mb = min(self.min_available_mb, current["available_mb"])
+            self.peak_rss_mb = max(self.peak_rss_mb, current["rss_mb"])
+            if self._window is None:
+                self._window = current
+            else:
+                self._window = {
+                    "available_mb": min(self._window["available_mb"], current["available_mb"]),
+                    "rss_mb": max(self._window["rss_mb"], current["rss_mb"]),
+                }
+        return current
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            self.sample()
+
+    def classify(self, available: float, rss: float) -> str:
+        """Livello di pressione per una coppia (memoria disponibile, RSS del job)"""
+        over_rss = self.rss_limit_mb is not None and rss > self.rss_limit_mb
+        near_rss = self.rss_limit_mb is not None and rss > self.rss_limit_mb * 0.85
+        if available < self.critical_mb or over_rss:
+            return "critical"
+        if available < self.pressure_mb or near_rss:
+            return "pressure"
+        return "ok"
+
+    def level(self) -> str:
+        """
+        Livello di pressione dal caso peggiore dall'ultima chiamata (più il campione attuale)
+
+        Returns:
+            "ok", "pressure" o "critical"
+        """
+        self.sample()
+        with self._lock:
+            worst, self._window = self._window, None
+        return self.classify(worst["available_mb"], worst["rss_mb"])
+
+    def held_by_others(self) -> bool:
+        """
+        True se la memoria in uso è soprattutto di altri processi del nodo
+
+        Solo allora attendere ha senso: la RSS del job (modello, worker) non
+        scende finché il job non cambia qualcosa.
+        """
+        current = self.sample()
+        if self.rss_limit_mb is not None and current["rss_mb"] > self.rss_limit_mb * 0.85:
+            return False  # Vicino al tetto RSS del job: il consumo è suo per definizione
+        return used_mb() - current["rss_mb"] > current["rss_mb"]
+
+    def can_wait(self) -> bool:
+        """True se resta tempo di attesa nel budget dell'esecuzione"""
+        return self.waited_seconds < self.max_total_wait
+
+    def wait_for_memory(self) -> bool:
+        """
+        Attende che la pressione rientri (memoria liberata da altri job sul nodo)
+
+        Consuma il budget WATCHDOG_MAX_TOTAL_WAIT_SECONDS dell'esecuzione.
+
+        Returns:
+            True se la memoria è tornata sopra le soglie entro il tempo rimasto
+        """
+        t0 = time.monotonic()
+        deadline = t0 + max(self.max_total_wait - self.waited_seconds, 0.0)
+        try:
+            while time.monotonic() < deadline:
+                current = self.sample()
+                if self.classify(current["available_mb"], current["rss_mb"]) == "ok":
+                    return True
+                time.sleep(self.interval)
+            return False
+        finally:
+            self.waited_seconds += time.monotonic() - t0
+
+    def record(self, action: str, chunk: str, before, after) -> None:
+        """Registra una decisione (con la memoria al momento) e la stampa"""
+        current = self.sample()
+        self.decisions.append({
+            "at": datetime.now().isoformat(timespec="seconds"),
+            "chunk": chunk,
+            "action": action,
+            "from": before,
+            "to": after,
+            "available_mb": round(current["available_mb"]),
+            "rss_mb": round(current["rss_mb"]),
+        })
+        print(f"   ├─ 🧯 Memoria ({current['available_mb']:.0f} MB liberi, RSS {current['rss_mb']:.0f} MB): "
+              f"{action} {before} → {after}")
+
+    def report(self) -> dict:
+        """Riepilogo per il report di esecuzione"""
+        return {
+            "pressure_mb": self.pressure_mb,
+            "critical_mb": self.critical_mb,
+            "rss_limit_mb": self.rss_limit_mb,
+            "samples": self.samples,
+            "min_available_mb": round(self.min_available_mb),
+            "peak_rss_mb": round(self.peak_rss_mb),
+            "waited_seconds": round(self.waited_seconds, 1),
+            "decisions": self.decisions,
+        }
+
+    def stop(self) -> None:
+        """Ferma il thread di campionamento"""
+        self._stop.set()
+        self._thread.join()
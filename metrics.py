@@ -0,0 +1,139 @@
+"""
+Metriche di accuratezza per trascrizioni
+
+WER (word error rate) e CER (character error rate) tra un testo di riferimento
+e una trascrizione, dopo una normalizzazione leggera (minuscole, niente punteggiatura).
+
+La distanza di edit lavora su array di interi (parole/caratteri → id): con numba
+il ciclo è compilato (riferimenti di un'ora in pochi secondi anche a livello di
+carattere), senza numba ogni riga della matrice è calcolata in numpy.
+"""
+
+import re
+import unicodedata
+
+try:
+    from numba import njit
+except ImportError:  # numba opzionale: fallback numpy
+    njit = None
+
+
+def normalize_text(text: str) -> str:
+    """
+    Normalizza testo per il confronto
+
+    Minuscole, forma Unicode NFC, punteggiatura rimossa, spazi singoli.
+    Gli accenti restano: "è" e "e" sono parole diverse in italiano.
+    """
+    text = unicodedata.normalize("NFC", text.lower())
+    text = re.sub(r"[^\w\s']|_", " ", text)
+    return re.sub(r"\s+", " ", text).strip()
+
+
+def _levenshtein_loops(reference, hypothesis) -> int:
+    # Programmazione dinamica su due righe: memoria O(len(hypothesis)).
+    # Scritta a cicli espliciti per numba (njit), che la compila in codice macchina
+    previous = list(range(len(hypothesis) + 1))
+    current = [0] * (len(hypothesis) + 1)
+    for i in range(1, len(reference) + 1):
+        current[0] = i
+        ref_item = reference[i - 1]
+        for j in range(1, len(hypothesis) + 1):
+            cost = previous[j - 1] + (1 if ref_item != hypothesis[j - 1] else 0)  # Sostituzione
+            if previous[j] + 1 < cost:
+                cost = previous[j] + 1                                # Cancellazione
+            if current[j - 1] + 1 < cost:
+                cost = current[j - 1] + 1                             # Inserimento
+            current[j] = cost
+        previous, current = current, previous
+    return previous[len(hypothesis)]
+
+
+_levenshtein_jit = njit(cache=True, nogil=True)(_levenshtein_loops) if njit is not None else None
+
+
+def _levenshtein_numpy(reference, hypothesis) -> int:
+    """
+    Stessa distanza con una riga della matrice per operazione numpy
+
+    L'inserimento dipende dal valore a sinistra nella stessa riga:
+    min_k(row[k] + j - k) = min cumulativo di (row - j) più j.
+    """
+    import numpy as np
+
+    columns = np.arange(len(hypothesis) + 1)
+    previous = columns.copy()
+    for i in range(1, len(reference) + 1):
+        current = np.empty_like(previous)
+        current[0] = i
+        np.minimum(previous[1:] + 1, previous[:-1] + (hypothesis != reference[i - 1]), out=current[1:])
+        previous = np.minimum.accumulate(current - columns) + columns
+    return int(previous[-1])
+
+
+def encode_tokens(reference: list, hypothesis: list):
+    """Parole o caratteri → array di id interi (stesso vocabolario per le due sequenze)"""
+    import numpy as np
+
+    vocabulary = {}
+    ref_ids = np.array([vocabulary.setdefault(t, len(vocabulary)) for t in reference], dtype=np.int64)
+    hyp_ids = np.array([vocabulary.setdefault(t, len(vocabulary)) for t in hypothesis], dtype=np.int64)
+    return ref_ids, hyp_ids
+
+
+def edit_distance(reference: list, hypothesis: list) -> int:
+    """
+    Distanza di Levenshtein tra due sequenze (sostituzioni, inserimenti, cancellazioni)
+
+    Memoria O(min(len)); tempo O(len(reference) * len(hypothesis)) in codice
+    compilato (numba) o vettoriale (numpy).
+    """
+    if len(reference) < len(hypothesis):
+        reference, hypothesis = hypothesis, reference
+    if not hypothesis:
+        return len(reference)
+
+    ref_ids, hyp_ids = encode_tokens(reference, hypothesis)
+    if _levenshtein_jit is not None:
+        return int(_levenshtein_jit(ref_ids, hyp_ids))
+    return _levenshtein_numpy(ref_ids, hyp_ids)
+
+
+def word_errors(reference: str, hypothesis: str) -> tuple[int, int]:
+    """Errori a livello di parola e parole del riferimento (per aggregare su più file)"""
+    ref_words = normalize_text(reference).split()
+    return edit_distance(ref_words, normalize_text(hypothesis).split()), len(ref_words)
+
+
+def char_errors(reference: str, hypothesis: str) -> tuple[int, int]:
+    """Errori a livello di carattere e caratteri del riferimento (per aggregare su più file)"""
+    ref_chars = normalize_text(reference)
+    return edit_distance(list(ref_chars), list(normalize_text(hypothesis))), len(ref_chars)
+
+
+def word_error_rate(reference: str, hypothesis: str) -> float:
+    """
+    WER = errori a livello di parola / parole del riferimento
+
+    Returns:
+        WER (0.0 = identico, può superare 1.0 con molti inserimenti)
+    """
+    ref_words = normalize_text(reference).split()
+    hyp_words = normalize_text(hypothesis).split()
+    if not ref_words:
+        return 0.0 if not hyp_words else 1.0
+    return edit_distance(ref_words, hyp_words) / len(ref_words)
+
+
+def char_error_rate(reference: str, hypothesis: str) -> float:
+    """
+    CER = errori a livello di carattere / caratteri del riferimento
+
+    Returns:
+        CER (0.0 = identico)
+    """
+    ref_chars = normalize_text(reference)
+    hyp_chars = normalize_text(hypothesis)
+    if not ref_chars:
+        return 0.0 if not hyp_chars else 1.0
+    return edit_distance(list(ref_chars), list(hyp_chars)) / len(ref_chars)
@@ -0,0 +1,370 @@
+"""
+Model server Whisper residente (opzionale)
+
+Tiene i modelli Whisper caricati in memoria e serve richieste di trascrizione
+su una Unix socket locale. Così 3_transcription.py non paga a ogni esecuzione
+il caricamento del modello (decine di secondi e GB di RAM per medium/large).
+
+Avvio:
+    python model_server.py              # Precarica MODEL_SERVER_MODELS
+    python model_server.py small large  # Precarica modelli specifici
+
+Protocollo (una richiesta JSON per riga, una risposta JSON per riga):
+    {"op": "ping"}
+    {"op": "transcribe", "model": "medium", "audio_path": "/abs/chunk.wav", "options": {...}}
+    {"op": "transcribe", "model": "medium", "shm_name": "...", "num_samples": N, "options": {...}}
+
+L'audio può arrivare come percorso file o come buffer float32 16kHz in shared memory.
+Più client possono collegarsi insieme: ogni connessione ha il suo thread,
+le trascrizioni sullo stesso modello sono serializzate da un lock.
+
+Solo processi dello stesso utente: la socket è in una cartella 0700 dell'utente
+(MODEL_SERVER_DIR) con permessi 0600, e su Linux server e client controllano
+l'uid dell'altro capo (SO_PEERCRED).
+"""
+
+import json
+import os
+import socket
+import socketserver
+import struct
+import sys
+import threading
+from pathlib import Path
+
+from config import (
+    MODEL_CONFIGS,
+    MODEL_SERVER_MODELS,
+    MODEL_SERVER_SOCKET,
+    MODEL_SERVER_TIMEOUT_SECONDS,
+    WHISPER_DEVICE,
+)
+from models import load_whisper_model
+from utils import get_device, print_header
+
+
+def check_socket_dir(path: Path, create: bool = False) -> None:
+    """
+    Verifica che la cartella della socket sia dell'utente corrente e accessibile solo a lui
+
+    Args:
+        path: Cartella della socket
+        create: Crea la cartella (0700) se manca
+
+    Raises:
+        PermissionError: Se la cartella è di un altro utente o accessibile ad altri
+    """
+    if create:
+        path.mkdir(mode=0o700, parents=True, exist_ok=True)
+    if not hasattr(os, "getuid"):
+        return
+    info = path.stat()
+    if info.st_uid != os.getuid() or info.st_mode & 0o077:
+        raise PermissionError(f"{path} deve appartenere all'utente corrente con permessi 0700")
+
+
+def peer_uid(sock: socket.socket) -> int | None:
+    """UID del processo all'altro capo della Unix socket (SO_PEERCRED), None se non disponibile"""
+    if not hasattr(socket, "SO_PEERCRED"):
+        return None
+    credentials = sock.getsockopt(socket.SOL_SOCKET, socket.SO_PEERCRED, struct.calcsize("3i"))
+    return struct.unpack("3i", credentials)[1]
+
+
+# =============================================================================
+# CLIENT
+# =============================================================================
+
+class ModelServerClient:
+    """Client per il model server: una connessione per richiesta"""
+
+    def __init__(self, socket_path: Path = MODEL_SERVER_SOCKET, timeout: float = MODEL_SERVER_TIMEOUT_SECONDS):
+        self.socket_path = Path(socket_path)
+        self.timeout = timeout
+
+    def _request(self, payload: dict) -> dict:
+        """
+        Invia una richiesta e attende la risposta
+
+        Raises:
+            ConnectionError: Se il server non è raggiungibile o non risponde entro il timeout
+            PermissionError: Se la socket o il server appartengono a un altro utente
+            RuntimeError: Se il server risponde con un errore
+        """
+        try:
+            check_socket_dir(self.socket_path.parent)
+            with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+                sock.settimeout(self.timeout)
+                sock.connect(str(self.socket_path))
+                uid = peer_uid(sock)
+                if uid is not None and uid != os.getuid():
+                    raise PermissionError(f"{self.socket_path} è servita dall'utente {uid}")
+                sock.sendall(json.dumps(payload).encode("utf-8") + b"\n")
+                with sock.makefile("rb") as stream:
+                    line = stream.readline()
+        except PermissionError:
+            raise
+        except OSError as e:
+            raise ConnectionError(f"Model server non raggiungibile: {e}")
+
+        if not line:
+            raise ConnectionError("Model server ha chiuso la connessione")
+
+        response = json.loads(line)
+        if not response.get("ok"):
+            raise RuntimeError(f"Model server: {response.get('error', 'errore sconosciuto')}")
+        return response
+
+    def ping(self) -> dict | None:
+        """
+        Verifica che il server sia attivo
+
+        Returns:
+            Info server ({"models": [...], "device": ...}) o None se non attivo
+        """
+        if not hasattr(socket, "AF_UNIX") or not self.socket_path.exists():
+            return None
+        try:
+            return ModelServerClient(self.socket_path, timeout=5)._request({"op": "ping"})
+        except PermissionError as e:
+            print(f"⚠️  Model server ignorato: {e}")
+            return None
+        except (ConnectionError, RuntimeError):
+            return None
+
+    def transcribe(self, model_key: str, audio, **options) -> dict:
+        """
+        Trascrive audio sul server
+
+        Args:
+            model_key: Chiave MODEL_CONFIGS (es. "medium")
+            audio: Percorso file oppure array float32 16kHz (passato in shared memory)
+            **options: Opzioni di model.transcribe (language, beam_size, ...)
+
+        Returns:
+            Risultato di model.transcribe (text, segments, language)
+        """
+        payload = {"op": "transcribe", "model": model_key, "options": options}
+
+        if isinstance(audio, (str, Path)):
+            # Il server gira sulla stessa macchina: basta il percorso assoluto
+            payload["audio_path"] = str(Path(audio).resolve())
+            return self._request(payload)["result"]
+
+        import numpy as np
+        from multiprocessing import shared_memory
+
+        samples = np.ascontiguousarray(audio, dtype=np.float32)
+        shm = shared_memory.SharedMemory(create=True, size=max(samples.nbytes, 1))
+        try:
+            np.ndarray(samples.shape, dtype=np.float32, buffer=shm.buf)[:] = samples
+            payload["shm_name"] = shm.name
+            payload["num_samples"] = int(samples.shape[0])
+            return self._request(payload)["result"]
+        finally:
+            shm.close()
+            shm.unlink()
+
+
+class RemoteModel:
+    """
+    Modello Whisper remoto con la stessa interfaccia di model.transcribe
+
+    Permette a transcribe_chunk di usare il server senza sapere che è remoto.
+    Se il server non risponde (timeout) o cade, il modello viene caricato
+    localmente e usato per questa e le successive trascrizioni.
+    """
+
+    def __init__(self, client: ModelServerClient, model_key: str, device: str):
+        self.client = client
+        self.model_key = model_key
+        self.device = device
+        self.local = None
+
+    def transcribe(self, audio, **options) -> dict:
+        if self.local is None:
+            try:
+                # Nessun output sul terminale del server (verbose lo imposta il server)
+                remote_options = {k: v for k, v in options.items() if k != "verbose"}
+                return self.client.transcribe(self.model_key, audio, **remote_options)
+            except (ConnectionError, PermissionError) as e:
+                print(f"\n⚠️  {e}: caricamento locale del modello {self.model_key}...", flush=True)
+                self.local = load_whisper_model(self.model_key, get_device(WHISPER_DEVICE))
+        return self.local.transcribe(audio, **options)
+
+
+def connect_model_server(model_key: str, socket_path: Path = MODEL_SERVER_SOCKET) -> RemoteModel | None:
+    """
+    Restituisce un RemoteModel se il server è attivo
+
+    Args:
+        model_key: Chiave MODEL_CONFIGS richiesta
+        socket_path: Socket del server
+
+    Returns:
+        RemoteModel pronto all'uso, o None se il server non è raggiungibile
+    """
+    client = ModelServerClient(socket_path)
+    info = client.ping()
+    if info is None:
+        return None
+    return RemoteModel(client, model_key, info["device"])
+
+
+# =============================================================================
+# SERVER
+# =============================================================================
+
+class ModelRegistry:
+    """Modelli caricati, con un lock per modello (l'inferenza non è thread-safe)"""
+
+    def __init__(self, device: str):
+        self.device = device
+        self._models = {}
+        self._locks = {}
+        self._registry_lock = threading.Lock()
+
+    def loaded(self) -> list[str]:
+        return sorted(self._models)
+
+    def get(self, model_key: str):
+        """
+        Restituisce (modello, lock), caricando il modello al primo uso
+
+        Raises:
+            KeyError: Se model_key non è in MODEL_CONFIGS
+        """
+        if model_key not in MODEL_CONFIGS:
+            raise KeyError(f"Modello sconosciuto: {model_key}")
+
+        with self._registry_lock:
+            if model_key not in self._models:
+                name = MODEL_CONFIGS[model_key]["name"]
+                print(f"▶️  Caricamento modello {model_key} ({name})...", flush=True)
+                self._models[model_key] = load_whisper_model(model_key, self.device)
+                self._locks[model_key] = threading.Lock()
+                print(f"✅ Modello {model_key} caricato", flush=True)
+            return self._models[model_key], self._locks[model_key]
+
+
+def _load_request_audio(request: dict):
+    """Audio della richiesta: percorso file o copia del buffer in shared memory"""
+    if "audio_path" in request:
+        return request["audio_path"]
+
+    import numpy as np
+    from multiprocessing import resource_tracker, shared_memory
+
+    shm = shared_memory.SharedMemory(name=request["shm_name"])
+    # Il buffer appartiene al client (che fa unlink): il tracker del server non deve rimuoverlo
+    resource_tracker.unregister(shm._name, "shared_memory")
+    try:
+        return np.ndarray((request["num_samples"],), dtype=np.float32, buffer=shm.buf).copy()
+    finally:
+        shm.close()
+
+
+class ModelRequestHandler(socketserver.StreamRequestHandler):
+    """Gestisce una connessione: legge richieste JSON riga per riga"""
+
+    def handle(self):
+        registry: ModelRegistry = self.server.registry
+
+        for line in self.rfile:
+            try:
+                request = json.loads(line)
+                op = request.get("op")
+
+                if op == "ping":
+                    response = {"ok": True, "models": registry.loaded(), "device": registry.device}
+                elif op == "transcribe":
+                    model, lock = registry.get(request["model"])
+                    audio = _load_request_audio(request)
+                    with lock:
+                        result = model.transcribe(audio, verbose=None, **request.get("options", {}))
+                    response = {"ok": True, "result": result}
+                else:
+                    response = {"ok": False, "error": f"Operazione sconosciuta: {op}"}
+            except Exception as e:
+                response = {"ok": False, "error": f"{type(e).__name__}: {e}"}
+
+            # default=float: valori numpy nei segmenti (es. probabilità) → float JSON
+            self.wfile.write(json.dumps(response, default=float).encode("utf-8") + b"\n")
+            self.wfile.flush()
+
+
+class ModelServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+    def __init__(self, socket_path: Path, registry: ModelRegistry):
+        self.registry = registry
+        super().__init__(str(socket_path), ModelRequestHandler)
+
+    def server_bind(self):
+        super().server_bind()
+        os.chmod(self.server_address, 0o600)
+
+    def verify_request(self, request, client_address) -> bool:
+        """Accetta solo processi dello stesso utente (SO_PEERCRED)"""
+        uid = peer_uid(request)
+        if uid is not None and uid != os.getuid():
+            print(f"⛔ Connessione rifiutata: utente {uid}", flush=True)
+            return False
+        return True
+
+
+def serve(model_keys: list[str], socket_path: Path = MODEL_SERVER_SOCKET) -> None:
+    """
+    Avvia il server e precarica i modelli richiesti
+
+    Args:
+        model_keys: Chiavi MODEL_CONFIGS da precaricare
+        socket_path: Percorso Unix socket
+    """
+    print_header("WHISPER MODEL SERVER")
+
+    if ModelServerClient(socket_path).ping() is not None:
+        print(f"⚠️  Server già attivo su {socket_path}")
+        return
+
+    try:
+        check_socket_dir(socket_path.parent, create=True)
+    except PermissionError as e:
+        print(f"❌ {e}")
+        sys.exit(1)
+
+    # Socket rimasta da un server terminato male
+    socket_path.unlink(missing_ok=True)
+
+    registry = ModelRegistry(get_device(WHISPER_DEVICE))
+    for key in model_keys:
+        registry.get(key)
+
+    with ModelServer(socket_path, registry) as server:
+        print(f"\n🔌 In ascolto su {socket_path} (Ctrl+C per terminare)\n", flush=True)
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            print("\n🛑 Arresto server")
+        finally:
+            socket_path.unlink(missing_ok=True)
+
+
+def main():
+    """Entry point"""
+    if not hasattr(socket, "AF_UNIX"):
+        print("❌ Unix socket non supportate su questo sistema")
+        sys.exit(1)
+
+    model_keys = sys.argv[1:] or MODEL_SERVER_MODELS
+    unknown = [key for key in model_keys if key not in MODEL_CONFIGS]
+    if unknown:
+        print(f"❌ Modelli sconosciuti: {', '.join(unknown)}")
+        print(f"💡 Disponibili: {', '.join(MODEL_CONFIGS)}")
+        sys.exit(1)
+
+    serve(model_keys)
+
+
+if __name__ == "__main__":
+    main()
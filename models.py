@@ -0,0 +1,166 @@
+"""
+Caricamento modelli Whisper
+
+Punto unico per device, thread e precisione di inferenza, usato da 3_transcription.py
+e dal model server. Su CPU supporta la quantizzazione dinamica int8 dei layer
+lineari (WHISPER_COMPUTE_TYPE = "int8") e il caricamento dei pesi in memory-map
+(WHISPER_WEIGHTS_MMAP): più processi sullo stesso nodo condividono le pagine dei
+pesi tramite la page cache invece di averne ognuno una copia privata.
+"""
+
+import os
+
+from config import (
+    MODEL_CONFIGS,
+    TORCH_THREADS,
+    WHISPER_COMPUTE_TYPE,
+    WHISPER_WEIGHTS_DIR,
+    WHISPER_WEIGHTS_MMAP,
+)
+
+COMPUTE_TYPES = ("fp32", "int8")
+
+
+def quantize_int8(model):
+    """
+    Quantizzazione dinamica int8 dei layer lineari (solo CPU)
+
+    I pesi dei Linear diventano int8, le attivazioni sono quantizzate al volo:
+    encoder e decoder girano con kernel int8, a costo di un piccolo calo di accuratezza.
+
+    Args:
+        model: Modello Whisper fp32 su CPU
+
+    Returns:
+        Lo stesso modello, quantizzato in-place
+    """
+    import torch
+
+    # whisper.model.Linear è una sottoclasse di nn.Linear che fa solo il cast del peso
+    # al dtype dell'input: quantize_dynamic riconosce solo nn.Linear esatto,
+    # e in fp32 i due forward sono identici
+    for module in model.modules():
+        if isinstance(module, torch.nn.Linear):
+            module.__class__ = torch.nn.Linear
+
+    return torch.ao.quantization.quantize_dynamic(
+        model, {torch.nn.Linear}, dtype=torch.qint8, inplace=True
+    )
+
+
+def mmap_checkpoint(model_key: str):
+    """
+    Checkpoint convertito per il memory-map (creato alla prima richiesta)
+
+    Il checkpoint ufficiale è in fp16 e whisper.load_model lo copia in parametri
+    fp32 privati. Qui è convertito UNA volta in fp32 nel formato zip di torch.save,
+    che torch.load(mmap=True) mappa direttamente: i tensori puntano alle pagine
+    del file, nessuna copia.
+
+    Returns:
+        Percorso del checkpoint convertito
+    """
+    import torch
+    import whisper
+
+    name = MODEL_CONFIGS[model_key]["name"]
+    path = WHISPER_WEIGHTS_DIR / f"{name}.fp32.pt"
+    if path.exists():
+        return path
+
+    print(f"🔄 Conversione pesi {name} per il memory-map (una tantum)...")
+    download_root = os.path.join(os.path.expanduser("~"), ".cache", "whisper")
+    source = whisper._download(whisper._MODELS[name], download_root, in_memory=False)
+    checkpoint = torch.load(source, map_location="cpu")
+
+    state_dict = {
+        key: tensor.float() if tensor.is_floating_point() else tensor
+        for key, tensor in checkpoint["model_state_dict"].items()
+    }
+
+    # Scrittura atomica: più worker possono chiedere la conversione insieme
+    WHISPER_WEIGHTS_DIR.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+    torch.save({"dims": checkpoint["dims"], "model_state_dict": state_dict}, tmp_path)
+    os.replace(tmp_path, path)
+    return path
+
+
+def load_mmap_model(model_key: str):
+    """
+    Modello Whisper con i pesi in memory-map (sola lettura di fatto, su CPU)
+
+    Il modello è costruito sul device "meta" (nessuna allocazione) e i parametri
+    sono assegnati ai tensori mappati (load_state_dict(assign=True)). I buffer non
+    salvati nel checkpoint (maschera causale del decoder, alignment heads) sono
+    ricostruiti come fa Whisper.__init__ / whisper.load_model.
+
+    Returns:
+        Modello Whisper su CPU
+    """
+    import torch
+    import whisper
+    from whisper.model import ModelDimensions, Whisper
+
+    name = MODEL_CONFIGS[model_key]["name"]
+    checkpoint = torch.load(mmap_checkpoint(model_key), map_location="cpu", mmap=True, weights_only=True)
+    dims = ModelDimensions(**checkpoint["dims"])
+
+    with torch.device("meta"):
+        model = Whisper(dims)
+    model.load_state_dict(checkpoint["model_state_dict"], assign=True)
+
+    # Buffer non persistenti: restano "meta" dopo load_state_dict
+    mask = torch.empty(dims.n_text_ctx, dims.n_text_ctx).fill_(-float("inf")).triu_(1)
+    model.decoder.register_buffer("mask", mask, persistent=False)
+
+    if name in whisper._ALIGNMENT_HEADS:
+        model.set_alignment_heads(whisper._ALIGNMENT_HEADS[name])
+    else:
+        # Default di Whisper: tutte le teste della seconda metà del decoder
+        heads = torch.zeros(dims.n_text_layer, dims.n_text_head, dtype=torch.bool)
+        heads[dims.n_text_layer // 2:] = True
+        model.register_buffer("alignment_heads", heads.to_sparse(), persistent=False)
+
+    return model.eval()
+
+
+def load_whisper_model(model_key: str, device: str, compute_type: str = WHISPER_COMPUTE_TYPE,
+                       threads: int = TORCH_THREADS):
+    """
+    Carica un modello Whisper con la precisione configurata
+
+    Args:
+        model_key: Chiave MODEL_CONFIGS (base, small, medium, large)
+        device: 'cuda' o 'cpu'
+        compute_type: "fp32" o "int8" (int8 solo su CPU)
+        threads: Thread intra-op di torch per questo processo (0 = default)
+
+    Returns:
+        Modello Whisper pronto per transcribe()
+
+    Raises:
+        ValueError: Se compute_type non è supportato
+    """
+    import torch
+    import whisper
+
+    if threads > 0:
+        torch.set_num_threads(threads)
+
+    if compute_type not in COMPUTE_TYPES:
+        raise ValueError(f"WHISPER_COMPUTE_TYPE non valido: {compute_type} (opzioni: {', '.join(COMPUTE_TYPES)})")
+
+    if WHISPER_WEIGHTS_MMAP and device == "cpu":
+        model = load_mmap_model(model_key)
+    else:
+        model = whisper.load_model(MODEL_CONFIGS[model_key]["name"], device=device)
+
+    if compute_type == "int8":
+        if device != "cpu":
+            print("⚠️  Quantizzazione int8 disponibile solo su CPU, uso fp16/fp32")
+            return model
+        model = quantize_int8(model)
+        print("🗜️  Modello quantizzato int8 (layer lineari)")
+
+    return model
@@ -0,0 +1,328 @@
+"""
+Planner a scadenza: sceglie modello e beam per finire entro un orario
+
+Usa i real-time factor (RTF = secondi di calcolo / secondi di audio) misurati
+su QUESTA macchina per ogni modello e beam, e la durata del video da trascrivere.
+Tra le configurazioni che finiscono in tempo sceglie la più accurata e salva
+il piano in DEADLINE_PLAN_FILE, che 3_transcription.py applica.
+Durante la trascrizione il Replanner confronta il throughput reale con quello
+previsto e, se la scadenza è a rischio, passa a una configurazione più veloce.
+
+Uso:
+    python planner.py calibrate clip.wav          # Misura RTF per modello/beam
+    python planner.py plan --deadline 09:00       # Pianifica per INPUT_VIDEO
+    python planner.py plan --deadline "2026-10-20 09:00" --video altro.mp4
+    python planner.py clear                       # Rimuove il piano
+"""
+
+import argparse
+import importlib
+import json
+import sys
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+from config import (
+    DEADLINE_PLAN_FILE,
+    HOST_PROFILE,
+    INPUT_VIDEO,
+    MODEL_CONFIGS,
+    PLANNER_SAFETY_MARGIN,
+    WHISPER_DEVICE,
+)
+from utils import get_device, get_video_duration, print_header, print_section
+
+
+# =============================================================================
+# CANDIDATI
+# =============================================================================
+
+def accuracy_rank(candidate: dict) -> tuple[int, int]:
+    """Ordine di accuratezza: prima il modello (ordine di MODEL_CONFIGS), poi il beam"""
+    return list(MODEL_CONFIGS).index(candidate["model"]), candidate["beam_size"]
+
+
+def load_candidates() -> list[dict]:
+    """
+    RTF misurati su questo host (sezione "rtf" del profilo)
+
+    Returns:
+        Candidati {model, beam_size, best_of, rtf} dal più accurato al meno accurato
+    """
+    if not HOST_PROFILE.exists():
+        return []
+    profile = json.loads(HOST_PROFILE.read_text(encoding="utf-8"))
+    candidates = [c for c in profile.get("rtf", []) if c["model"] in MODEL_CONFIGS]
+    return sorted(candidates, key=accuracy_rank, reverse=True)
+
+
+def choose(candidates: list[dict], audio_seconds: float, available_seconds: float,
+           drift: float = 1.0) -> dict | None:
+    """
+    Configurazione più accurata che finisce in tempo
+
+    Args:
+        candidates: Candidati ordinati dal più accurato
+        audio_seconds: Audio ancora da trascrivere
+        available_seconds: Tempo disponibile fino alla scadenza
+        drift: Rapporto RTF reale / RTF misurato (1.0 = come da calibrazione)
+
+    Returns:
+        Candidato scelto, o None se nemmeno il più veloce ce la fa
+    """
+    for candidate in candidates:
+        expected = audio_seconds * candidate["rtf"] * drift * PLANNER_SAFETY_MARGIN
+        if expected <= available_seconds:
+            return candidate
+    return None
+
+
+def local_datetime(value: str) -> datetime:
+    """
+    Data ISO come ora locale senza fuso (confrontabile con datetime.now())
+
+    Una data con fuso ("+02:00", "Z") è convertita nell'ora locale.
+
+    Raises:
+        ValueError: Se il formato non è valido
+    """
+    parsed = datetime.fromisoformat(value)
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone().replace(tzinfo=None)
+    return parsed
+
+
+def parse_deadline(value: str, now: datetime | None = None) -> datetime:
+    """
+    Interpreta la scadenza: "HH:MM" (oggi, o domani se già passata) o data ISO
+    (anche con fuso orario, convertita nell'ora locale)
+
+    Raises:
+        ValueError: Se il formato non è valido
+    """
+    now = now or datetime.now()
+    try:
+        hour, minute = (int(part) for part in value.split(":"))
+        deadline = now.replace(hour=hour, minute=minute, second=0, microsecond=0)
+        return deadline if deadline > now else deadline + timedelta(days=1)
+    except ValueError:
+        return local_datetime(value)
+
+
+# =============================================================================
+# REPLANNING DURANTE LA TRASCRIZIONE
+# =============================================================================
+
+class Replanner:
+    """
+    Controlla il throughput durante la trascrizione e rivede il piano se serve
+
+    Dopo ogni chunk: RTF reale vs RTF previsto → drift. Se con il throughput
+    misurato la configurazione corrente non finisce entro la scadenza, passa
+    alla più accurata tra quelle più veloci che ci sta. Si scende soltanto,
+    mai il contrario, per non oscillare tra due modelli.
+    """
+
+    def __init__(self, plan: dict):
+        self.deadline = local_datetime(plan["deadline"])
+        self.current = plan["choice"]
+        self.candidates = plan["candidates"]
+        self.compute_seconds = 0.0
+        self.audio_seconds = 0.0
+        self.decisions = []
+
+    def observe(self, audio_seconds: float, compute_seconds: float) -> None:
+        """Registra un chunk trascritto con la configurazione corrente"""
+        self.audio_seconds += audio_seconds
+        self.compute_seconds += compute_seconds
+
+    def check(self, remaining_audio: float) -> dict | None:
+        """
+        Verifica la scadenza con il throughput misurato
+
+        Args:
+            remaining_audio: Secondi di audio ancora da trascrivere
+
+        Returns:
+            Nuovo candidato se bisogna cambiare configurazione, altrimenti None
+        """
+        if self.audio_seconds <= 0:
+            return None
+
+        measured_rtf = self.compute_seconds / self.audio_seconds
+        drift = measured_rtf / self.current["rtf"]
+        available = (self.deadline - datetime.now()).total_seconds()
+        projected = remaining_audio * measured_rtf * PLANNER_SAFETY_MARGIN
+
+        if projected <= available:
+            return None
+
+        faster = [c for c in self.candidates if accuracy_rank(c) < accuracy_rank(self.current)]
+        choice = choose(faster, remaining_audio, available, drift) or (faster[-1] if faster else None)
+        if choice is None:
+            return None
+
+        self.decisions.append({
+            "at": datetime.now().isoformat(timespec="seconds"),
+            "from": f"{self.current['model']}/beam{self.current['beam_size']}",
+            "to": f"{choice['model']}/beam{choice['beam_size']}",
+            "measured_rtf": measured_rtf,
+            "drift": drift,
+            "remaining_audio": remaining_audio,
+            "available_seconds": available,
+        })
+
+        # Nuova configurazione: il throughput si misura da capo
+        self.current = choice
+        self.compute_seconds = 0.0
+        self.audio_seconds = 0.0
+        return choice
+
+
+def load_plan(video: Path = INPUT_VIDEO) -> dict | None:
+    """
+    Piano attivo (DEADLINE_PLAN_FILE) per il video da trascrivere
+
+    Un piano fatto per un altro video o con la scadenza già passata è ignorato
+    (con un avviso): altrimenti cambierebbe il modello di ogni esecuzione successiva.
+
+    Args:
+        video: Video che si sta per trascrivere
+
+    Returns:
+        Piano valido o None
+    """
+    if not DEADLINE_PLAN_FILE.exists():
+        return None
+    plan = json.loads(DEADLINE_PLAN_FILE.read_text(encoding="utf-8"))
+
+    if Path(plan["video"]).resolve() != Path(video).resolve():
+        print(f"⚠️  Piano a scadenza ignorato: è per {plan['video']}, non per {video}")
+        print(f"💡 Rimuovi {DEADLINE_PLAN_FILE} o ripianifica con: python planner.py plan --deadline HH:MM\n")
+        return None
+    if local_datetime(plan["deadline"]) <= datetime.now():
+        print(f"⚠️  Piano a scadenza ignorato: la scadenza {plan['deadline']} è già passata")
+        print(f"💡 Rimuovi {DEADLINE_PLAN_FILE} o ripianifica con: python planner.py plan --deadline HH:MM\n")
+        return None
+    return plan
+
+
+# =============================================================================
+# COMANDI
+# =============================================================================
+
+def calibrate(clip: Path, language: str, models: list[str]) -> None:
+    """Misura l'RTF di ogni modello con beam greedy e beam configurato"""
+    from models import load_whisper_model
+
+    transcription = importlib.import_module("3_transcription")
+
+    print_header("CALIBRAZIONE RTF")
+    device = get_device(WHISPER_DEVICE)
+    audio_seconds = get_video_duration(clip)
+    print(f"🎧 Clip: {clip.name} ({audio_seconds:.0f}s)\n")
+
+    results = []
+    for model_key in models:
+        model = load_whisper_model(model_key, device)
+        configured = MODEL_CONFIGS[model_key]
+
+        # Greedy (beam 1) e beam di MODEL_CONFIGS
+        variants = [{"beam_size": 1, "best_of": 1}]
+        if configured["beam_size"] > 1:
+            variants.append({"beam_size": configured["beam_size"], "best_of": configured["best_of"]})
+
+        for variant in variants:
+            print(f"▶️  {model_key} beam {variant['beam_size']}...", end=" ", flush=True)
+            t0 = time.perf_counter()
+            transcription.transcribe_chunk(model, clip, language, device, {**configured, **variant})
+            rtf = (time.perf_counter() - t0) / audio_seconds
+            print(f"RTF {rtf:.3f}")
+            results.append({"model": model_key, **variant, "rtf": rtf})
+
+        del model
+
+    profile = json.loads(HOST_PROFILE.read_text(encoding="utf-8")) if HOST_PROFILE.exists() else {}
+    profile["rtf"] = results
+    HOST_PROFILE.parent.mkdir(parents=True, exist_ok=True)
+    HOST_PROFILE.write_text(json.dumps(profile, indent=2), encoding="utf-8")
+    print(f"\n💾 RTF salvati in {HOST_PROFILE}")
+
+
+def plan(deadline: datetime, video: Path) -> None:
+    """Sceglie la configurazione e salva il piano"""
+    print_header("PIANIFICAZIONE A SCADENZA")
+
+    candidates = load_candidates()
+    if not candidates:
+        print("❌ Nessun RTF misurato su questo host")
+        print("💡 Esegui prima: python planner.py calibrate clip.wav")
+        sys.exit(1)
+
+    audio_seconds = get_video_duration(video)
+    available = (deadline - datetime.now()).total_seconds()
+
+    print(f"📹 Video: {video.name} ({audio_seconds/60:.1f} min)")
+    print(f"⏰ Scadenza: {deadline:%Y-%m-%d %H:%M} (tra {available/3600:.1f} ore)")
+    print(f"🛡️  Margine di sicurezza: x{PLANNER_SAFETY_MARGIN}\n")
+
+    for c in candidates:
+        expected = audio_seconds * c["rtf"] * PLANNER_SAFETY_MARGIN
+        fits = "✅" if expected <= available else "❌"
+        print(f"   {fits} {c['model']:<7} beam {c['beam_size']}: ~{expected/60:6.1f} min")
+
+    choice = choose(candidates, audio_seconds, available)
+    if choice is None:
+        choice = candidates[-1]
+        print(f"\n⚠️  Nessuna configurazione finisce in tempo: uso la più veloce")
+
+    DEADLINE_PLAN_FILE.parent.mkdir(parents=True, exist_ok=True)
+    DEADLINE_PLAN_FILE.write_text(json.dumps({
+        "deadline": deadline.isoformat(timespec="seconds"),
+        "video": str(video),
+        "audio_seconds": audio_seconds,
+        "choice": choice,
+        "candidates": candidates,
+    }, indent=2), encoding="utf-8")
+
+    print_section("PIANO")
+    print(f"🤖 Modello: {choice['model']} (beam {choice['beam_size']}, best_of {choice['best_of']})")
+    print(f"⏱️  Tempo previsto: ~{audio_seconds * choice['rtf'] / 60:.1f} min")
+    print(f"💾 Piano salvato: {DEADLINE_PLAN_FILE}")
+    print("➡️  3_transcription.py userà questa configurazione")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Planner a scadenza")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    cmd = commands.add_parser("calibrate", help="Misura RTF per modello e beam")
+    cmd.add_argument("clip", type=Path)
+    cmd.add_argument("--language", default="it")
+    cmd.add_argument("--models", nargs="+", default=list(MODEL_CONFIGS), choices=list(MODEL_CONFIGS))
+
+    cmd = commands.add_parser("plan", help="Pianifica per una scadenza")
+    cmd.add_argument("--deadline", required=True, help='"HH:MM" o data ISO')
+    cmd.add_argument("--video", type=Path, default=INPUT_VIDEO)
+
+    commands.add_parser("clear", help="Rimuove il piano attivo")
+
+    args = parser.parse_args()
+
+    if args.command == "calibrate":
+        calibrate(args.clip, args.language, args.models)
+    elif args.command == "plan":
+        try:
+            deadline = parse_deadline(args.deadline)
+        except ValueError:
+            print(f"❌ Scadenza non valida: {args.deadline}")
+            sys.exit(1)
+        plan(deadline, args.video)
+    else:
+        DEADLINE_PLAN_FILE.unlink(missing_ok=True)
+        print("🗑️  Piano rimosso")
+
+
+if __name__ == "__main__":
+    main()
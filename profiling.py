@@ -0,0 +1,102 @@
+"""
+Profiling opzionale degli stage della pipeline
+
+Spento di default. Si attiva da config.py (PROFILE_STAGES) o da variabile
+d'ambiente, senza modificare gli script:
+
+    PROFILE_STAGES=transcribe_chunk,clean_overlap python 3_transcription.py
+    PROFILE_STAGES=transcribe_chunk PROFILE_BACKEND=torch PROFILE_EVERY=10 python 3_transcription.py
+    PROFILE_STAGES=correct_transcription python 4_correction.py
+
+Stage disponibili: transcribe_chunk, clean_overlap (step 3), correct_transcription (step 4).
+Ogni esecuzione profilata produce un file in PROFILE_DIR:
+- backend "cprofile": <stage>_<indice>.pstats (python -m pstats, snakeviz)
+- backend "torch":    <stage>_<indice>.trace.json (chrome://tracing, Perfetto)
+
+Campionamento: con PROFILE_CHUNKS si profilano solo quegli indici; altrimenti
+un'esecuzione ogni PROFILE_EVERY (1 = tutte), così in produzione il costo resta basso.
+"""
+
+import cProfile
+from contextlib import contextmanager
+
+from config import (
+    PROFILE_BACKEND,
+    PROFILE_CHUNKS,
+    PROFILE_DIR,
+    PROFILE_EVERY,
+    PROFILE_STAGES,
+)
+
+# Esecuzioni viste per stage (per il campionamento)
+_calls = {}
+
+# File di profilo scritti in questo processo (per il riepilogo dello step)
+written = []
+
+
+def should_profile(stage: str, index: int | None) -> bool:
+    """
+    Decide se profilare questa esecuzione dello stage
+
+    Args:
+        stage: Nome dello stage
+        index: Indice del chunk (None se lo stage non è per chunk)
+
+    Returns:
+        True se va profilata
+    """
+    if stage not in PROFILE_STAGES:
+        return False
+
+    call = _calls.get(stage, 0)
+    _calls[stage] = call + 1
+
+    if PROFILE_CHUNKS and index is not None:
+        return index in PROFILE_CHUNKS
+    return call % max(PROFILE_EVERY, 1) == 0
+
+
+@contextmanager
+def profile_stage(stage: str, index: int | None = None):
+    """
+    Profila il blocco se lo stage è attivo e il campionamento lo seleziona
+
+    Args:
+        stage: Nome dello stage
+        index: Indice del chunk, usato nel nome del file e per PROFILE_CHUNKS
+
+    Esempio:
+        with profile_stage("clean_overlap", idx):
+            text = clean_overlap(full_text, text)
+    """
+    if not should_profile(stage, index):
+        yield
+        return
+
+    PROFILE_DIR.mkdir(parents=True, exist_ok=True)
+    name = f"{stage}_{index:03}" if index is not None else f"{stage}_{_calls[stage]:03}"
+
+    if PROFILE_BACKEND == "torch":
+        import torch
+        from torch.profiler import ProfilerActivity, profile
+
+        activities = [ProfilerActivity.CPU]
+        if torch.cuda.is_available():
+            activities.append(ProfilerActivity.CUDA)
+
+        with profile(activities=activities, record_shapes=True) as prof:
+            yield
+        path = PROFILE_DIR / f"{name}.trace.json"
+        prof.export_chrome_trace(str(path))
+    else:
+        profiler = cProfile.Profile()
+        profiler.enable()
+        try:
+            yield
+        finally:
+            profiler.disable()
+        path = PROFILE_DIR / f"{name}.pstats"
+        profiler.dump_stats(path)
+
+    written.append(path)
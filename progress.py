@@ -0,0 +1,224 @@
+"""
+Avanzamento degli step e testo parziale su un endpoint HTTP locale
+
+Gli step aggiornano lo stato in memoria (stage, chunk, audio elaborato, testo
+prodotto); con PROGRESS_ENABLED un server HTTP della libreria standard, in un
+thread, lo pubblica su 127.0.0.1:PROGRESS_PORT. Niente polling di file: il
+client legge solo il testo nuovo.
+
+Endpoint (JSON):
+    GET /progress                → stage, chunk, percentuale, RTF misurato, ETA
+    GET /transcript?offset=N     → testo dal carattere N in poi e next_offset
+                                   da usare alla richiesta successiva
+
+L'ETA usa il real-time factor misurato (tempo trascorso / audio elaborato) sul
+resto dell'audio; senza durate audio (step 4) il tempo medio per chunk.
+
+Uso da uno step:
+    progress.start("transcription", total=len(chunks), audio_total=durata)
+    progress.append_text(delta)          # Testo nuovo
+    progress.advance(audio_seconds)      # Chunk completato
+    progress.finish()
+
+Esempio client:
+    curl -s localhost:8765/progress
+    curl -s "localhost:8765/transcript?offset=0"
+"""
+
+import json
+import threading
+import time
+from bisect import bisect_right
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+from config import PROGRESS_ENABLED, PROGRESS_PORT
+
+# Stato dello step in corso (un processo = uno step)
+_lock = threading.Lock()
+_state = {
+    "stage": None,
+    "done": 0,
+    "total": 0,
+    "audio_done": 0.0,
+    "audio_total": 0.0,
+    "started": None,
+    "finished": False,
+    "updated_at": None,
+}
+
+# Testo prodotto: pezzi in ordine e offset (in caratteri) di inizio di ciascuno
+_pieces: list[str] = []
+_starts: list[int] = []
+_length = 0
+
+_server: ThreadingHTTPServer | None = None
+
+
+def start(stage: str, total: int, audio_total: float = 0.0) -> None:
+    """
+    Inizio di uno step: azzera lo stato e avvia il server (con PROGRESS_ENABLED)
+
+    Args:
+        stage: Nome dello step ("transcription", "correction", ...)
+        total: Chunk da elaborare
+        audio_total: Secondi di audio da elaborare (0 = ETA per chunk)
+    """
+    global _length
+    with _lock:
+        _state.update(
+            stage=stage, done=0, total=total, audio_done=0.0, audio_total=audio_total,
+            started=time.perf_counter(), finished=False, updated_at=_now(),
+        )
+        _pieces.clear()
+        _starts.clear()
+        _length = 0
+    if PROGRESS_ENABLED:
+        serve()
+
+
+def advance(audio_seconds: float = 0.0) -> None:
+    """Un chunk completato (con i suoi secondi di audio)"""
+    with _lock:
+        _state["done"] += 1
+        _state["audio_done"] += audio_seconds
+        _state["updated_at"] = _now()
+
+
+def append_text(delta: str) -> None:
+    """Testo nuovo in coda a quello prodotto dallo step"""
+    global _length
+    if not delta:
+        return
+    with _lock:
+        _starts.append(_length)
+        _pieces.append(delta)
+        _length += len(delta)
+        _state["updated_at"] = _now()
+
+
+def finish() -> None:
+    """Fine dello step"""
+    with _lock:
+        _state["finished"] = True
+        _state["updated_at"] = _now()
+
+
+def snapshot() -> dict:
+    """
+    Stato corrente con percentuale, RTF ed ETA
+
+    Returns:
+        Dict pubblicato da GET /progress
+    """
+    with _lock:
+        state = dict(_state)
+        length = _length
+
+    elapsed = time.perf_counter() - state["started"] if state["started"] is not None else 0.0
+    rtf = elapsed / state["audio_done"] if state["audio_done"] > 0 else None
+
+    eta = None
+    if state["finished"]:
+        eta = 0.0
+    elif rtf is not None and state["audio_total"] > 0:
+        eta = rtf * max(state["audio_total"] - state["audio_done"], 0.0)
+    elif state["done"] > 0:
+        eta = elapsed / state["done"] * (state["total"] - state["done"])
+
+    return {
+        "stage": state["stage"],
+        "chunk": state["done"],
+        "chunks": state["total"],
+        "percent": state["done"] / state["total"] * 100 if state["total"] else 0.0,
+        "audio_seconds": state["audio_done"],
+        "audio_total_seconds": state["audio_total"],
+        "elapsed_seconds": elapsed,
+        "rtf": rtf,
+        "eta_seconds": eta,
+        "text_length": length,
+        "finished": state["finished"],
+        "updated_at": state["updated_at"],
+    }
+
+
+def text_since(offset: int) -> dict:
+    """
+    Testo prodotto dal carattere `offset` in poi
+
+    Returns:
+        Dict pubblicato da GET /transcript: offset, next_offset, text, finished
+    """
+    # Sotto il lock solo la copia dei riferimenti ai pezzi nuovi: il join avviene dopo
+    with _lock:
+        offset = min(max(offset, 0), _length)
+        first = max(bisect_right(_starts, offset) - 1, 0)
+        pieces = _pieces[first:]
+        skip = offset - _starts[first] if _pieces else 0
+        result = {
+            "stage": _state["stage"],
+            "offset": offset,
+            "next_offset": _length,
+            "finished": _state["finished"],
+        }
+
+    if pieces:
+        pieces[0] = pieces[0][skip:]
+    result["text"] = "".join(pieces)
+    return result
+
+
+class ProgressHandler(BaseHTTPRequestHandler):
+    """Risponde a /progress e /transcript in JSON"""
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        if url.path == "/progress":
+            self._send(200, snapshot())
+        elif url.path == "/transcript":
+            try:
+                offset = int(parse_qs(url.query).get("offset", ["0"])[0])
+            except ValueError:
+                self._send(400, {"error": "offset non valido"})
+                return
+            self._send(200, text_since(offset))
+        else:
+            self._send(404, {"error": "endpoint sconosciuto", "endpoints": ["/progress", "/transcript?offset=N"]})
+
+    def _send(self, status: int, payload: dict) -> None:
+        body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("Cache-Control", "no-store")
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass  # Niente log per richiesta: l'output dello step resta leggibile
+
+
+def serve(port: int = PROGRESS_PORT) -> ThreadingHTTPServer | None:
+    """
+    Avvia il server su 127.0.0.1 in un thread daemon (una volta per processo)
+
+    Returns:
+        Server avviato, o None se la porta è occupata (lo step prosegue senza)
+    """
+    global _server
+    if _server is not None:
+        return _server
+    try:
+        _server = ThreadingHTTPServer(("127.0.0.1", port), ProgressHandler)
+    except OSError as e:
+        print(f"⚠️  Endpoint di avanzamento non disponibile sulla porta {port}: {e}")
+        return None
+    _server.daemon_threads = True
+    threading.Thread(target=_server.serve_forever, daemon=True).start()
+    print(f"📡 Avanzamento: http://127.0.0.1:{port}/progress\n")
+    return _server
+
+
+def _now() -> str:
+    return datetime.now().isoformat(timespec="seconds")
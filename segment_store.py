@@ -0,0 +1,384 @@
+"""
+Archivio colonnare dei segmenti con timestamp (trascrizione.segs)
+
+trascrizione_raw.txt perde i tempi: "cosa si dice a 1:23:40?", sottotitoli ed
+estrazione di clip richiederebbero di trascrivere di nuovo. Qui 3_transcription.py
+salva segmenti e parole con tempi ASSOLUTI nel video (offset da chunks_info.json)
+in un file compatto a colonne:
+
+    magic "SEGSTORE" | uint32 lunghezza meta | meta JSON | colonne (allineate a 8 byte)
+
+Colonne dei segmenti: start/end float64, offset del testo uint64 (n+1) nel blob
+UTF-8, lingua uint8 (indice nella tabella delle lingue), confidenza uint8
+(exp(avg_logprob) * 255), offset della prima parola uint64 (n+1).
+Colonne delle parole: start/end float64, offset del testo uint64 (n+1), probabilità uint8.
+
+La lettura è in memory-map: le colonne sono memoryview sul file, le ricerche per
+tempo sono ricerche binarie e l'export SRT/VTT/TXT scorre i segmenti uno alla volta.
+
+Uso:
+    python segment_store.py info
+    python segment_store.py at 1:23:40
+    python segment_store.py range 10:00 12:30
+    python segment_store.py export srt -o sottotitoli.srt
+"""
+
+import argparse
+import json
+import math
+import mmap
+import os
+import struct
+import sys
+from array import array
+from bisect import bisect_left
+from datetime import datetime
+from pathlib import Path
+
+from config import OUTPUT_DIR
+
+MAGIC = b"SEGSTORE"
+VERSION = 1
+STORE_FILE = OUTPUT_DIR / "trascrizione.segs"
+
+# Whisper non produce segmenti più lunghi di una finestra: limite per la ricerca binaria
+MAX_SEGMENT_SECONDS = 30.0
+
+# Colonne: nome → typecode array
+SEGMENT_COLUMNS = {
+    "start": "d",
+    "end": "d",
+    "text_offset": "Q",
+    "language": "B",
+    "confidence": "B",
+    "word_offset": "Q",
+}
+WORD_COLUMNS = {
+    "word_start": "d",
+    "word_end": "d",
+    "word_text_offset": "Q",
+    "word_probability": "B",
+}
+
+
+def to_byte(probability: float) -> int:
+    """Probabilità 0..1 → uint8"""
+    return max(0, min(255, round(probability * 255)))
+
+
+class SegmentStoreWriter:
+    """
+    Accumula segmenti in colonne e scrive il file in modo atomico con close()
+
+    Le colonne sono array compatti (non dict per segmento): anche ore di
+    trascrizione occupano pochi MB in memoria.
+    """
+
+    def __init__(self, path: Path = STORE_FILE, source: str = ""):
+        self.path = Path(path)
+        self.source = source
+        self.languages = []
+        self.columns = {name: array(code) for name, code in {**SEGMENT_COLUMNS, **WORD_COLUMNS}.items()}
+        self.columns["text_offset"].append(0)
+        self.columns["word_offset"].append(0)
+        self.columns["word_text_offset"].append(0)
+        self.text = bytearray()
+        self.word_text = bytearray()
+
+    def __len__(self) -> int:
+        return len(self.columns["start"])
+
+    def add_segments(self, segments: list[dict], offset: float, language: str) -> int:
+        """
+        Aggiunge i segmenti di un chunk (o di un suo pezzo)
+
+        I segmenti nell'overlap col chunk precedente (punto medio prima della fine
+        dell'ultimo segmento salvato) sono scartati: stessa regola di splice_segments.
+
+        Args:
+            segments: Segmenti Whisper con tempi relativi al chunk
+            offset: Inizio del chunk nel video (secondi)
+            language: Codice lingua
+
+        Returns:
+            Segmenti aggiunti
+        """
+        if language not in self.languages:
+            self.languages.append(language)
+        language_id = self.languages.index(language)
+        last_end = self.columns["end"][-1] if len(self) else -math.inf
+        cols = self.columns
+        added = 0
+
+        for segment in segments:
+            start, end = offset + segment["start"], offset + segment["end"]
+            if (start + end) / 2 < last_end:
+                continue
+
+            self.text += segment["text"].strip().encode("utf-8")
+            cols["start"].append(start)
+            cols["end"].append(end)
+            cols["text_offset"].append(len(self.text))
+            cols["language"].append(language_id)
+            cols["confidence"].append(to_byte(math.exp(segment.get("avg_logprob", 0.0))))
+
+            for word in segment.get("words", []):
+                self.word_text += word["word"].encode("utf-8")
+                cols["word_start"].append(offset + word["start"])
+                cols["word_end"].append(offset + word["end"])
+                cols["word_text_offset"].append(len(self.word_text))
+                cols["word_probability"].append(to_byte(word.get("probability", 1.0)))
+            cols["word_offset"].append(len(cols["word_start"]))
+            added += 1
+
+        return added
+
+    def close(self) -> Path:
+        """Scrive il file (temporaneo + os.replace) e ne restituisce il percorso"""
+        blobs = {"text": bytes(self.text), "word_text": bytes(self.word_text)}
+        sections = [(name, column.tobytes()) for name, column in self.columns.items()]
+        sections += list(blobs.items())
+
+        layout = {}
+        position = 0
+        for name, data in sections:
+            layout[name] = [position, len(data)]
+            position += len(data) + (-len(data)) % 8
+
+        meta = json.dumps({
+            "version": VERSION,
+            "segments": len(self),
+            "words": len(self.columns["word_start"]),
+            "languages": self.languages,
+            "source": self.source,
+            "created_at": datetime.now().isoformat(timespec="seconds"),
+            "columns": {name: code for name, code in {**SEGMENT_COLUMNS, **WORD_COLUMNS}.items()},
+            "layout": layout,
+        }).encode("utf-8")
+        header = MAGIC + struct.pack("<I", len(meta)) + meta
+        header += b"\0" * ((-len(header)) % 8)
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_name(f".{self.path.name}.tmp")
+        with open(tmp_path, "wb") as f:
+            f.write(header)
+            for name, data in sections:
+                f.write(data)
+                f.write(b"\0" * ((-len(data)) % 8))
+        os.replace(tmp_path, self.path)
+        return self.path
+
+
+class SegmentStore:
+    """
+    Lettura in memory-map di trascrizione.segs
+
+    Esempio:
+        store = SegmentStore()
+        for segment in store.range(3600, 3660):
+            print(segment["start"], segment["text"])
+    """
+
+    def __init__(self, path: Path = STORE_FILE):
+        self.path = Path(path)
+        with open(self.path, "rb") as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        if self._mmap[:len(MAGIC)] != MAGIC:
+            raise ValueError(f"{self.path} non è un archivio di segmenti")
+        (meta_len,) = struct.unpack_from("<I", self._mmap, len(MAGIC))
+        meta_start = len(MAGIC) + 4
+        self.meta = json.loads(self._mmap[meta_start:meta_start + meta_len])
+        base = meta_start + meta_len + (-(meta_start + meta_len)) % 8
+
+        view = memoryview(self._mmap)
+        self._columns = {}
+        for name, (position, size) in self.meta["layout"].items():
+            data = view[base + position:base + position + size]
+            code = self.meta["columns"].get(name)
+            self._columns[name] = data.cast(code) if code else data
+
+        self.languages = self.meta["languages"]
+        self.starts = self._columns["start"]
+        self.ends = self._columns["end"]
+
+    def __len__(self) -> int:
+        return self.meta["segments"]
+
+    def segment(self, i: int, words: bool = False) -> dict:
+        """
+        Segmento i-esimo
+
+        Args:
+            i: Indice del segmento
+            words: Include le parole con i loro tempi
+
+        Returns:
+            Dict {start, end, text, language, confidence[, words]}
+        """
+        cols = self._columns
+        text = bytes(cols["text"][cols["text_offset"][i]:cols["text_offset"][i + 1]]).decode("utf-8")
+        segment = {
+            "start": self.starts[i],
+            "end": self.ends[i],
+            "text": text,
+            "language": self.languages[cols["language"][i]],
+            "confidence": cols["confidence"][i] / 255,
+        }
+        if words:
+            segment["words"] = [self.word(w) for w in range(cols["word_offset"][i], cols["word_offset"][i + 1])]
+        return segment
+
+    def word(self, w: int) -> dict:
+        """Parola w-esima: {word, start, end, probability}"""
+        cols = self._columns
+        offsets = cols["word_text_offset"]
+        return {
+            "word": bytes(cols["word_text"][offsets[w]:offsets[w + 1]]).decode("utf-8"),
+            "start": cols["word_start"][w],
+            "end": cols["word_end"][w],
+            "probability": cols["word_probability"][w] / 255,
+        }
+
+    def range(self, start: float, end: float, words: bool = False):
+        """
+        Segmenti che si sovrappongono a [start, end) (ricerca binaria sugli inizi)
+
+        Yields:
+            Segmenti in ordine di tempo
+        """
+        i = bisect_left(self.starts, start - MAX_SEGMENT_SECONDS)
+        while i < len(self) and self.starts[i] < end:
+            if self.ends[i] > start:
+                yield self.segment(i, words)
+            i += 1
+
+    def at(self, t: float) -> dict | None:
+        """Segmento in corso all'istante t (o None se in quel momento non si parla)"""
+        return next(self.range(t, t + 1e-6), None)
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self.segment(i)
+
+    def close(self) -> None:
+        for column in self._columns.values():
+            column.release()
+        self.starts = self.ends = None
+        self._mmap.close()
+
+
+# =============================================================================
+# EXPORT
+# =============================================================================
+
+def format_time(seconds: float, separator: str = ",") -> str:
+    """Secondi → HH:MM:SS,mmm (SRT) o HH:MM:SS.mmm (VTT)"""
+    millis = round(seconds * 1000)
+    h, rest = divmod(millis, 3_600_000)
+    m, rest = divmod(rest, 60_000)
+    s, ms = divmod(rest, 1000)
+    return f"{h:02}:{m:02}:{s:02}{separator}{ms:03}"
+
+
+def parse_time(value: str) -> float:
+    """ "1:23:40", "23:40", "5000.5" → secondi"""
+    seconds = 0.0
+    for part in value.split(":"):
+        seconds = seconds * 60 + float(part)
+    return seconds
+
+
+def export(store: SegmentStore, fmt: str, out) -> int:
+    """
+    Scrive i segmenti in SRT, VTT o TXT, un segmento alla volta
+
+    Args:
+        store: Archivio aperto
+        fmt: "srt", "vtt" o "txt"
+        out: File di testo aperto in scrittura
+
+    Returns:
+        Segmenti scritti
+    """
+    if fmt == "vtt":
+        out.write("WEBVTT\n\n")
+
+    count = 0
+    for count, segment in enumerate(store, 1):
+        if fmt == "srt":
+            out.write(f"{count}\n{format_time(segment['start'])} --> {format_time(segment['end'])}\n"
+                      f"{segment['text']}\n\n")
+        elif fmt == "vtt":
+            out.write(f"{format_time(segment['start'], '.')} --> {format_time(segment['end'], '.')}\n"
+                      f"{segment['text']}\n\n")
+        else:
+            out.write(f"[{format_time(segment['start'], '.')[:8]}] {segment['text']}\n")
+    return count
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Archivio segmenti con timestamp")
+    parser.add_argument("--store", type=Path, default=STORE_FILE)
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    commands.add_parser("info", help="Riepilogo dell'archivio")
+
+    cmd = commands.add_parser("at", help="Cosa si dice a un certo istante")
+    cmd.add_argument("time", help='"1:23:40" o secondi')
+
+    cmd = commands.add_parser("range", help="Segmenti in un intervallo")
+    cmd.add_argument("start")
+    cmd.add_argument("end")
+    cmd.add_argument("--words", action="store_true", help="Mostra anche le parole")
+
+    cmd = commands.add_parser("export", help="Esporta in SRT/VTT/TXT")
+    cmd.add_argument("format", choices=["srt", "vtt", "txt"])
+    cmd.add_argument("-o", "--output", type=Path, help="File di uscita (default: stdout)")
+
+    args = parser.parse_args()
+
+    if not args.store.exists():
+        print(f"❌ Archivio non trovato: {args.store}")
+        print("💡 Esegui prima: python 3_transcription.py")
+        sys.exit(1)
+
+    store = SegmentStore(args.store)
+
+    if args.command == "info":
+        duration = store.ends[len(store) - 1] if len(store) else 0.0
+        print(f"📦 {args.store} ({args.store.stat().st_size / 1024:.0f} KB)")
+        print(f"🎬 Sorgente: {store.meta['source'] or '-'}")
+        print(f"🧩 Segmenti: {len(store):,} | Parole: {store.meta['words']:,}")
+        print(f"⏱️  Durata: {format_time(duration, '.')}")
+        print(f"🌍 Lingue: {', '.join(store.languages)}")
+
+    elif args.command == "at":
+        segment = store.at(parse_time(args.time))
+        if segment is None:
+            print(f"🔇 Nessun parlato a {args.time}")
+        else:
+            print(f"[{format_time(segment['start'], '.')} → {format_time(segment['end'], '.')}] "
+                  f"({segment['language']}) {segment['text']}")
+
+    elif args.command == "range":
+        for segment in store.range(parse_time(args.start), parse_time(args.end), args.words):
+            print(f"[{format_time(segment['start'], '.')} → {format_time(segment['end'], '.')}] "
+                  f"({segment['language']}) {segment['text']}")
+            for word in segment.get("words", []):
+                print(f"      {format_time(word['start'], '.')} {word['word'].strip()} "
+                      f"({word['probability']:.2f})")
+
+    else:
+        if args.output:
+            with open(args.output, "w", encoding="utf-8") as out:
+                count = export(store, args.format, out)
+            print(f"💾 {count} segmenti → {args.output}")
+        else:
+            export(store, args.format, sys.stdout)
+
+    store.close()
+
+
+if __name__ == "__main__":
+    main()
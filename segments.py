@@ -0,0 +1,191 @@
+"""
+Utility per segmenti Whisper
+
+Un segmento è il dict prodotto da model.transcribe in result["segments"]
+(start, end, text, avg_logprob, compression_ratio, no_speech_prob, ...).
+Queste funzioni servono a individuare i segmenti deboli, ri-decodificare solo
+i loro intervalli di tempo (clip_timestamps) e ricucire il risultato.
+"""
+
+import re
+import zlib
+from collections import Counter
+
+
+def is_low_confidence(segment: dict, thresholds: dict) -> bool:
+    """
+    Verifica se un segmento è fuori dalle soglie di confidenza
+
+    Args:
+        segment: Segmento Whisper
+        thresholds: Dict con avg_logprob (minimo), compression_ratio e no_speech_prob (massimi)
+
+    Returns:
+        True se almeno una metrica è fuori soglia
+    """
+    return (
+        segment.get("avg_logprob", 0.0) < thresholds["avg_logprob"]
+        or segment.get("compression_ratio", 0.0) > thresholds["compression_ratio"]
+        or segment.get("no_speech_prob", 0.0) > thresholds["no_speech_prob"]
+    )
+
+
+def text_compression_ratio(text: str) -> float:
+    """
+    Rapporto di compressione zlib del testo (stessa metrica di Whisper)
+
+    Un testo che ripete la stessa frase si comprime molto: rapporto alto.
+    Su testi brevi l'header zlib tiene il rapporto sotto 1.
+    """
+    data = text.encode("utf-8")
+    if not data:
+        return 0.0
+    return len(data) / len(zlib.compress(data))
+
+
+def max_ngram_repeats(text: str, n: int) -> int:
+    """
+    Occorrenze dell'n-gramma di parole più frequente nel testo
+
+    Args:
+        text: Testo di un segmento
+        n: Lunghezza dell'n-gramma in parole
+
+    Returns:
+        Numero di occorrenze (0 se il testo ha meno di n parole)
+    """
+    words = re.findall(r"\w+", text.lower())
+    ngrams = Counter(tuple(words[i:i + n]) for i in range(len(words) - n + 1))
+    return max(ngrams.values(), default=0)
+
+
+def find_repetition_loops(segments: list[dict], ngram: int, max_repeats: int,
+                          max_compression_ratio: float) -> list[dict]:
+    """
+    Segmenti in un loop di ripetizione (allucinazione tipica di Whisper)
+
+    Un segmento è in loop se:
+    - un n-gramma di parole compare almeno `max_repeats` volte nel suo testo
+    - il suo testo ha compression ratio sopra `max_compression_ratio`
+    - fa parte di una serie di almeno `max_repeats` segmenti consecutivi con lo stesso testo
+
+    Args:
+        segments: Segmenti Whisper (ordinati per start)
+        ngram: Lunghezza n-gramma in parole
+        max_repeats: Ripetizioni oltre le quali è un loop
+        max_compression_ratio: Compression ratio del testo oltre il quale è un loop
+
+    Returns:
+        Segmenti in loop, nell'ordine originale
+    """
+    looped = set()
+    for i, segment in enumerate(segments):
+        text = segment["text"]
+        if (max_ngram_repeats(text, ngram) >= max_repeats
+                or text_compression_ratio(text) > max_compression_ratio):
+            looped.add(i)
+
+    # Stesso testo in segmenti consecutivi (loop spezzato in tanti segmenti brevi)
+    run_start = 0
+    for i in range(1, len(segments) + 1):
+        same = i < len(segments) and _normalize(segments[i]["text"]) == _normalize(segments[run_start]["text"])
+        if not same:
+            if i - run_start >= max_repeats and _normalize(segments[run_start]["text"]):
+                looped.update(range(run_start, i))
+            run_start = i
+
+    return [segments[i] for i in sorted(looped)]
+
+
+def _normalize(text: str) -> str:
+    return " ".join(re.findall(r"\w+", text.lower()))
+
+
+def merge_ranges(ranges: list[tuple[float, float]], gap: float = 0.0) -> list[tuple[float, float]]:
+    """
+    Unisce intervalli sovrapposti o distanti meno di `gap` secondi
+
+    Args:
+        ranges: Lista di (start, end) in secondi, in qualsiasi ordine
+        gap: Distanza massima per unire due intervalli
+
+    Returns:
+        Intervalli ordinati e disgiunti
+    """
+    merged = []
+    for start, end in sorted(ranges):
+        if merged and start <= merged[-1][1] + gap:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+        else:
+            merged.append((start, end))
+    return merged
+
+
+def pad_range(start: float, end: float, window: float, limit: float) -> tuple[float, float]:
+    """
+    Allarga un intervallo a una finestra di almeno `window` secondi, centrata
+
+    Args:
+        start: Inizio intervallo (secondi)
+        end: Fine intervallo (secondi)
+        window: Durata minima della finestra
+        limit: Durata dell'audio (la finestra non esce da [0, limit])
+
+    Returns:
+        Intervallo (start, end) allargato
+    """
+    missing = window - (end - start)
+    if missing > 0:
+        start -= missing / 2
+        end += missing / 2
+        # Se sborda da un lato, recupera dall'altro
+        if start < 0:
+            end -= start
+            start = 0.0
+        if end > limit:
+            start -= end - limit
+            end = limit
+    return max(start, 0.0), min(end, limit)
+
+
+def to_clip_timestamps(ranges: list[tuple[float, float]]) -> list[float]:
+    """Intervalli → formato clip_timestamps di model.transcribe ([s1, e1, s2, e2, ...])"""
+    return [round(t, 2) for start, end in ranges for t in (start, end)]
+
+
+def total_duration(ranges: list[tuple[float, float]]) -> float:
+    """Durata complessiva di intervalli disgiunti (secondi)"""
+    return sum(end - start for start, end in ranges)
+
+
+def splice_segments(base: list[dict], replacement: list[dict], ranges: list[tuple[float, float]]) -> list[dict]:
+    """
+    Sostituisce i segmenti di `base` che cadono negli intervalli con quelli di `replacement`
+
+    Un segmento base viene scartato se il suo punto medio cade in un intervallo:
+    i segmenti ri-decodificati coprono esattamente quegli intervalli.
+
+    Args:
+        base: Segmenti della prima passata
+        replacement: Segmenti ri-decodificati (solo dentro gli intervalli)
+        ranges: Intervalli ri-decodificati (ordinati, disgiunti)
+
+    Returns:
+        Segmenti ricuciti, ordinati per start
+    """
+    def inside(segment: dict) -> bool:
+        mid = (segment["start"] + segment["end"]) / 2
+        return any(start <= mid <= end for start, end in ranges)
+
+    kept = [s for s in base if not inside(s)]
+    spliced = kept + list(replacement)
+    spliced.sort(key=lambda s: s["start"])
+
+    for i, segment in enumerate(spliced):
+        segment["id"] = i
+    return spliced
+
+
+def segments_to_text(segments: list[dict]) -> str:
+    """Testo completo dai segmenti (come result["text"] di Whisper)"""
+    return "".join(s["text"] for s in segments).strip()
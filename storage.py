@@ -0,0 +1,345 @@
+"""
+Storage intermedio: formato audio, staging, budget disco, pulizia e I/O per step
+
+- Audio estratto dai chunk in AUDIO_FORMAT: "wav" (PCM) o "flac" (lossless,
+  circa metà dei byte scritti e riletti, stesso audio per Whisper)
+- STAGING_DIR: l'audio (ricalcolabile dai chunk) va in un'area a parte, ad
+  esempio su tmpfs (/dev/shm), invece che accanto ai chunk
+- DISK_BUDGET_MB: prima di ogni scrittura si verifica lo spazio occupato da
+  CHUNKS_DIR e STAGING_DIR; oltre il budget si liberano audio e feature dei
+  chunk già trascritti, poi si interrompe con un errore
+- DELETE_COMMITTED_CHUNKS: audio e feature di un chunk sono eliminati appena la
+  sua trascrizione è salvata, il video solo quando lo step è finito con successo
+  (release_committed)
+- I/O per step: byte letti e scritti a livello di storage (processo + figli
+  come ffmpeg) salvati in IO_REPORT_FILE
+
+3_transcription.py non riprende un'esecuzione interrotta: riparte dal primo chunk
+e riscrive trascrizione_raw.txt. Durante lo step si eliminano quindi solo file
+ricalcolabili dal video; i video spariscono solo a trascrizione completa.
+distributed.py salva un risultato per chunk e può eliminarli subito.
+I motori batched e worker estraggono l'audio di tutti i chunk prima di
+trascriverli: lì il budget si verifica una volta sola, per l'intero lavoro.
+
+Uso:
+    python storage.py          # Spazio occupato, budget e I/O per step
+    python storage.py clean    # Elimina l'audio estratto (ricalcolabile dai chunk)
+"""
+
+import argparse
+import json
+import os
+import resource
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+
+from config import (
+    AUDIO_FORMAT,
+    CHUNKS_DIR,
+    DELETE_COMMITTED_CHUNKS,
+    DISK_BUDGET_MB,
+    FEATURES_DIR,
+    IO_REPORT_FILE,
+    STAGING_DIR,
+)
+from utils import print_header, print_section
+
+MB = 1024 * 1024
+
+# Argomenti ffmpeg per formato audio
+AUDIO_CODECS = {
+    "wav": ["-c:a", "pcm_s16le", "-f", "wav"],
+    "flac": ["-c:a", "flac", "-f", "flac"],
+}
+
+# Byte al secondo per stimare lo spazio prima di scrivere (mono 16kHz 16 bit; FLAC ~50%)
+AUDIO_BYTES_PER_SECOND = {"wav": 32000, "flac": 16000}
+
+AUDIO_SUFFIXES = {f".{fmt}" for fmt in AUDIO_CODECS}
+
+# Stato del processo: chunk trascritti (video da eliminare a fine step), chunk con
+# audio/feature ancora liberabili, spazio liberato
+_committed: list[Path] = []
+_reclaimable: list[Path] = []
+released = {"chunks": 0, "bytes": 0}
+
+
+def audio_dir(video_path: Path) -> Path:
+    """Cartella dell'audio estratto: STAGING_DIR se configurata, altrimenti quella del chunk"""
+    return Path(STAGING_DIR) if STAGING_DIR else video_path.parent
+
+
+def audio_path(video_path: Path) -> Path:
+    """Percorso dell'audio estratto da un chunk (estensione da AUDIO_FORMAT)"""
+    return audio_dir(video_path) / f"{video_path.stem}.{AUDIO_FORMAT}"
+
+
+def audio_codec_args() -> list[str]:
+    """
+    Argomenti ffmpeg di output per AUDIO_FORMAT
+
+    Raises:
+        ValueError: Se AUDIO_FORMAT non è supportato
+    """
+    if AUDIO_FORMAT not in AUDIO_CODECS:
+        raise ValueError(f"AUDIO_FORMAT non supportato: {AUDIO_FORMAT} (usa {', '.join(AUDIO_CODECS)})")
+    return AUDIO_CODECS[AUDIO_FORMAT]
+
+
+def estimate_audio_bytes(seconds: float) -> int:
+    """Spazio stimato per `seconds` di audio estratto"""
+    return int(seconds * AUDIO_BYTES_PER_SECOND.get(AUDIO_FORMAT, 32000))
+
+
+def storage_dirs() -> list[Path]:
+    """Cartelle che contano per il budget"""
+    dirs = [CHUNKS_DIR]
+    if STAGING_DIR:
+        dirs.append(Path(STAGING_DIR))
+    return dirs
+
+
+def disk_usage() -> int:
+    """Byte occupati da CHUNKS_DIR e STAGING_DIR"""
+    return sum(
+        path.stat().st_size
+        for folder in storage_dirs() if folder.exists()
+        for path in folder.rglob("*") if path.is_file()
+    )
+
+
+def chunk_files(chunk: Path) -> list[Path]:
+    """
+    File di un chunk su disco: video, audio estratto (anche ritagli per lingua) e feature
+
+    Returns:
+        Percorsi esistenti
+    """
+    from features import audio_hash
+
+    audio = sorted(
+        path for path in audio_dir(chunk).glob(f"{chunk.stem}*")
+        if path.suffix in AUDIO_SUFFIXES
+    )
+    features = [
+        feature
+        for path in audio
+        for feature in FEATURES_DIR.glob(f"{audio_hash(path)}_*.npy")
+    ]
+    return [path for path in [chunk, *audio, *features] if path.exists()]
+
+
+def release(paths: list[Path]) -> int:
+    """Elimina i file e restituisce i byte liberati"""
+    freed = 0
+    for path in paths:
+        try:
+            size = path.stat().st_size
+            path.unlink()
+            freed += size
+        except FileNotFoundError:
+            pass
+    return freed
+
+
+def release_chunk(chunk: Path, keep_video: bool = False) -> int:
+    """
+    Elimina i file di un chunk e aggiorna il conteggio
+
+    Args:
+        chunk: Video del chunk
+        keep_video: Elimina solo audio e feature (ricalcolabili dal video)
+    """
+    paths = chunk_files(chunk)
+    if keep_video:
+        paths = [path for path in paths if path != chunk]
+    freed = release(paths)
+    if not keep_video:
+        released["chunks"] += 1
+    released["bytes"] += freed
+    return freed
+
+
+def commit_chunk(chunk: Path, resumable: bool = False) -> None:
+    """
+    Segna un chunk come trascritto (trascrizione salvata su disco)
+
+    Con DELETE_COMMITTED_CHUNKS audio e feature sono eliminati subito e il video
+    a fine step (release_committed), altrimenti audio e feature diventano i primi
+    a essere liberati se si supera DISK_BUDGET_MB.
+
+    Args:
+        chunk: Video del chunk
+        resumable: Il risultato del chunk è salvato a parte e un'esecuzione
+            interrotta lo ritrova (distributed.py): anche il video si elimina subito
+    """
+    if DELETE_COMMITTED_CHUNKS and resumable:
+        release_chunk(chunk)
+        return
+    if DELETE_COMMITTED_CHUNKS:
+        release_chunk(chunk, keep_video=True)
+    else:
+        _reclaimable.append(chunk)
+    _committed.append(chunk)
+
+
+def release_committed() -> None:
+    """
+    Step completato: con DELETE_COMMITTED_CHUNKS elimina anche i video dei chunk trascritti
+
+    Da chiamare solo dopo aver salvato tutti gli output dello step: prima un
+    errore costringerebbe a ritrascrivere chunk ormai eliminati.
+    """
+    if DELETE_COMMITTED_CHUNKS:
+        while _committed:
+            release_chunk(_committed.pop(0))
+
+
+def ensure_budget(needed: int) -> None:
+    """
+    Verifica che `needed` byte in più stiano in DISK_BUDGET_MB
+
+    Se serve libera audio e feature dei chunk già trascritti, dal più vecchio
+    (i video restano fino a fine step: servono se lo step va rieseguito).
+
+    Raises:
+        RuntimeError: Se anche dopo la pulizia lo spazio non basta
+    """
+    if DISK_BUDGET_MB is None:
+        return
+
+    budget = DISK_BUDGET_MB * MB
+    usage = disk_usage()
+    while usage + needed > budget and _reclaimable:
+        usage -= release_chunk(_reclaimable.pop(0), keep_video=True)
+
+    if usage + needed > budget:
+        raise RuntimeError(
+            f"Budget disco superato: {usage / MB:.0f} MB occupati + {needed / MB:.0f} MB "
+            f"necessari > DISK_BUDGET_MB = {DISK_BUDGET_MB} MB"
+        )
+
+
+def io_counters() -> dict:
+    """
+    Byte letti/scritti a livello di storage dal processo e dai figli terminati (ffmpeg, worker)
+
+    Letture servite dalla page cache e scritture su tmpfs non contano: è l'I/O che
+    arriva davvero al disco.
+    """
+    counters = {"read_bytes": 0, "write_bytes": 0}
+    try:
+        with open("/proc/self/io", encoding="utf-8") as f:
+            for line in f:
+                key, _, value = line.partition(":")
+                if key in counters:
+                    counters[key] = int(value)
+    except OSError:
+        pass  # /proc non disponibile (non Linux): solo i figli
+
+    children = resource.getrusage(resource.RUSAGE_CHILDREN)
+    counters["read_bytes"] += children.ru_inblock * 512
+    counters["write_bytes"] += children.ru_oublock * 512
+    return counters
+
+
+def load_io_report() -> dict:
+    """I/O per step dell'ultima esecuzione di ciascuno step"""
+    if not IO_REPORT_FILE.exists():
+        return {}
+    return json.loads(IO_REPORT_FILE.read_text(encoding="utf-8"))
+
+
+@contextmanager
+def stage_io(stage: str):
+    """
+    Misura l'I/O di uno step e lo salva in IO_REPORT_FILE (anche se lo step termina con errore)
+
+    Il report è scritto solo se la cartella dei chunk esiste già: gli step che
+    leggono soltanto non la creano.
+
+    Args:
+        stage: Nome dello step (chiave nel report)
+    """
+    before = io_counters()
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        after = io_counters()
+        report = load_io_report()
+        report[stage] = {
+            "read_bytes": after["read_bytes"] - before["read_bytes"],
+            "write_bytes": after["write_bytes"] - before["write_bytes"],
+            "seconds": time.perf_counter() - t0,
+            "released_bytes": released["bytes"],
+            "finished_at": datetime.now().isoformat(timespec="seconds"),
+        }
+        if IO_REPORT_FILE.parent.exists():
+            tmp_path = IO_REPORT_FILE.with_suffix(".tmp")
+            tmp_path.write_text(json.dumps(report, indent=2), encoding="utf-8")
+            os.replace(tmp_path, IO_REPORT_FILE)
+
+
+def main():
+    """Entry point"""
+    parser = argparse.ArgumentParser(description="Storage intermedio: spazio occupato e I/O per step")
+    parser.add_argument("command", nargs="?", choices=["report", "clean"], default="report")
+    args = parser.parse_args()
+
+    if args.command == "clean":
+        audio = [
+            path
+            for folder in storage_dirs() if folder.exists()
+            for path in folder.rglob("*") if path.suffix in AUDIO_SUFFIXES
+        ]
+        freed = release(audio)
+        print(f"🧹 Audio estratto eliminato: {len(audio)} file ({freed / MB:.1f} MB)")
+        return
+
+    print_header("STORAGE INTERMEDIO")
+
+    groups = {"chunk video": 0, "audio": 0, "feature": 0, "altro": 0}
+    for folder in storage_dirs():
+        if not folder.exists():
+            continue
+        for path in folder.rglob("*"):
+            if not path.is_file():
+                continue
+            if path.suffix == ".mp4":
+                group = "chunk video"
+            elif path.suffix in AUDIO_SUFFIXES:
+                group = "audio"
+            elif path.suffix == ".npy":
+                group = "feature"
+            else:
+                group = "altro"
+            groups[group] += path.stat().st_size
+
+    total = sum(groups.values())
+    print(f"📂 Cartelle: {', '.join(str(d) for d in storage_dirs())}")
+    for group, size in groups.items():
+        print(f"   • {group:<12} {size / MB:>10.1f} MB")
+    print(f"   {'totale':<14} {total / MB:>10.1f} MB")
+    if DISK_BUDGET_MB is not None:
+        print(f"💾 Budget: {DISK_BUDGET_MB} MB ({total / (DISK_BUDGET_MB * MB) * 100:.0f}% usato)")
+    print(f"🎵 Formato audio: {AUDIO_FORMAT}" + (f" | staging: {STAGING_DIR}" if STAGING_DIR else ""))
+
+    report = load_io_report()
+    if not report:
+        return
+
+    print_section("I/O PER STEP (ultima esecuzione)")
+    print(f"{'Step':<22} {'Letti':>10} {'Scritti':>10} {'Liberati':>10} {'Durata':>8}")
+    print("─" * 64)
+    for stage, io in report.items():
+        print(
+            f"{stage:<22} {io['read_bytes'] / MB:>7.1f} MB {io['write_bytes'] / MB:>7.1f} MB "
+            f"{io.get('released_bytes', 0) / MB:>7.1f} MB {io['seconds']:>7.1f}s"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,329 @@
+"""
+Trascrizione in streaming di registrazioni in corso
+
+Legge PCM 16kHz da ffmpeg man mano che arriva (file ancora in scrittura oppure
+stdin) e trascrive una finestra scorrevole con lo stesso modello, beam e prompt
+di 3_transcription.py. Il testo è diviso in due parti:
+- confermato: parole su cui due decodifiche consecutive concordano
+  (LocalAgreement) → aggiunte subito a STREAM_OUTPUT, non cambiano più
+- provvisorio: la coda dell'ultima ipotesi, ri-decodificata al passo successivo
+
+Latenza limitata: una parola finita da più di STREAM_MAX_LATENCY_SECONDS viene
+confermata anche senza accordo. L'audio prima dell'ultima parola confermata esce
+dalla finestra, che resta sotto i 30s nativi di Whisper.
+
+Una finestra senza parlato non viene decodificata, ma resta nel buffer finché
+una decodifica non la vede: la VAD usa il rumore di fondo degli ultimi
+NOISE_HISTORY_SECONDS (non dei soli 2s nuovi, tutti parlato in un discorso
+continuo) e una finestra piena è decodificata comunque.
+
+Il file in crescita deve essere leggibile mentre viene scritto (wav, mp3, mkv,
+ts, mp4 frammentato): un mp4 classico ha l'indice in fondo. Un file fermo da
+STREAM_IDLE_TIMEOUT_SECONDS è considerato concluso.
+
+Uso:
+    python stream_transcription.py registrazione.mkv        # File in scrittura
+    ffmpeg -f pulse -i default -f wav - | python stream_transcription.py -
+    python stream_transcription.py live.ts --language en --model small
+"""
+
+from pathlib import Path
+from collections import deque
+import argparse
+import importlib
+import os
+import queue
+import re
+import subprocess
+import sys
+import threading
+import time
+from config import *
+from utils import print_header, print_section
+from vad import FRAME_SECONDS, SAMPLE_RATE, detect_speech, frame_energy_db
+
+BYTES_PER_SECOND = SAMPLE_RATE * 2  # PCM s16le mono
+
+# Parole confermate passate come contesto a Whisper (initial_prompt ha un limite di token)
+PROMPT_WORDS = 40
+
+# Audio su cui stimare il rumore di fondo della VAD (pause tra frasi incluse)
+NOISE_HISTORY_SECONDS = 60.0
+
+
+def open_pcm_stream(source: str) -> subprocess.Popen:
+    """
+    Avvia ffmpeg che decodifica la sorgente in PCM s16le mono 16kHz su stdout
+
+    Args:
+        source: Percorso di un file (anche ancora in scrittura) o "-" per stdin
+
+    Returns:
+        Processo ffmpeg (stdout = PCM, stderr = errori)
+    """
+    if source == "-":
+        input_args = ["-i", "pipe:0"]
+    else:
+        # -follow: a fine file attende nuovi dati invece di terminare;
+        # -rw_timeout (µs): nessun dato nuovo per così tanto → fine dello stream
+        input_args = [
+            "-nostdin",
+            "-follow", "1",
+            "-rw_timeout", str(int(STREAM_IDLE_TIMEOUT_SECONDS * 1_000_000)),
+            "-i", f"file:{Path(source).resolve()}",
+        ]
+
+    cmd = [
+        "ffmpeg", "-loglevel", "error", *input_args,
+        "-vn", "-f", "s16le", "-ac", "1", "-acodec", "pcm_s16le", "-ar", str(SAMPLE_RATE), "-",
+    ]
+    return subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+
+
+def read_pcm(stream, blocks: queue.Queue) -> None:
+    """Thread lettore: blocchi PCM grezzi nella coda, None a fine stream"""
+    fd = stream.fileno()
+    while True:
+        block = os.read(fd, 1 << 16)
+        if not block:
+            break
+        blocks.put(block)
+    blocks.put(None)
+
+
+def normalize_word(word: str) -> str:
+    """Parola confrontabile tra due ipotesi (minuscole, senza punteggiatura)"""
+    return re.sub(r"[^\w]", "", word.lower())
+
+
+def common_prefix(previous: list[dict], current: list[dict]) -> int:
+    """Numero di parole iniziali uguali tra due ipotesi"""
+    n = 0
+    for a, b in zip(previous, current):
+        if normalize_word(a["word"]) != normalize_word(b["word"]):
+            break
+        n += 1
+    return n
+
+
+def drop_repeated_prefix(committed: list[dict], words: list[dict], max_ngram: int = 5) -> list[dict]:
+    """
+    Toglie dall'inizio dell'ipotesi le parole già confermate
+
+    Il taglio del buffer cade sulla fine dell'ultima parola confermata, ma i tempi
+    per parola di Whisper sono approssimativi: la nuova ipotesi può ripeterne la coda.
+    """
+    for n in range(min(max_ngram, len(committed), len(words)), 0, -1):
+        tail = [normalize_word(w["word"]) for w in committed[-n:]]
+        head = [normalize_word(w["word"]) for w in words[:n]]
+        if tail == head:
+            return words[n:]
+    return words
+
+
+class StreamingTranscriber:
+    """
+    Finestra scorrevole con conferma LocalAgreement e latenza limitata
+
+    Uso: insert() con l'audio nuovo, poi process() restituisce le parole appena
+    confermate (con tempi assoluti dall'inizio dello stream).
+    """
+
+    def __init__(self, model, options: dict):
+        import numpy as np
+
+        self.model = model
+        self.options = {**options, "word_timestamps": True}
+        self.base_prompt = options.get("initial_prompt") or ""
+        self.buffer = np.zeros(0, dtype=np.float32)
+        self.buffer_start = 0.0  # Tempo assoluto del primo campione nel buffer
+        self.committed = []      # Parole confermate: {word, start, end}
+        self.tentative = []      # Coda non confermata dell'ultima ipotesi
+        self.latencies = []      # Audio ricevuto dopo la fine della parola, al momento della conferma
+        self.energy_db = deque(maxlen=int(NOISE_HISTORY_SECONDS / FRAME_SECONDS))  # Frame recenti (VAD)
+        self.decodes = 0
+        self.decode_seconds = 0.0
+
+    @property
+    def received(self) -> float:
+        """Secondi di audio ricevuti dall'inizio dello stream"""
+        return self.buffer_start + len(self.buffer) / SAMPLE_RATE
+
+    def insert(self, samples) -> None:
+        """Aggiunge audio float32 16kHz in coda alla finestra"""
+        import numpy as np
+
+        self.buffer = np.concatenate((self.buffer, samples))
+        self.energy_db.extend(frame_energy_db(samples))
+
+    def noise_floor(self) -> float | None:
+        """Rumore di fondo: 10° percentile dei frame degli ultimi NOISE_HISTORY_SECONDS"""
+        import numpy as np
+
+        return float(np.percentile(self.energy_db, 10)) if self.energy_db else None
+
+    def prompt(self) -> str:
+        """Prompt iniziale configurato + coda del testo confermato (continuità tra finestre)"""
+        context = "".join(w["word"] for w in self.committed[-PROMPT_WORDS:]).strip()
+        return f"{self.base_prompt} {context}".strip()
+
+    def process(self, final: bool = False) -> list[dict]:
+        """
+        Decodifica la finestra e conferma le parole stabili
+
+        Args:
+            final: Fine dello stream → conferma anche la parte provvisoria
+
+        Returns:
+            Parole appena confermate
+        """
+        if len(self.buffer) == 0:
+            return []
+
+        # Finestra senza parlato: niente decodifica (e niente allucinazioni sul silenzio).
+        # L'audio resta nel buffer: se la VAD sbaglia non va perso, a finestra piena è decodificato
+        window_full = len(self.buffer) >= STREAM_WINDOW_SECONDS * SAMPLE_RATE
+        if not self.tentative and not window_full and not detect_speech(self.buffer, self.noise_floor()):
+            return []
+
+        t0 = time.perf_counter()
+        result = self.model.transcribe(self.buffer, **{**self.options, "initial_prompt": self.prompt()})
+        self.decode_seconds += time.perf_counter() - t0
+        self.decodes += 1
+
+        words = [
+            {"word": w["word"], "start": self.buffer_start + w["start"], "end": self.buffer_start + w["end"]}
+            for segment in result["segments"]
+            for w in segment.get("words", [])
+        ]
+        words = drop_repeated_prefix(self.committed, words)
+
+        if final:
+            agreed = len(words)
+        else:
+            agreed = common_prefix(self.tentative, words)
+            # Limite di latenza: parole finite da troppo tempo confermate anche senza accordo
+            deadline = self.received - STREAM_MAX_LATENCY_SECONDS
+            while agreed < len(words) and words[agreed]["end"] <= deadline:
+                agreed += 1
+
+        confirmed, self.tentative = words[:agreed], words[agreed:]
+        for word in confirmed:
+            self.latencies.append(max(self.received - word["end"], 0.0))
+        self.committed.extend(confirmed)
+
+        if confirmed:
+            self._trim(confirmed[-1]["end"])
+        elif len(self.buffer) >= STREAM_WINDOW_SECONDS * SAMPLE_RATE:
+            # Nessuna parola confermabile (es. rumore): la finestra non supera i 30s di Whisper
+            self._trim(self.received - STREAM_WINDOW_SECONDS)
+            self.tentative = [w for w in self.tentative if w["start"] >= self.buffer_start]
+        return confirmed
+
+    def _trim(self, t: float) -> None:
+        """Scarta l'audio prima del tempo assoluto t"""
+        cut = int((t - self.buffer_start) * SAMPLE_RATE)
+        if cut > 0:
+            self.buffer = self.buffer[cut:]
+            self.buffer_start += cut / SAMPLE_RATE
+
+
+def format_clock(seconds: float) -> str:
+    """Secondi → H:MM:SS"""
+    seconds = int(seconds)
+    return f"{seconds // 3600}:{seconds % 3600 // 60:02}:{seconds % 60:02}"
+
+
+def main():
+    """Entry point"""
+    import numpy as np
+
+    parser = argparse.ArgumentParser(description="Trascrizione in streaming (file in crescita o stdin)")
+    parser.add_argument("source", help='File in scrittura oppure "-" per leggere da stdin')
+    parser.add_argument("--language", default=FIXED_LANGUAGE, help="Codice lingua (default FIXED_LANGUAGE)")
+    parser.add_argument("--model", default=WHISPER_MODEL, choices=list(MODEL_CONFIGS))
+    parser.add_argument("--output", type=Path, default=STREAM_OUTPUT)
+    args = parser.parse_args()
+
+    if args.source != "-" and not Path(args.source).exists():
+        print(f"❌ File non trovato: {args.source}")
+        sys.exit(1)
+
+    print_header("TRASCRIZIONE IN STREAMING")
+    print(f"📡 Sorgente: {'stdin' if args.source == '-' else args.source}")
+    print(f"🌍 Lingua: {args.language.upper()} | 🤖 Modello: {args.model}")
+    print(f"⏱️  Passo {STREAM_STEP_SECONDS:.1f}s | latenza massima {STREAM_MAX_LATENCY_SECONDS:.0f}s\n")
+
+    transcription = importlib.import_module("3_transcription")
+    model, device, _ = transcription.open_model(args.model)
+    options = transcription.whisper_options(args.language, device, MODEL_CONFIGS[args.model])
+    stream = StreamingTranscriber(model, options)
+
+    args.output.parent.mkdir(parents=True, exist_ok=True)
+    output = open(args.output, "w", encoding="utf-8")
+
+    proc = open_pcm_stream(args.source)
+    blocks = queue.Queue()
+    threading.Thread(target=read_pcm, args=(proc.stdout, blocks), daemon=True).start()
+
+    step_bytes = int(STREAM_STEP_SECONDS * BYTES_PER_SECOND)
+    pending = bytearray()
+    eof = False
+
+    def emit(words: list[dict]) -> None:
+        # Testo confermato: su file subito (append) e a schermo
+        if words:
+            text = "".join(w["word"] for w in words)
+            output.write(text)
+            output.flush()
+            print(text, end="", flush=True)
+
+    print(f"▶️  In ascolto (Ctrl+C per terminare) → {args.output}\n")
+    try:
+        while not eof:
+            # Almeno STREAM_STEP_SECONDS di audio nuovo, più tutto quello arrivato durante la decodifica
+            while len(pending) < step_bytes:
+                block = blocks.get()
+                if block is None:
+                    eof = True
+                    break
+                pending += block
+            while not eof and not blocks.empty():
+                block = blocks.get_nowait()
+                if block is None:
+                    eof = True
+                else:
+                    pending += block
+
+            usable = len(pending) - len(pending) % 2
+            stream.insert(np.frombuffer(bytes(pending[:usable]), np.int16).astype(np.float32) / 32768.0)
+            del pending[:usable]
+            emit(stream.process(final=eof))
+    except KeyboardInterrupt:
+        emit(stream.process(final=True))
+    finally:
+        proc.terminate()
+        proc.wait()
+        output.close()
+
+    errors = proc.stderr.read().decode(errors="ignore").strip()
+    if errors and not stream.committed:
+        print(f"\n❌ Errore ffmpeg: {errors[-500:]}")
+        sys.exit(1)
+
+    print()
+    print_section("STATISTICHE")
+    audio_seconds = stream.received
+    print(f"🎧 Audio ricevuto: {format_clock(audio_seconds)}")
+    print(f"📝 Parole confermate: {len(stream.committed):,}")
+    if stream.latencies:
+        mean_latency = sum(stream.latencies) / len(stream.latencies)
+        print(f"⏱️  Latenza conferma: media {mean_latency:.1f}s | max {max(stream.latencies):.1f}s")
+    if audio_seconds > 0:
+        print(f"⚡ Decodifiche: {stream.decodes} (RTF {stream.decode_seconds / audio_seconds:.2f})")
+    print(f"💾 File: {args.output}\n")
+    print("✅ Streaming terminato")
+
+
+if __name__ == "__main__":
+    main()
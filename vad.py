@@ -0,0 +1,163 @@
+"""
+VAD: individua i tratti di parlato e compatta l'audio prima di Whisper
+
+Rilevatore veloce a livello di frame (30ms) basato sull'energia, con soglia
+adattiva sul rumore di fondo del chunk. Solo le pause più lunghe di
+VAD_MIN_SILENCE_SECONDS vengono saltate: le pause tra frasi restano.
+Opzionale: con VAD_MODULATION_DB > 0 scarta anche i blocchi da 1s con energia
+troppo stazionaria (musica di sottofondo, ronzii), perché il parlato alterna
+sillabe e micro-pause e ha un'energia molto modulata.
+
+L'audio compattato (solo parlato, concatenato) va a Whisper; la OffsetMap
+riporta i timestamp dei segmenti sul tempo originale del chunk.
+"""
+
+import subprocess
+from bisect import bisect_right
+
+from config import (
+    VAD_MIN_SILENCE_SECONDS,
+    VAD_MODULATION_DB,
+    VAD_PADDING_SECONDS,
+    VAD_THRESHOLD_DB,
+)
+
+SAMPLE_RATE = 16000
+FRAME_SECONDS = 0.03
+
+# Soglia assoluta minima (dBFS): sotto è silenzio anche se il chunk è tutto silenzioso
+MIN_SPEECH_DB = -55.0
+
+
+def load_audio(path: str):
+    """
+    Decodifica audio in float32 mono 16kHz con ffmpeg (come whisper.load_audio, senza torch)
+
+    Raises:
+        RuntimeError: Se ffmpeg fallisce
+    """
+    import numpy as np
+
+    cmd = [
+        "ffmpeg", "-nostdin", "-threads", "0", "-i", str(path),
+        "-f", "s16le", "-ac", "1", "-acodec", "pcm_s16le", "-ar", str(SAMPLE_RATE), "-",
+    ]
+    try:
+        out = subprocess.run(cmd, capture_output=True, check=True).stdout
+    except subprocess.CalledProcessError as e:
+        raise RuntimeError(f"Errore decodifica audio {path}: {e.stderr.decode(errors='ignore')[-500:]}")
+    return np.frombuffer(out, np.int16).astype(np.float32) / 32768.0
+
+
+def frame_energy_db(audio):
+    """Energia (dBFS) di ogni frame intero da FRAME_SECONDS"""
+    import numpy as np
+
+    frame = int(FRAME_SECONDS * SAMPLE_RATE)
+    n_frames = len(audio) // frame
+    frames = audio[:n_frames * frame].reshape(n_frames, frame)
+    return 10 * np.log10(np.mean(frames ** 2, axis=1) + 1e-10)
+
+
+def detect_speech(audio, noise_floor: float | None = None) -> list[tuple[float, float]]:
+    """
+    Trova gli intervalli di parlato
+
+    Args:
+        audio: Array float32 mono 16kHz
+        noise_floor: Rumore di fondo (dBFS) stimato altrove, es. su un tratto più
+            lungo; None = 10° percentile dei frame di questo audio
+
+    Returns:
+        Intervalli (start, end) in secondi, ordinati e disgiunti, già con padding
+    """
+    import numpy as np
+
+    energy_db = frame_energy_db(audio)
+    n_frames = len(energy_db)
+    if n_frames == 0:
+        return []
+
+    # Soglia adattiva: rumore di fondo stimato dal 10° percentile dei frame
+    if noise_floor is None:
+        noise_floor = np.percentile(energy_db, 10)
+    speech = energy_db > max(noise_floor + VAD_THRESHOLD_DB, MIN_SPEECH_DB)
+
+    # Blocchi da 1s troppo stazionari → non parlato (musica, ronzii)
+    if VAD_MODULATION_DB > 0:
+        block = int(1.0 / FRAME_SECONDS)
+        for start in range(0, n_frames, block):
+            if np.std(energy_db[start:start + block]) < VAD_MODULATION_DB:
+                speech[start:start + block] = False
+
+    # Run di frame parlati → intervalli
+    edges = np.flatnonzero(np.diff(np.concatenate(([0], speech.astype(np.int8), [0]))))
+    runs = [(float(s * FRAME_SECONDS), float(e * FRAME_SECONDS)) for s, e in zip(edges[::2], edges[1::2])]
+
+    # Unisce run separati da pause brevi, poi aggiunge il padding
+    duration = len(audio) / SAMPLE_RATE
+    regions = []
+    for start, end in runs:
+        if regions and start - regions[-1][1] < VAD_MIN_SILENCE_SECONDS:
+            regions[-1] = (regions[-1][0], end)
+        else:
+            regions.append((start, end))
+
+    padded = []
+    for start, end in regions:
+        start = max(0.0, start - VAD_PADDING_SECONDS)
+        end = min(duration, end + VAD_PADDING_SECONDS)
+        if padded and start <= padded[-1][1]:
+            padded[-1] = (padded[-1][0], end)
+        else:
+            padded.append((start, end))
+    return padded
+
+
+class OffsetMap:
+    """
+    Mappa tempo compattato → tempo originale
+
+    Ogni voce: (inizio nel compattato, inizio nell'originale, durata).
+    """
+
+    def __init__(self, regions: list[tuple[float, float]]):
+        self.entries = []
+        compact_start = 0.0
+        for start, end in regions:
+            self.entries.append((compact_start, start, end - start))
+            compact_start += end - start
+        self._starts = [entry[0] for entry in self.entries]
+
+    def to_original(self, t: float) -> float:
+        """Converte un tempo dell'audio compattato nel tempo del chunk originale"""
+        if not self.entries:
+            return t
+        i = max(bisect_right(self._starts, t) - 1, 0)
+        compact_start, original_start, length = self.entries[i]
+        return original_start + min(max(t - compact_start, 0.0), length)
+
+
+def compact_audio(audio, regions: list[tuple[float, float]]):
+    """
+    Concatena solo gli intervalli di parlato
+
+    Returns:
+        Tupla (audio compattato, OffsetMap)
+    """
+    import numpy as np
+
+    pieces = [audio[int(start * SAMPLE_RATE):int(end * SAMPLE_RATE)] for start, end in regions]
+    compacted = np.concatenate(pieces) if pieces else audio[:0]
+    return compacted, OffsetMap(regions)
+
+
+def remap_segments(segments: list[dict], offset_map: OffsetMap) -> list[dict]:
+    """Riporta start/end di segmenti (e parole, se presenti) sul tempo originale"""
+    for segment in segments:
+        segment["start"] = offset_map.to_original(segment["start"])
+        segment["end"] = offset_map.to_original(segment["end"])
+        for word in segment.get("words", []):
+            word["start"] = offset_map.to_original(word["start"])
+            word["end"] = offset_map.to_original(word["end"])
+    return segments
@@ -0,0 +1,151 @@
+"""
+Pool di processi per la trascrizione parallela su CPU
+
+Ogni worker carica il proprio modello una volta (initializer) e trascrive chunk
+interi con transcribe_chunk. Usato da 3_transcription.py quando
+TRANSCRIPTION_WORKERS > 1 e da autotune.py per le passate di calibrazione.
+
+Dispatcher invia i chunk al pool in ordine con una finestra regolabile: il
+watchdog di memoria può ridurre la finestra, i worker o il modello a metà run.
+"""
+
+import importlib
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+from models import load_whisper_model
+
+# Stato del processo worker (impostato dall'initializer)
+_model = None
+_device = None
+
+
+def _init_worker(model_key: str, device: str, threads: int) -> None:
+    global _model, _device
+    _model = load_whisper_model(model_key, device, threads=threads)
+    _device = device
+
+
+def _warmup(seconds: float) -> None:
+    # Tiene occupato il worker: obbliga il pool ad avviarli tutti
+    time.sleep(seconds)
+
+
+def transcribe_in_worker(wav_path: str, language: str, config: dict) -> tuple[list[dict], dict]:
+    """
+    Trascrive un chunk nel processo worker
+
+    Returns:
+        Tupla (segmenti con timestamp, contatori di decoding del chunk)
+    """
+    transcription = importlib.import_module("3_transcription")
+    stats = {}
+    segments = transcription.transcribe_chunk_segments(_model, wav_path, language, _device, config, stats)
+    return segments, stats
+
+
+def create_pool(model_key: str, device: str, workers: int, threads: int) -> ProcessPoolExecutor:
+    """
+    Crea il pool e attende che tutti i worker abbiano caricato il modello
+
+    Args:
+        model_key: Chiave MODEL_CONFIGS
+        device: Device dei worker (di norma 'cpu')
+        workers: Numero di processi
+        threads: Thread intra-op torch per processo (0 = default)
+
+    Returns:
+        ProcessPoolExecutor pronto
+    """
+    # spawn: fork con torch già inizializzato può bloccarsi nei thread pool interni
+    pool = ProcessPoolExecutor(
+        max_workers=workers,
+        mp_context=multiprocessing.get_context("spawn"),
+        initializer=_init_worker,
+        initargs=(model_key, device, threads),
+    )
+    for future in [pool.submit(_warmup, 0.5) for _ in range(workers)]:
+        future.result()
+    return pool
+
+
+class Dispatcher:
+    """
+    Invio ordinato dei chunk al pool, al più `window` inviati e non ancora ritirati
+
+    Con la finestra piena i chunk successivi aspettano: ridurla limita le
+    decodifiche in corso (e la memoria). restart() ricrea il pool con meno worker
+    o un altro modello; i risultati già pronti restano validi, i chunk non
+    completati sono reinviati.
+    """
+
+    def __init__(self, model_key: str, device: str, workers: int, threads: int, config: dict,
+                 window: int | None = None):
+        self.model_key = model_key
+        self.device = device
+        self.workers = workers
+        self.threads = threads
+        self.config = config
+        self.window = window  # None = nessun limite (tutti i chunk in coda subito)
+        self.pool = create_pool(model_key, device, workers, threads)
+        self._jobs = []
+        self._next = 0
+        self._futures = {}
+        self._args = {}
+
+    def enqueue(self, jobs: list[tuple[str, Path, str]]) -> None:
+        """Aggiunge chunk (chiave, percorso audio, lingua) nell'ordine in cui saranno ritirati"""
+        self._jobs.extend(jobs)
+        self._fill()
+
+    def _fill(self) -> None:
+        while self._next < len(self._jobs) and (self.window is None or len(self._futures) < self.window):
+            key, wav_path, language = self._jobs[self._next]
+            self._next += 1
+            self._args[key] = (str(wav_path), language)
+            self._futures[key] = self.pool.submit(transcribe_in_worker, str(wav_path), language, self.config)
+
+    def result(self, key: str) -> tuple[list[dict], dict]:
+        """
+        Attende il risultato di un chunk (ritirati nell'ordine di enqueue)
+
+        Returns:
+            Tupla (segmenti, contatori di decoding)
+
+        Raises:
+            BrokenProcessPool: Se un worker è morto (es. OOM killer): vedi restart()
+        """
+        self._fill()
+        result = self._futures[key].result()
+        del self._futures[key]
+        self._fill()
+        return result
+
+    def restart(self, workers: int | None = None, model_key: str | None = None,
+                config: dict | None = None) -> None:
+        """
+        Ricrea il pool (meno worker o altro modello) e reinvia i chunk non completati
+
+        Aspetta la fine dei chunk già in decodifica: il loro risultato non si perde.
+        """
+        self.pool.shutdown(wait=True, cancel_futures=True)
+        self.workers = workers or self.workers
+        self.model_key = model_key or self.model_key
+        self.config = config or self.config
+        self.pool = create_pool(self.model_key, self.device, self.workers, self.threads)
+
+        for key, future in self._futures.items():
+            if future.cancelled() or future.exception() is not None:
+                self._futures[key] = self.pool.submit(transcribe_in_worker, *self._args[key], self.config)
+
+    def shutdown(self) -> None:
+        """Chiude il pool"""
+        self.pool.shutdown()
+
+
+def merge_stats(total: dict, part: dict) -> None:
+    """Somma in-place i contatori numerici di `part` in `total`"""
+    for key, value in part.items():
+        total[key] = total.get(key, 0) + value